@@ -24,14 +24,22 @@ import librosa.display
 import matplotlib.pyplot as plt
 import seaborn as sns
 import parselmouth
-from parselmouth.praat import call
 import soundfile as sf
 import pandas as pd
 from pathlib import Path
-from scipy import stats, signal
-from scipy.cluster.hierarchy import linkage, fcluster
-from sklearn.preprocessing import StandardScaler
+import os
 import warnings
+
+from audio_buffer import LazyRecording, RecordingBuffer, ResampledSignalCache, open_recording
+from corpus import CorpusManifest
+from execution_plan import ExecutionPlan, analysis_task_memory
+from fingerprint import FingerprintIndex
+from parallel import run_parallel
+from pitch_range import DEFAULT_PITCH_RANGE, estimate_pitch_range, speaker_pitch_ranges
+from praat_tracks import RecordingTracks, TrackStore, WordTracks
+from quality_gate import QualityGate
+from vowel_table import VowelTable
+
 warnings.filterwarnings('ignore')
 
 # Configuración visual
@@ -40,6 +48,14 @@ sns.set_palette("husl")
 COLORS_GIRLS = ['#FF1493', '#FF69B4', '#FFB6C1']
 COLORS_BOYS = ['#1E90FF', '#4169E1', '#87CEEB']
 
+# Procesos para analizar las grabaciones en paralelo (None = según ExecutionPlan, 1 = en serie)
+WORKERS = None
+CHUNKSIZE = 1
+
+# Detección de vocales en dos pasadas: rango de F0 estimado por hablante (todas
+# sus grabaciones del manifiesto) en lugar del rango fijo 150-500 Hz
+ADAPTIVE_PITCH = False
+
 
 class WordSegmenter:
     """Segmenta audio en palabras usando detección de silencios."""
@@ -47,7 +63,7 @@ class WordSegmenter:
     def __init__(self, audio, sr, silence_thresh_db=-40, min_silence_len=0.3, min_word_len=0.2):
         """
         Args:
-            audio: señal de audio
+            audio: señal de audio (array o RecordingBuffer/MappedWavReader)
             sr: sample rate
             silence_thresh_db: umbral de silencio en dB
             min_silence_len: duración mínima de silencio para separar palabras (segundos)
@@ -66,7 +82,10 @@ class WordSegmenter:
         frame_length = int(0.025 * self.sr)  # 25ms frames
         hop_length = int(0.010 * self.sr)    # 10ms hop
 
-        rms = librosa.feature.rms(y=self.audio, frame_length=frame_length, hop_length=hop_length)[0]
+        if isinstance(self.audio, RecordingBuffer):
+            rms = self.audio.rms_envelope(frame_length, hop_length)
+        else:
+            rms = librosa.feature.rms(y=self.audio, frame_length=frame_length, hop_length=hop_length)[0]
 
         # Convertir a dB
         rms_db = librosa.amplitude_to_db(rms, ref=np.max)
@@ -102,87 +121,75 @@ class WordSegmenter:
         if in_speech:
             speech_intervals.append((start_time, times[-1]))
 
-        # Extraer segmentos de audio
+        # Registrar segmentos (solo offsets; el audio se lee con word_audio())
         self.words = []
         for i, (start, end) in enumerate(speech_intervals):
             start_sample = int(start * self.sr)
             end_sample = int(end * self.sr)
-            word_audio = self.audio[start_sample:end_sample]
 
             self.words.append({
                 'index': i,
                 'start_time': start,
                 'end_time': end,
                 'duration': end - start,
-                'audio': word_audio,
                 'start_sample': start_sample,
                 'end_sample': end_sample
             })
 
         return self.words
 
+    def word_audio(self, word):
+        """Audio de una palabra detectada (solo se decodifica el tramo pedido)."""
+        if isinstance(self.audio, RecordingBuffer):
+            return self.audio.read(word['start_sample'], word['end_sample'])
+        return self.audio[word['start_sample']:word['end_sample']]
+
 
 class VowelDetector:
     """Detecta y segmenta vocales individuales."""
 
-    def __init__(self, audio, sr, pitch_floor=150, pitch_ceiling=500):
+    def __init__(self, audio, sr, pitch_floor=150, pitch_ceiling=500, formant_snd=None, tracks=None):
         """
         Args:
             audio: señal de audio
             sr: sample rate
             pitch_floor: frecuencia mínima de pitch (Hz) - mínimo 150 Hz para Praat
             pitch_ceiling: frecuencia máxima de pitch (Hz)
+            formant_snd: Sound del mismo tramo ya remuestreado para formantes (opcional)
+            tracks: WordTracks del tramo ya calculadas (p.ej. del almacén en disco)
         """
         self.audio = audio
         self.sr = sr
         self.pitch_floor = max(150, pitch_floor)  # Praat requiere mínimo 150 Hz
         self.pitch_ceiling = pitch_ceiling
-        self.snd = None
+        self.formant_snd = formant_snd
+        self.tracks = tracks
         self.vowels = []
 
     def detect(self):
         """Detecta segmentos vocálicos usando pitch + energía."""
-        # Crear objeto Sound de Parselmouth
-        self.snd = parselmouth.Sound(self.audio, sampling_frequency=self.sr)
-
-        # Extraer pitch (con manejo de errores)
-        try:
-            pitch = call(self.snd, "To Pitch", 0.0, self.pitch_floor, self.pitch_ceiling)
-        except Exception as e:
-            # Si falla el análisis de pitch, devolver lista vacía
-            print(f"      ⚠ No se pudo analizar pitch en este segmento: {e}")
+        # Pistas de Praat (única conversión a float64 si hay que calcularlas)
+        if self.tracks is None:
+            snd = parselmouth.Sound(np.asarray(self.audio, dtype=np.float64), sampling_frequency=self.sr)
+            self.tracks = WordTracks.compute(snd, self.formant_snd, {'pitch_floor': self.pitch_floor,
+                                                                     'pitch_ceiling': self.pitch_ceiling})
+        tracks = self.tracks
+
+        # Si falla el análisis de pitch o intensidad, devolver lista vacía
+        if tracks.pitch is None:
+            print(f"      ⚠ No se pudo analizar pitch en este segmento: {tracks.errors.get('pitch')}")
             return []
-
-        # Extraer intensidad
-        try:
-            intensity = call(self.snd, "To Intensity", 75, 0.0, "yes")
-        except Exception as e:
-            print(f"      ⚠ No se pudo analizar intensidad en este segmento: {e}")
+        if tracks.intensity is None:
+            print(f"      ⚠ No se pudo analizar intensidad en este segmento: {tracks.errors.get('intensity')}")
             return []
 
-        # Parámetros temporales
-        time_step = 0.01  # 10ms
-        duration = call(self.snd, "Get total duration")
-
-        # Extraer valores
-        pitch_values = []
-        intensity_values = []
-        times = []
-
-        t = 0
-        while t < duration:
-            f0 = call(pitch, "Get value at time", t, "Hertz", "Linear")
-            intens = call(intensity, "Get value at time", t, "Cubic")
-
-            pitch_values.append(f0 if f0 and not np.isnan(f0) else 0)
-            intensity_values.append(intens if intens and not np.isnan(intens) else 0)
-            times.append(t)
-
-            t += time_step
-
-        pitch_values = np.array(pitch_values)
-        intensity_values = np.array(intensity_values)
-        times = np.array(times)
+        # Muestrear cada 10ms (misma interpolación que "Get value at time" de Praat)
+        time_step = 0.01
+        times = tracks.grid(time_step)
+        pitch_values = tracks.pitch.linear(times)
+        intensity_values = tracks.intensity.cubic(times)
+        pitch_values[np.isnan(pitch_values)] = 0
+        intensity_values[np.isnan(intensity_values)] = 0
 
         # Detectar segmentos sonoros (voiced)
         # Un segmento es sonoro si tiene pitch válido Y suficiente intensidad
@@ -217,10 +224,9 @@ class VowelDetector:
             # Calcular punto medio (más estable para formantes)
             mid_time = (start_time + end_time) / 2
 
-            # Extraer audio del segmento
+            # Posición del segmento dentro de la palabra (sin copiar audio)
             start_sample = int(start_time * self.sr)
             end_sample = int(end_time * self.sr)
-            vowel_audio = self.audio[start_sample:end_sample]
 
             # Pitch medio en el segmento
             segment_pitch = pitch_values[start_idx:end_idx]
@@ -237,7 +243,6 @@ class VowelDetector:
                 'end_time': end_time,
                 'mid_time': mid_time,
                 'duration': duration,
-                'audio': vowel_audio,
                 'pitch_mean': mean_pitch,
                 'intensity_mean': mean_intensity,
                 'start_sample': start_sample,
@@ -256,19 +261,17 @@ class VowelDetector:
         Returns:
             dict con F1, F2, F3 o None si falla
         """
-        if self.snd is None:
+        # Pistas de formantes de la palabra (Burg, configurado para voces infantiles)
+        if self.tracks is None or self.tracks.formants is None:
             return None
 
-        # Crear objeto Formant (configurado para voces infantiles)
-        formant = call(self.snd, "To Formant (burg)", 0.0, 5, 5500, 0.025, 50)
-
         # Extraer en el punto medio (más estable)
         mid_time = vowel['mid_time']
 
         try:
-            f1 = call(formant, "Get value at time", 1, mid_time, "Hertz", "Linear")
-            f2 = call(formant, "Get value at time", 2, mid_time, "Hertz", "Linear")
-            f3 = call(formant, "Get value at time", 3, mid_time, "Hertz", "Linear")
+            f1 = self.tracks.formant_at(1, mid_time)
+            f2 = self.tracks.formant_at(2, mid_time)
+            f3 = self.tracks.formant_at(3, mid_time)
 
             # Validar valores
             if f1 and not np.isnan(f1) and f1 > 0 and f1 < 1500:  # F1 razonable
@@ -284,24 +287,99 @@ class VowelDetector:
 class RigorousVoiceAnalyzer:
     """Analizador riguroso de características acústicas."""
 
-    def __init__(self, audio_path):
+    def __init__(self, audio_path, mmap=False, track_store=None, adaptive_pitch=False, buffer=None,
+                 pitch_ranges=None):
+        """
+        Args:
+            audio_path: Ruta al archivo de audio
+            mmap: mapear el WAV en memoria y decodificar solo los tramos analizados
+            track_store: TrackStore para reutilizar las pistas de Praat entre ejecuciones (opcional)
+            adaptive_pitch: estimar antes el rango de F0 del hablante y detectar las
+                vocales con ese rango en lugar de 150-500 Hz
+            buffer: grabación ya abierta (p.ej. compartida con otro analizador)
+            pitch_ranges: rangos de F0 por grabación ya estimados con todas las del
+                hablante (speaker_pitch_ranges); con adaptive_pitch se usan en lugar
+                de estimar el rango solo con esta grabación
+        """
         self.audio_path = Path(audio_path)
         self.name = self.audio_path.stem
+        self.adaptive_pitch = adaptive_pitch
+        self.pitch_ranges = pitch_ranges or {}
+        self.pitch_range = None
+        self.pitch_floor, self.pitch_ceiling = DEFAULT_PITCH_RANGE
+
+        # Cargar audio (un único array float32, o WAV mapeado; las palabras son vistas)
+        self.buffer = buffer if buffer is not None else open_recording(audio_path, mmap=mmap)
+        self.sr = self.buffer.sr
 
-        # Cargar audio
-        self.y, self.sr = librosa.load(audio_path, sr=None)
+        # Señal remuestreada (una vez por techo) para el análisis de formantes
+        self.formant_cache = ResampledSignalCache(self.buffer)
+
+        # Pistas de Praat por palabra (persistentes si hay track_store)
+        self.tracks = RecordingTracks(self.audio_path, store=track_store)
 
         # Resultados
         self.words = []
         self.all_vowels = []
-        self.vowel_formants = []
+        self.vowel_formants = VowelTable()
         self.results = {
             'name': self.name,
-            'duration': len(self.y) / self.sr,
+            'duration': self.buffer.duration,
             'num_words': 0,
             'num_vowels': 0
         }
 
+    def __getstate__(self):
+        """
+        Estado para pickle (p.ej. al volver de un proceso del pool): sin audio,
+        señal remuestreada ni objetos de Praat.
+        """
+        state = self.__dict__.copy()
+        for name in ('buffer', 'formant_cache'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # La grabación solo se abre si algo la lee (informes de segmentación)
+        self.buffer = LazyRecording(self.audio_path)
+        self.formant_cache = ResampledSignalCache(self.buffer)
+
+    # Lo que analyze() produce (ver result_tables)
+    RESULT_TABLES = ('results', 'words', 'vowel_formants', 'pitch_range', 'pitch_floor', 'pitch_ceiling')
+
+    def result_tables(self):
+        """
+        Resultados del análisis para devolverlos desde un proceso del pool:
+        palabras con sus vocales, la tabla de formantes y los resultados (sin
+        audio, señal remuestreada ni pistas de Praat).
+        """
+        return {name: getattr(self, name) for name in self.RESULT_TABLES}
+
+    @classmethod
+    def from_tables(cls, audio_path, tables, **kwargs):
+        """
+        Reconstruye en el proceso principal un analizador ya analizado.
+
+        Args:
+            audio_path: archivo de audio (no se abre hasta que se lee)
+            tables: dict de result_tables()
+            **kwargs: argumentos de RigorousVoiceAnalyzer
+
+        Returns:
+            RigorousVoiceAnalyzer con los resultados de tables
+        """
+        analyzer = cls(audio_path, buffer=LazyRecording(audio_path), **kwargs)
+        for name, value in tables.items():
+            setattr(analyzer, name, value)
+        analyzer.all_vowels = [v for word in analyzer.words for v in word['vowels']]
+        return analyzer
+
+    @property
+    def y(self):
+        """Señal completa (con mmap se decodifica al pedirla)."""
+        return self.buffer.audio
+
     def analyze(self):
         """Ejecuta análisis completo."""
         print(f"\n{'='*70}")
@@ -310,17 +388,26 @@ class RigorousVoiceAnalyzer:
 
         # 1. Segmentar en palabras
         print("\n1. Segmentando en palabras...")
-        word_segmenter = WordSegmenter(self.y, self.sr)
+        word_segmenter = WordSegmenter(self.buffer, self.sr)
         self.words = word_segmenter.segment()
         self.results['num_words'] = len(self.words)
         print(f"   ✓ Detectadas {len(self.words)} palabras/segmentos")
 
+        # Primera pasada (opcional): rango de F0 del hablante
+        if self.adaptive_pitch and self.pitch_range is None:
+            self.adapt_pitch_range(self.pitch_ranges.get(str(self.audio_path.resolve())))
+
         # 2. Detectar vocales en cada palabra
         print("\n2. Detectando vocales...")
         total_vowels = 0
 
         for word in self.words:
-            vowel_detector = VowelDetector(word['audio'], self.sr)
+            word_audio = word_segmenter.word_audio(word)
+            tracks = self.tracks.get(word['start_time'], word['end_time'], lambda: (
+                self.buffer.sound(word['start_time'], word['end_time']),
+                self.formant_cache.sound(word['start_time'], word['end_time'])
+            ))
+            vowel_detector = VowelDetector(word_audio, self.sr, self.pitch_floor, self.pitch_ceiling, tracks=tracks)
             vowels = vowel_detector.detect()
 
             # Ajustar tiempos globales
@@ -329,6 +416,8 @@ class RigorousVoiceAnalyzer:
                 vowel['global_end_time'] = word['start_time'] + vowel['end_time']
                 vowel['global_mid_time'] = word['start_time'] + vowel['mid_time']
                 vowel['word_index'] = word['index']
+                vowel['global_start_sample'] = word['start_sample'] + vowel['start_sample']
+                vowel['global_end_sample'] = word['start_sample'] + vowel['end_sample']
 
                 # Extraer formantes
                 formants = vowel_detector.extract_formants(vowel)
@@ -337,18 +426,19 @@ class RigorousVoiceAnalyzer:
                     self.vowel_formants.append({
                         'word_index': word['index'],
                         'vowel_index': vowel['index'],
-                        'time': vowel['global_mid_time'],
+                        'global_time': vowel['global_mid_time'],
                         'duration': vowel['duration'],
                         'f1': formants['f1'],
                         'f2': formants['f2'],
                         'f3': formants['f3'],
                         'pitch': vowel['pitch_mean'],
                         'intensity': vowel['intensity_mean']
-                    })
+                    }, speaker=self.name)
 
             word['vowels'] = vowels
             total_vowels += len(vowels)
 
+        self.tracks.save()
         self.all_vowels = [v for word in self.words for v in word['vowels']]
         self.results['num_vowels'] = total_vowels
         print(f"   ✓ Detectadas {total_vowels} vocales")
@@ -373,9 +463,9 @@ class RigorousVoiceAnalyzer:
         # 4. Análisis de formantes
         if self.vowel_formants:
             print("\n4. Análisis de formantes...")
-            f1_values = [v['f1'] for v in self.vowel_formants]
-            f2_values = [v['f2'] for v in self.vowel_formants]
-            f3_values = [v['f3'] for v in self.vowel_formants]
+            f1_values = self.vowel_formants['f1']
+            f2_values = self.vowel_formants['f2']
+            f3_values = self.vowel_formants['f3']
 
             self.results['f1_mean'] = np.mean(f1_values)
             self.results['f1_std'] = np.std(f1_values)
@@ -403,13 +493,46 @@ class RigorousVoiceAnalyzer:
 
         return self.results
 
+    def adapt_pitch_range(self, pitch_range=None):
+        """
+        Ajusta el rango de F0 de la detección de vocales al hablante.
+
+        Args:
+            pitch_range: dict de pitch_range (p.ej. estimado con todas las grabaciones
+                del hablante); por defecto se estima con esta grabación
+        """
+        self.pitch_range = pitch_range or estimate_pitch_range(self.buffer)
+        # VowelDetector mantiene el suelo mínimo de 150 Hz
+        self.pitch_floor = max(150, self.pitch_range['floor'])
+        self.pitch_ceiling = self.pitch_range['ceiling']
+        self.tracks = RecordingTracks(self.audio_path, {'pitch_floor': self.pitch_floor,
+                                                        'pitch_ceiling': self.pitch_ceiling}, self.tracks.store)
+
+        self.results['pitch_floor'] = self.pitch_floor
+        self.results['pitch_ceiling'] = self.pitch_ceiling
+        print(f"\n   ✓ Rango de F0: {self.pitch_floor}-{self.pitch_ceiling} Hz"
+              + ("" if self.pitch_range['adapted'] else " (por defecto: pocos frames sonoros)"))
+
+    def segment_audio(self, segment):
+        """
+        Audio de una palabra o vocal, materializado bajo demanda desde la grabación.
+
+        Args:
+            segment: dict de self.words (start_sample/end_sample) o de
+                self.all_vowels (global_start_sample/global_end_sample)
+        """
+        start = segment.get('global_start_sample', segment['start_sample'])
+        end = segment.get('global_end_sample', segment['end_sample'])
+        return self.buffer.read(start, end)
+
     def plot_segmentation(self, ax=None, show_vowels=True):
         """Visualiza la segmentación en palabras y vocales."""
         if ax is None:
             fig, ax = plt.subplots(figsize=(14, 5))
 
-        times = np.linspace(0, self.results['duration'], len(self.y))
-        ax.plot(times, self.y, linewidth=0.5, alpha=0.6, color='gray')
+        y = self.y
+        times = np.linspace(0, self.results['duration'], len(y))
+        ax.plot(times, y, linewidth=0.5, alpha=0.6, color='gray')
 
         # Marcar palabras
         for word in self.words:
@@ -440,8 +563,8 @@ class RigorousVoiceAnalyzer:
         if not self.vowel_formants:
             return ax
 
-        f1 = [v['f1'] for v in self.vowel_formants]
-        f2 = [v['f2'] for v in self.vowel_formants]
+        f1 = self.vowel_formants['f1']
+        f2 = self.vowel_formants['f2']
 
         ax.scatter(f2, f1, s=100, alpha=0.6, color=color, edgecolors='black', linewidth=1)
 
@@ -470,20 +593,58 @@ class RigorousVoiceAnalyzer:
         return ax
 
 
-def create_rigorous_reports(analyzers):
-    """Crea reportes rigurosos con incertidumbre."""
+def _analyze_file(task):
+    """Worker del pool: analiza una grabación y devuelve sus tablas de resultados."""
+    audio_file, kwargs = task
+    analyzer = RigorousVoiceAnalyzer(audio_file, **kwargs)
+    analyzer.analyze()
+    return analyzer.result_tables()
+
+
+def analyze_files(audio_files, workers=WORKERS, chunksize=CHUNKSIZE, threads=None, **kwargs):
+    """
+    Analiza varias grabaciones en un pool de procesos.
+
+    Args:
+        audio_files: archivos de audio
+        workers, chunksize, threads: ver parallel.run_parallel
+        **kwargs: argumentos de RigorousVoiceAnalyzer (track_store, adaptive_pitch...)
+
+    Returns:
+        lista de RigorousVoiceAnalyzer analizados, en el orden de audio_files
+    """
+    tasks = [(audio_file, kwargs) for audio_file in audio_files]
+    tables = run_parallel(_analyze_file, tasks, workers, chunksize,
+                          costs=[os.path.getsize(f) for f in audio_files], threads=threads)
+    return [RigorousVoiceAnalyzer.from_tables(audio_file, result, **kwargs)
+            for audio_file, result in zip(audio_files, tables)]
+
+
+def create_rigorous_reports(analyzers, manifest=None):
+    """
+    Crea reportes rigurosos con incertidumbre.
+
+    Args:
+        analyzers: lista de RigorousVoiceAnalyzer ya analizados
+        manifest: CorpusManifest con el género de cada grabación (colores; por defecto corpus.csv)
+    """
 
     print("\n" + "="*70)
     print("GENERANDO REPORTES RIGUROSOS")
     print("="*70)
 
+    # Color por género según el manifiesto (niñas / niños o sin dato)
+    recordings = (manifest or CorpusManifest()).lookup([a.audio_path for a in analyzers])
+    colors = [COLORS_GIRLS[i % 3] if r is not None and r.gender == 'F' else COLORS_BOYS[i % 3]
+              for i, r in enumerate(recordings)]
+
     # 1. Reportes individuales
     print("\n1. Reportes individuales con segmentación...")
     for i, analyzer in enumerate(analyzers):
         fig = plt.figure(figsize=(16, 10))
         gs = fig.add_gridspec(3, 2, hspace=0.35, wspace=0.3)
 
-        color = COLORS_GIRLS[i % 3] if 'ninia' in analyzer.name else COLORS_BOYS[i % 3]
+        color = colors[i]
 
         # Segmentación
         ax1 = fig.add_subplot(gs[0, :])
@@ -508,9 +669,9 @@ def create_rigorous_reports(analyzers):
         # Distribución de formantes
         ax4 = fig.add_subplot(gs[2, 0])
         if analyzer.vowel_formants:
-            f1 = [v['f1'] for v in analyzer.vowel_formants]
-            f2 = [v['f2'] for v in analyzer.vowel_formants]
-            f3 = [v['f3'] for v in analyzer.vowel_formants]
+            f1 = analyzer.vowel_formants['f1']
+            f2 = analyzer.vowel_formants['f2']
+            f3 = analyzer.vowel_formants['f3']
 
             bp = ax4.boxplot([f1, f2, f3], labels=['F1', 'F2', 'F3'], patch_artist=True)
             for patch in bp['boxes']:
@@ -567,9 +728,9 @@ MÉTRICAS RIGUROSAS
         if not analyzer.vowel_formants:
             continue
 
-        color = COLORS_GIRLS[i % 3] if 'ninia' in analyzer.name else COLORS_BOYS[i % 3]
-        f1 = [v['f1'] for v in analyzer.vowel_formants]
-        f2 = [v['f2'] for v in analyzer.vowel_formants]
+        color = colors[i]
+        f1 = analyzer.vowel_formants['f1']
+        f2 = analyzer.vowel_formants['f2']
 
         ax.scatter(f2, f1, s=80, alpha=0.5, color=color, label=f'{analyzer.name} (n={len(f1)})')
 
@@ -600,8 +761,6 @@ MÉTRICAS RIGUROSAS
     pitch_means = [a.results.get('pitch_mean', 0) for a in analyzers]
     pitch_stds = [a.results.get('pitch_std', 0) for a in analyzers]
 
-    colors = [COLORS_GIRLS[i % 3] if 'ninia' in a.name else COLORS_BOYS[i % 3] for i, a in enumerate(analyzers)]
-
     x = np.arange(len(names))
     bars = axes[0].bar(x, pitch_means, yerr=pitch_stds, color=colors, alpha=0.7, capsize=8,
                        error_kw={'linewidth': 2})
@@ -671,26 +830,54 @@ def main():
     print("  • Incertidumbre: reportada con desviación estándar")
     print("="*70)
 
-    # Buscar archivos
-    audio_files = sorted(Path('.').glob('audio_*.wav'))
+    # Grabaciones del manifiesto del corpus (corpus.csv: hablante, género, edad, sesión)
+    manifest = CorpusManifest()
+    audio_files = [recording.path for recording in manifest.recordings()]
 
     if not audio_files:
-        print("\n❌ No se encontraron archivos audio_*.wav")
+        print(f"\n❌ No hay grabaciones en {manifest.path}")
         return
 
     print(f"\n📁 Archivos encontrados: {len(audio_files)}")
     for f in audio_files:
-        print(f"   • {f.name}")
+        print(f"   • {f}")
+
+    # Descartar grabaciones defectuosas antes del análisis
+    gate = QualityGate()
+    audio_files = gate.screen(audio_files)
+    gate.write_report()
+    if not audio_files:
+        print("\n❌ Ningún archivo superó el control de calidad")
+        return
+
+    # Copias de grabaciones ya indexadas (reexportaciones, recortes): se omiten
+    audio_files = FingerprintIndex('.cache/fingerprints.sqlite').screen(audio_files)
+
+    # Pistas de Praat en disco (compartidas con analyze_with_transcription.py)
+    track_store = TrackStore('.cache/tracks')
+
+    # Analizar en paralelo (resultados en el orden de audio_files)
+    # Tantos procesos como núcleos, salvo que la grabación más larga no quepa en memoria
+    plan = ExecutionPlan.detect(workers=WORKERS)
+    print(f"\n{plan.describe()}")
+    task_memory = max(analysis_task_memory(info.duration, info.samplerate)
+                      for info in map(sf.info, map(str, audio_files)))
+    workers = plan.fit_workers(task_memory)
+    if workers < plan.analysis_workers:
+        print(f"   ⚠ Memoria: {workers} procesos de análisis a la vez")
+
+    # Primera pasada (solo con ADAPTIVE_PITCH): rango de F0 de cada hablante
+    pitch_ranges = None
+    if ADAPTIVE_PITCH:
+        print("\n🔎 Estimando el rango de F0 de cada hablante...")
+        pitch_ranges = speaker_pitch_ranges(audio_files, manifest, workers=workers)
 
-    # Analizar
-    analyzers = []
-    for audio_file in audio_files:
-        analyzer = RigorousVoiceAnalyzer(audio_file)
-        analyzer.analyze()
-        analyzers.append(analyzer)
+    analyzers = analyze_files(audio_files, workers, threads=plan.threads_per_worker,
+                              track_store=track_store, adaptive_pitch=ADAPTIVE_PITCH,
+                              pitch_ranges=pitch_ranges)
 
     # Generar reportes
-    create_rigorous_reports(analyzers)
+    create_rigorous_reports(analyzers, manifest)
 
     print("\n" + "="*70)
     print("✅ ANÁLISIS COMPLETADO")
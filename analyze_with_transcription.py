@@ -11,21 +11,38 @@ Análisis comparativo riguroso entre niños y niñas:
 """
 
 import numpy as np
-import librosa
 import matplotlib.pyplot as plt
 import seaborn as sns
-import parselmouth
-from parselmouth.praat import call
 import pandas as pd
 from pathlib import Path
 from scipy import stats
+import asyncio
+import gc
+import os
+import time
 import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from array import array
 import whisper
 import json
 import soundfile as sf
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 
+from audio_buffer import (LazyRecording, MappedWavReader, ResampledSignalCache, SampleStore,
+                          SharedAudioDescriptor, SharedAudioManager, SharedRecordingBuffer, open_recording)
+from corpus import CorpusManifest, transcription_path
+from execution_plan import ExecutionPlan, analysis_task_memory, limit_threads, worker_context
+from fingerprint import FingerprintIndex
+from parallel import run_parallel
+from pitch_range import estimate_pitch_range, speaker_pitch_ranges
+from praat_tracks import RecordingTracks, TrackStore
+from quality_gate import QualityGate
+from result_cache import WordResultCache
+from sampling import StratifiedWordSampler, sampling_report
+from streaming import LTASAccumulator, RunningStats
+from vowel_table import VowelTable
+
 warnings.filterwarnings('ignore')
 
 # Configuración visual
@@ -34,6 +51,39 @@ sns.set_palette("husl")
 COLORS_GIRLS = ['#FF1493', '#FF69B4', '#FFB6C1']
 COLORS_BOYS = ['#1E90FF', '#4169E1', '#87CEEB']
 
+# Parámetros del análisis acústico por palabra (forman parte de la clave de caché)
+ANALYSIS_PARAMS = {
+    'pitch_floor': 150,
+    'pitch_ceiling': 500,
+    'intensity_min_pitch': 75,
+    'num_formants': 5,
+    'max_formant': 5500,
+    'formant_window': 0.025,
+    'pre_emphasis': 50,
+    'voicing_percentile': 20,
+    'min_vowel_duration': 0.04,
+}
+
+# Versión de la lógica de análisis: subirla invalida las cachés de resultados
+ENGINE_VERSION = '1'
+
+# Procesos para analizar las grabaciones en paralelo (None = según ExecutionPlan, 1 = en serie)
+WORKERS = None
+CHUNKSIZE = 1
+# Procesos por grabación para repartir sus palabras en tramos (grabaciones largas
+# que dominan el tiempo del lote); 1 = cada grabación en un solo proceso
+WORD_WORKERS = 1
+WORD_CHUNK_DURATION = 60.0
+
+# Análisis en dos pasadas: rango de F0 estimado por hablante (todas sus grabaciones
+# del manifiesto) en lugar del rango fijo pitch_floor-pitch_ceiling
+ADAPTIVE_PITCH = False
+
+# Modo con presupuesto para corpus grandes: None analiza todas las palabras;
+# p.ej. {'target_per_class': 30} o {'cpu_budget': 60.0} (por hablante del manifiesto,
+# repartido entre sus grabaciones)
+SAMPLING = None
+
 
 class WhisperTranscriber:
     """Transcribe audio usando Whisper y extrae palabras con timestamps."""
@@ -91,30 +141,76 @@ class WhisperTranscriber:
 
         return transcription
 
+    def release(self):
+        """Libera el modelo (memoria del proceso y, si hay, de la GPU)."""
+        del self.model
+        gc.collect()
+        try:
+            import torch
+            torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
 
 class WordBasedVoiceAnalyzer:
     """Analiza características acústicas basándose en palabras transcritas."""
 
-    def __init__(self, audio_path, transcription):
+    def __init__(self, audio_path, transcription, mmap=False, cache=None, params=None, track_store=None,
+                 adaptive_pitch=False, buffer=None, sampler=None, word_workers=1, word_chunk_duration=60.0,
+                 words=None, pitch_ranges=None):
         """
         Args:
             audio_path: Ruta al archivo de audio
             transcription: Resultado de WhisperTranscriber
+            mmap: mapear el WAV en memoria y decodificar solo las palabras analizadas
+            cache: WordResultCache para reutilizar palabras ya analizadas (opcional)
+            params: valores que sustituyen a ANALYSIS_PARAMS (opcional)
+            track_store: TrackStore para reutilizar las pistas de Praat entre ejecuciones (opcional)
+            adaptive_pitch: estimar antes el rango de F0 del hablante y analizar las
+                palabras con ese rango en lugar de pitch_floor/pitch_ceiling fijos
+            buffer: grabación ya abierta (p.ej. compartida con otro analizador)
+            sampler: StratifiedWordSampler para analizar solo una muestra estratificada
+                de las palabras (por defecto se analizan todas)
+            word_workers: procesos para repartir las palabras de esta grabación en
+                tramos (1 = en serie; útil cuando una grabación larga domina el lote)
+            word_chunk_duration: duración mínima de palabras (s) por tramo
+            words: palabras a analizar ya elegidas (p.ej. la etapa segment de
+                stages.py); por defecto las de select_words()
+            pitch_ranges: rangos de F0 por grabación ya estimados con todas las del
+                hablante (speaker_pitch_ranges); con adaptive_pitch se usan en lugar
+                de estimar el rango solo con esta grabación
         """
         self.audio_path = Path(audio_path)
         self.name = self.audio_path.stem
         self.transcription = transcription
-
-        # Cargar audio
-        self.y, self.sr = librosa.load(audio_path, sr=None)
-        self.duration = len(self.y) / self.sr
-
-        # Objeto Parselmouth
-        self.snd = parselmouth.Sound(str(audio_path))
-
-        # Resultados
+        self.params = {**ANALYSIS_PARAMS, **(params or {})}
+        self.cache = cache
+        self.adaptive_pitch = adaptive_pitch
+        self.pitch_ranges = pitch_ranges or {}
+        self.pitch_range = None
+        self.sampler = sampler
+        self.sampling_plan = None
+        self.word_workers = word_workers
+        self.word_chunk_duration = word_chunk_duration
+        self.words = words
+        self.ltas = None
+
+        # Cargar audio (un único array float32, o WAV mapeado; las palabras son vistas)
+        self.buffer = buffer if buffer is not None else open_recording(audio_path, mmap=mmap)
+        self.sr = self.buffer.sr
+        self.duration = self.buffer.duration
+        self._snd = None
+
+        # Señal remuestreada (una vez por techo) para el análisis de formantes
+        self.formant_cache = ResampledSignalCache(self.buffer)
+
+        # Pistas de Praat por palabra (persistentes si hay track_store)
+        self.tracks = RecordingTracks(self.audio_path, self.params, track_store)
+
+        # Resultados (las palabras guardan offsets, no audio; el pitch va a un array compartido)
         self.words_analysis = []
-        self.vowels_analysis = []
+        self.vowels_analysis = VowelTable()
+        self.pitch_store = SampleStore()
         self.results = {
             'name': self.name,
             'duration': self.duration,
@@ -122,6 +218,66 @@ class WordBasedVoiceAnalyzer:
             'num_words': len(transcription['words'])
         }
 
+    def __getstate__(self):
+        """
+        Estado para pickle (p.ej. al volver de un proceso del pool): sin audio,
+        señal remuestreada ni objetos de Praat.
+        """
+        state = self.__dict__.copy()
+        for name in ('buffer', 'formant_cache', '_snd'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # La grabación solo se abre si algo la lee (p.ej. la exportación de palabras)
+        self.buffer = LazyRecording(self.audio_path)
+        self.formant_cache = ResampledSignalCache(self.buffer)
+        self._snd = None
+
+    # Lo que un worker devuelve al proceso principal (ver result_tables)
+    RESULT_TABLES = ('results', 'words_analysis', 'vowels_analysis', 'pitch_store', 'ltas',
+                     'sampling_plan', 'pitch_range', 'params')
+
+    def result_tables(self):
+        """
+        Resultados del análisis para devolverlos desde un proceso del pool:
+        las tablas de palabras y vocales, el pitch, las sumas del LTAS y los
+        dicts de resultados (sin transcripción, audio ni cachés).
+        """
+        return {name: getattr(self, name) for name in self.RESULT_TABLES}
+
+    @classmethod
+    def from_tables(cls, audio_path, transcription, tables, **kwargs):
+        """
+        Reconstruye en el proceso principal un analizador ya analizado.
+
+        Args:
+            audio_path: archivo de audio (no se abre hasta que se lee)
+            transcription: transcripción (ya está en el proceso principal)
+            tables: dict de result_tables()
+            **kwargs: argumentos de WordBasedVoiceAnalyzer
+
+        Returns:
+            WordBasedVoiceAnalyzer con los resultados de tables
+        """
+        analyzer = cls(audio_path, transcription, buffer=LazyRecording(audio_path), **kwargs)
+        for name, value in tables.items():
+            setattr(analyzer, name, value)
+        return analyzer
+
+    @property
+    def y(self):
+        """Señal completa (con mmap se decodifica al pedirla)."""
+        return self.buffer.audio
+
+    @property
+    def snd(self):
+        """Objeto Parselmouth de la grabación completa (se crea solo si se pide)."""
+        if self._snd is None:
+            self._snd = self.buffer.sound()
+        return self._snd
+
     def analyze_word(self, word_info):
         """
         Analiza una palabra individual.
@@ -130,48 +286,42 @@ class WordBasedVoiceAnalyzer:
             word_info: dict con 'word', 'start', 'end'
 
         Returns:
-            dict con análisis de la palabra
+            dict con análisis de la palabra (con offsets de muestra en lugar de
+            audio; 'pitch_values' es un array float32 transitorio)
         """
         start_time = word_info['start']
         end_time = word_info['end']
         duration = end_time - start_time
 
-        # Extraer audio de la palabra
-        start_sample = int(start_time * self.sr)
-        end_sample = int(end_time * self.sr)
-        word_audio = self.y[start_sample:end_sample]
+        # Posición de la palabra en la grabación (el audio se lee bajo demanda)
+        start_sample, end_sample = self.buffer.sample_range(start_time, end_time)
 
-        # Crear objeto Sound para esta palabra
+        # Pistas de Praat de la palabra (del almacén en disco si ya se calcularon)
         try:
-            word_snd = parselmouth.Sound(word_audio, sampling_frequency=self.sr)
+            tracks = self.word_tracks(start_time, end_time)
         except:
             return None
 
-        # Analizar pitch en la palabra
-        try:
-            pitch = call(word_snd, "To Pitch", 0.0, 150, 500)
-            pitch_values = []
-            for i in range(pitch.n_frames):
-                f0 = call(pitch, "Get value in frame", i+1, "Hertz")
-                if f0 and not np.isnan(f0) and f0 > 0:
-                    pitch_values.append(f0)
-
-            pitch_mean = np.mean(pitch_values) if pitch_values else 0
-        except:
+        # Pitch en la palabra (frames sonoros)
+        if tracks.pitch is not None:
+            pitch_values = tracks.voiced_pitch()
+            pitch_mean = np.mean(pitch_values) if len(pitch_values) else 0
+        else:
             pitch_mean = 0
             pitch_values = []
 
         # Detectar vocales dentro de la palabra (con transcripción para etiquetarlas)
-        vowels = self._detect_vowels_in_word(word_snd, start_time, word_info['word'])
+        vowels = self._detect_vowels_in_word(tracks, start_time, word_info['word'])
 
         analysis = {
             'word': word_info['word'],
             'start': start_time,
             'end': end_time,
             'duration': duration,
-            'audio': word_audio,
+            'start_sample': start_sample,
+            'end_sample': end_sample,
             'pitch_mean': pitch_mean,
-            'pitch_values': pitch_values,
+            'pitch_values': np.asarray(pitch_values, dtype=np.float32),
             'num_vowels': len(vowels),
             'vowels': vowels
         }
@@ -196,7 +346,18 @@ class WordBasedVoiceAnalyzer:
 
         return vowels
 
-    def _detect_vowels_in_word(self, word_snd, word_start_time, word_text=None):
+    def word_tracks(self, start_time, end_time):
+        """
+        Pistas de pitch, intensidad y formantes de un tramo (WordTracks).
+
+        Solo se ejecuta Praat si el tramo no está en el almacén de pistas.
+        """
+        return self.tracks.get(start_time, end_time, lambda: (
+            self.buffer.sound(start_time, end_time),
+            self.formant_cache.sound(start_time, end_time, self.params['max_formant'])
+        ))
+
+    def _detect_vowels_in_word(self, tracks, word_start_time, word_text=None):
         """Detecta vocales dentro de una palabra y las etiqueta usando la transcripción."""
         vowels = []
 
@@ -204,36 +365,21 @@ class WordBasedVoiceAnalyzer:
         expected_vowels = self._extract_vowels_from_text(word_text) if word_text else []
 
         try:
-            duration = call(word_snd, "Get total duration")
-            if duration < 0.05:  # Muy corto
+            if tracks.duration < 0.05:  # Muy corto
+                return vowels
+            if tracks.pitch is None or tracks.intensity is None:
                 return vowels
 
-            # Extraer pitch e intensidad
-            pitch = call(word_snd, "To Pitch", 0.0, 150, 500)
-            intensity = call(word_snd, "To Intensity", 75, 0.0, "yes")
-
-            # Muestrear cada 10ms
-            time_step = 0.01
-            t = 0
-            pitch_vals = []
-            intensity_vals = []
-            times = []
-
-            while t < duration:
-                f0 = call(pitch, "Get value at time", t, "Hertz", "Linear")
-                intens = call(intensity, "Get value at time", t, "Cubic")
-
-                pitch_vals.append(f0 if f0 and not np.isnan(f0) else 0)
-                intensity_vals.append(intens if intens and not np.isnan(intens) else 0)
-                times.append(t)
-                t += time_step
-
-            pitch_vals = np.array(pitch_vals)
-            intensity_vals = np.array(intensity_vals)
-            times = np.array(times)
+            # Muestrear pitch e intensidad cada 10ms (misma interpolación que Praat)
+            times = tracks.grid(0.01)
+            pitch_vals = tracks.pitch.linear(times)
+            intensity_vals = tracks.intensity.cubic(times)
+            pitch_vals[np.isnan(pitch_vals)] = 0
+            intensity_vals[np.isnan(intensity_vals)] = 0
 
             # Detectar segmentos sonoros
-            is_voiced = (pitch_vals > 0) & (intensity_vals > np.percentile(intensity_vals[intensity_vals > 0], 20))
+            is_voiced = (pitch_vals > 0) & (intensity_vals > np.percentile(intensity_vals[intensity_vals > 0],
+                                                                           self.params['voicing_percentile']))
 
             # Encontrar intervalos vocálicos
             in_vowel = False
@@ -244,9 +390,9 @@ class WordBasedVoiceAnalyzer:
                     start_idx = i
                     in_vowel = True
                 elif not voiced and in_vowel:
-                    if (times[i] - times[start_idx]) >= 0.04:  # Mínimo 40ms
+                    if (times[i] - times[start_idx]) >= self.params['min_vowel_duration']:  # Mínimo 40ms
                         vowel = self._extract_vowel_features(
-                            word_snd,
+                            tracks,
                             times[start_idx],
                             times[i],
                             word_start_time
@@ -255,9 +401,9 @@ class WordBasedVoiceAnalyzer:
                             vowels.append(vowel)
                     in_vowel = False
 
-            if in_vowel and (times[-1] - times[start_idx]) >= 0.04:
+            if in_vowel and (times[-1] - times[start_idx]) >= self.params['min_vowel_duration']:
                 vowel = self._extract_vowel_features(
-                    word_snd,
+                    tracks,
                     times[start_idx],
                     times[-1],
                     word_start_time
@@ -294,24 +440,22 @@ class WordBasedVoiceAnalyzer:
 
         return vowels
 
-    def _extract_vowel_features(self, word_snd, start, end, word_start_time):
+    def _extract_vowel_features(self, tracks, start, end, word_start_time):
         """Extrae características de una vocal."""
         mid_time = (start + end) / 2
         duration = end - start
 
         try:
             # Formantes en el punto medio
-            formant = call(word_snd, "To Formant (burg)", 0.0, 5, 5500, 0.025, 50)
-            f1 = call(formant, "Get value at time", 1, mid_time, "Hertz", "Linear")
-            f2 = call(formant, "Get value at time", 2, mid_time, "Hertz", "Linear")
-            f3 = call(formant, "Get value at time", 3, mid_time, "Hertz", "Linear")
+            f1 = tracks.formant_at(1, mid_time)
+            f2 = tracks.formant_at(2, mid_time)
+            f3 = tracks.formant_at(3, mid_time)
 
             # Validar
             if f1 and f2 and f3 and not np.isnan(f1) and not np.isnan(f2) and not np.isnan(f3):
                 if f1 > 0 and f2 > f1 and f3 > f2 and f1 < 1500 and f2 < 3500:
                     # F0
-                    pitch = call(word_snd, "To Pitch", 0.0, 150, 500)
-                    f0 = call(pitch, "Get value at time", mid_time, "Hertz", "Linear")
+                    f0 = float(tracks.pitch.linear(mid_time))
 
                     return {
                         'start': start,
@@ -329,47 +473,239 @@ class WordBasedVoiceAnalyzer:
 
         return None
 
+    def analyze_stream(self):
+        """
+        Analiza las palabras en orden temporal como un generador.
+
+        Produce ('word', análisis) y, a continuación, ('vowel', vocal) por cada
+        vocal de esa palabra. Las estadísticas de la grabación en self.results
+        se actualizan de forma incremental antes de cada yield (la mediana del
+        pitch, al agotar el generador), y el analizador
+        no guarda ninguna referencia al audio ni al pitch de la palabra: la
+        memoria queda acotada por la palabra más larga, no por la grabación
+        (usar con mmap=True en grabaciones de horas).
+
+        Yields:
+            tuplas (tipo, dict) con tipo 'word' o 'vowel'
+        """
+        if self.adaptive_pitch and self.pitch_range is None:
+            self.adapt_pitch_range(self.pitch_ranges.get(str(self.audio_path.resolve())))
+
+        running = {key: RunningStats() for key in ('pitch', 'f1', 'f2', 'f3')}
+        pitch_values = array('d')  # 8 bytes por vocal, solo para la mediana
+        words_analyzed = 0
+        num_vowels = 0
+        if self.cache is not None:
+            hits, misses = self.cache.hits, self.cache.misses
+        cpu_start = time.process_time()
+
+        for analysis in self._analyzed_words(self._words_to_analyze()):
+            if not analysis:
+                continue
+
+            words_analyzed += 1
+            for vowel in analysis['vowels']:
+                vowel['word'] = analysis['word']
+                num_vowels += 1
+                if vowel['pitch'] > 0:
+                    running['pitch'].add(vowel['pitch'])
+                    pitch_values.append(vowel['pitch'])
+                for key in ('f1', 'f2', 'f3'):
+                    running[key].add(vowel[key])
+
+            self._store_running_results(running, words_analyzed, num_vowels)
+
+            yield 'word', analysis
+            for vowel in analysis['vowels']:
+                yield 'vowel', vowel
+            del analysis
+
+        # La mediana no es incremental: una sola vez, al terminar la grabación
+        if pitch_values:
+            self.results['pitch_median'] = float(np.median(np.frombuffer(pitch_values)))
+        self.tracks.save()
+        if self.cache is not None:
+            print(f"  ♻ Caché: {self.cache.hits - hits} palabras reutilizadas, "
+                  f"{self.cache.misses - misses} recalculadas")
+        if self.sampling_plan is not None:
+            self.sampling_plan['cpu_time'] = time.process_time() - cpu_start
+            self.results['sampling_cpu_time'] = self.sampling_plan['cpu_time']
+            print(f"  ✓ CPU: {self.sampling_plan['cpu_time']:.1f} s "
+                  f"(estimado {self.sampling_plan['estimated_cost']:.1f} s)")
+
+    def _words_to_analyze(self):
+        """Palabras a analizar: las ya elegidas (words) o las de select_words()."""
+        if self.words is not None:
+            return self.words
+        return self.select_words()
+
+    def select_words(self):
+        """
+        Palabras a analizar, en orden temporal.
+
+        Sin sampler son todas. Con sampler, la muestra estratificada se elige
+        solo con las transcripciones (antes de cualquier análisis acústico),
+        con el objetivo del hablante repartido entre sus grabaciones, y sus
+        fracciones de muestreo por clase quedan en self.sampling_plan y en
+        self.results['sampling_fractions'].
+        """
+        words = sorted(self.transcription['words'], key=lambda w: w['start'])
+        if self.sampler is None:
+            return words
+
+        self.set_sampling_plan(self.sampler.plan_recording(self.audio_path, words, self._extract_vowels_from_text))
+
+        fractions = ', '.join(f"/{c}/ {f:.0%}" for c, f in self.sampling_plan['fractions'].items()
+                              if not np.isnan(f))
+        print(f"  ✓ Muestreo: {len(self.sampling_plan['selected'])}/{len(words)} palabras "
+              f"(hablante {self.sampling_plan['speaker']}: {self.sampling_plan['word_fraction']:.0%}); "
+              f"vocales por clase: {fractions}")
+        return [words[i] for i in self.sampling_plan['selected']]
+
+    def set_sampling_plan(self, plan):
+        """Guarda un plan de StratifiedWordSampler y sus fracciones en self.results."""
+        self.sampling_plan = plan
+        self.results['sampling_fractions'] = plan['fractions']
+        self.results['sampling_word_fraction'] = plan['word_fraction']
+
+    def _word_chunks(self, words):
+        """
+        Reparte las palabras en tramos contiguos con la misma duración total.
+
+        Solo hay más de un tramo si word_workers > 1 y la grabación tiene al
+        menos word_chunk_duration segundos de palabras por tramo.
+        """
+        if self.word_workers <= 1 or not words:
+            return [words]
+
+        durations = np.array([w['end'] - w['start'] for w in words])
+        total = durations.sum()
+        n_chunks = int(min(self.word_workers, len(words), total // self.word_chunk_duration))
+        if n_chunks <= 1:
+            return [words]
+
+        # Tramo de cada palabra según la duración acumulada antes de ella
+        chunk_ids = np.minimum(((np.cumsum(durations) - durations) / total * n_chunks).astype(int), n_chunks - 1)
+        bounds = [0, *np.searchsorted(chunk_ids, np.arange(1, n_chunks)), len(words)]
+        return [words[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    def _analyzed_words(self, words):
+        """
+        Análisis de cada palabra (o None), en el orden de words.
+
+        Con varios tramos, cada uno se analiza en un proceso que ve la misma
+        señal sin copiarla: la grabación ya decodificada pasa a memoria
+        compartida (solo viaja su descriptor) y un WAV mapeado se vuelve a
+        mapear (los procesos comparten la page cache). Los resultados se
+        devuelven en orden, así que las estadísticas de analyze_stream() son
+        exactamente las de la ejecución en serie.
+        """
+        chunks = self._word_chunks(words)
+        if len(chunks) <= 1:
+            for word_info in words:
+                yield self._cached_analyze_word(word_info)
+            return
+
+        print(f"  ✓ {len(words)} palabras en {len(chunks)} tramos paralelos")
+        with SharedAudioManager() as shared:
+            if isinstance(self.buffer, MappedWavReader):
+                source = self.audio_path
+            elif isinstance(self.buffer, SharedRecordingBuffer):
+                source = self.buffer.descriptor
+            else:
+                source = shared.share(self.buffer)
+            # El hash del audio se calcula aquí una vez, no en cada tramo
+            tasks = [(self.audio_path, source, chunk, self.params, self.cache, self.tracks.store,
+                      self.tracks.audio_hash) for chunk in chunks]
+            results = run_parallel(_analyze_word_chunk, tasks, len(chunks), threads=1)
+
+        for analyses, hits, misses, tracks in results:
+            if self.cache is not None:
+                self.cache.hits += hits
+                self.cache.misses += misses
+            # Se guardan con el resto de la grabación (un solo save() al terminar)
+            self.tracks.add(tracks)
+            yield from analyses
+
+    def _cached_analyze_word(self, word_info):
+        """
+        analyze_word() pasando por la caché persistente (si hay).
+
+        La clave incluye el hash del audio, los límites y el texto de la palabra,
+        los parámetros y ENGINE_VERSION: al corregir una frontera en el JSON de
+        transcripción solo se recalculan las palabras afectadas. También se
+        guardan las palabras que no se pudieron analizar (resultado None).
+        """
+        if self.cache is None:
+            return self.analyze_word(word_info)
+
+        key = self.cache.word_key(self.tracks.audio_hash, word_info, self.params, ENGINE_VERSION)
+
+        found, analysis = self.cache.get(key)
+        if not found:
+            analysis = self.analyze_word(word_info)
+            self.cache.put(key, analysis)
+        return analysis
+
+    def _store_running_results(self, running, words_analyzed, num_vowels):
+        """Vuelca las estadísticas incrementales en self.results (salvo la mediana)."""
+        if running['pitch'].count:
+            self.results['pitch_mean'] = running['pitch'].mean
+            self.results['pitch_std'] = running['pitch'].std
+
+        for key in ('f1', 'f2', 'f3'):
+            if running[key].count:
+                self.results[f'{key}_mean'] = running[key].mean
+                self.results[f'{key}_std'] = running[key].std
+
+        self.results['num_vowels'] = num_vowels
+        self.results['words_analyzed'] = words_analyzed
+
+    def adapt_pitch_range(self, pitch_range=None):
+        """
+        Ajusta el rango de F0 del análisis al hablante (primera pasada barata).
+
+        Args:
+            pitch_range: dict de pitch_range (p.ej. estimado con todas las grabaciones
+                del hablante); por defecto se estima con esta grabación
+        """
+        self.pitch_range = pitch_range or estimate_pitch_range(self.buffer)
+        self.params['pitch_floor'] = self.pitch_range['floor']
+        self.params['pitch_ceiling'] = self.pitch_range['ceiling']
+        # El rango forma parte de la clave de las pistas y de la caché de palabras
+        self.tracks = RecordingTracks(self.audio_path, self.params, self.tracks.store)
+
+        self.results['pitch_floor'] = self.params['pitch_floor']
+        self.results['pitch_ceiling'] = self.params['pitch_ceiling']
+        if self.pitch_range['adapted']:
+            print(f"  ✓ Rango de F0 adaptado: {self.params['pitch_floor']}-{self.params['pitch_ceiling']} Hz "
+                  f"(mediana {self.pitch_range['median']:.0f} Hz)")
+        else:
+            print(f"  ⚠ Pocos frames sonoros ({self.pitch_range['n_voiced']}): se mantiene el rango por defecto")
+
     def analyze_all(self):
         """Analiza todas las palabras transcritas."""
         print(f"\nAnalizando palabras de: {self.name}")
 
-        for word_info in self.transcription['words']:
-            analysis = self.analyze_word(word_info)
-            if analysis:
-                self.words_analysis.append(analysis)
-
-                # Agregar vocales a la lista global
-                for vowel in analysis['vowels']:
-                    vowel['word'] = analysis['word']
-                    self.vowels_analysis.append(vowel)
-
-        # Calcular estadísticas
-        if self.vowels_analysis:
-            pitch_values = [v['pitch'] for v in self.vowels_analysis if v['pitch'] > 0]
-            f1_values = [v['f1'] for v in self.vowels_analysis]
-            f2_values = [v['f2'] for v in self.vowels_analysis]
-            f3_values = [v['f3'] for v in self.vowels_analysis]
-
-            if pitch_values:
-                self.results['pitch_mean'] = np.mean(pitch_values)
-                self.results['pitch_std'] = np.std(pitch_values)
-                self.results['pitch_median'] = np.median(pitch_values)
-
-            if f1_values:
-                self.results['f1_mean'] = np.mean(f1_values)
-                self.results['f1_std'] = np.std(f1_values)
-            if f2_values:
-                self.results['f2_mean'] = np.mean(f2_values)
-                self.results['f2_std'] = np.std(f2_values)
-            if f3_values:
-                self.results['f3_mean'] = np.mean(f3_values)
-                self.results['f3_std'] = np.std(f3_values)
-
-        self.results['num_vowels'] = len(self.vowels_analysis)
-        self.results['words_analyzed'] = len(self.words_analysis)
+        self.results['num_vowels'] = 0
+        self.results['words_analyzed'] = 0
+
+        for kind, item in self.analyze_stream():
+            if kind == 'word':
+                # El pitch pasa al array compartido; la palabra guarda solo su posición
+                item['pitch_offset'], item['pitch_count'] = self.pitch_store.append(item.pop('pitch_values'))
+                self.words_analysis.append(item)
+            else:
+                # Agregar vocales a la tabla global
+                self.vowels_analysis.append(item, speaker=self.name)
+
+        # LTAS de los frames sonoros, recorriendo la grabación por bloques
+        self.ltas = LTASAccumulator.from_buffer(self.buffer)
+        self.results['ltas_voiced_frames'] = self.ltas.voiced_frames
 
         print(f"  ✓ Palabras analizadas: {len(self.words_analysis)}")
         print(f"  ✓ Vocales detectadas: {len(self.vowels_analysis)}")
+        print(f"  ✓ LTAS: {self.ltas.voiced_frames}/{self.ltas.total_frames} frames sonoros")
         if self.results.get('pitch_mean'):
             print(f"  ✓ F0 medio: {self.results['pitch_mean']:.1f} ± {self.results['pitch_std']:.1f} Hz")
         if self.results.get('f1_mean'):
@@ -378,6 +714,16 @@ class WordBasedVoiceAnalyzer:
 
         return self.results
 
+    def word_audio(self, word_analysis):
+        """Audio de una palabra analizada, leído bajo demanda de la grabación."""
+        return self.buffer.read(word_analysis['start_sample'], word_analysis['end_sample'])
+
+    def word_pitch_values(self, word_analysis):
+        """Valores de pitch de una palabra (vista sobre el array compartido)."""
+        if 'pitch_values' in word_analysis:
+            return word_analysis['pitch_values']
+        return self.pitch_store.get(word_analysis['pitch_offset'], word_analysis['pitch_count'])
+
     def export_word_audios(self, output_dir="word_audios"):
         """
         Exporta cada palabra como archivo WAV individual.
@@ -409,7 +755,7 @@ class WordBasedVoiceAnalyzer:
             filepath = output_path / filename
 
             # Guardar audio
-            sf.write(filepath, word_analysis['audio'], self.sr)
+            sf.write(filepath, self.word_audio(word_analysis), self.sr)
 
         print(f"  ✓ Exportadas {len(self.words_analysis)} palabras")
 
@@ -419,10 +765,10 @@ def classify_vowels(all_vowels):
     Reporta estadísticas de vocales identificadas por transcripción y valida con k-means.
 
     Args:
-        all_vowels: Lista de diccionarios con vocales (ya contienen 'vowel_class' de transcripción)
+        all_vowels: VowelTable con las vocales (ya contienen 'vowel_class' de transcripción)
 
     Returns:
-        Lista de vocales con validación de k-means añadida
+        La misma VowelTable con las columnas 'cluster' y 'kmeans_vowel' rellenadas
     """
     if len(all_vowels) < 5:
         print("⚠ No hay suficientes vocales para análisis")
@@ -433,36 +779,31 @@ def classify_vowels(all_vowels):
     print("="*70)
 
     # Contar vocales identificadas por transcripción
-    from_transcription = [v for v in all_vowels if v.get('vowel_source') == 'transcription']
-    from_partial = [v for v in all_vowels if v.get('vowel_source') == 'transcription_partial']
-    from_acoustic = [v for v in all_vowels if v.get('vowel_source') == 'acoustic_only']
+    from_transcription = all_vowels.mask(vowel_source='transcription')
+    from_partial = all_vowels.mask(vowel_source='transcription_partial')
+    from_acoustic = all_vowels.mask(vowel_source='acoustic_only')
 
     print(f"\n📝 Identificación basada en transcripción Whisper:")
-    print(f"  ✓ Perfecta coincidencia: {len(from_transcription)} vocales")
-    print(f"  ⚠ Coincidencia parcial: {len(from_partial)} vocales")
-    print(f"  ? Solo acústica: {len(from_acoustic)} vocales")
+    print(f"  ✓ Perfecta coincidencia: {from_transcription.sum()} vocales")
+    print(f"  ⚠ Coincidencia parcial: {from_partial.sum()} vocales")
+    print(f"  ? Solo acústica: {from_acoustic.sum()} vocales")
 
     # Contar por tipo de vocal (de transcripción)
-    vowel_counts = {}
-    for vowel in all_vowels:
-        vclass = vowel.get('vowel_class', '/unknown/')
-        vowel_counts[vclass] = vowel_counts.get(vclass, 0) + 1
+    vowel_classes = [vclass or '/unknown/' for vclass in all_vowels['vowel_class']]
+    classes, counts = np.unique(vowel_classes, return_counts=True)
 
     print(f"\n✓ Distribución de vocales (por transcripción):")
-    for vclass in sorted(vowel_counts.keys()):
-        count = vowel_counts[vclass]
+    for vclass, count in zip(classes, counts):
         print(f"  {vclass}: {count} vocales")
 
     # Validación con K-means (solo informativa)
     print(f"\n🔬 Validación con clustering K-means (comparación):")
 
     # Extraer F1 y F2
-    f1_values = np.array([v['f1'] for v in all_vowels]).reshape(-1, 1)
-    f2_values = np.array([v['f2'] for v in all_vowels]).reshape(-1, 1)
+    features = np.column_stack([all_vowels['f1'], all_vowels['f2']])
 
     # Normalizar (para que F1 y F2 tengan peso similar)
     scaler = StandardScaler()
-    features = np.hstack([f1_values, f2_values])
     features_scaled = scaler.fit_transform(features)
 
     # K-means con 5 clusters (para /a/, /e/, /i/, /o/, /u/)
@@ -528,9 +869,8 @@ def classify_vowels(all_vowels):
             used_vowels.add(best_vowel)
 
     # Añadir clustering como validación (NO sobrescribe vowel_class de transcripción)
-    for i, vowel in enumerate(all_vowels):
-        vowel['cluster'] = int(labels[i])
-        vowel['kmeans_vowel'] = cluster_to_vowel[labels[i]]  # K-means sugiere esta vocal
+    all_vowels['cluster'] = labels
+    all_vowels['kmeans_vowel'] = [cluster_to_vowel[label] for label in labels]  # K-means sugiere esta vocal
 
     # Mostrar clusters detectados por k-means
     print(f"  Clusters K-means encontrados:")
@@ -542,14 +882,10 @@ def classify_vowels(all_vowels):
         print(f"    Cluster {cluster_id} → {vowel_name}: {count} vocales (F1={f1_mean:.0f}, F2={f2_mean:.0f})")
 
     # Comparar transcripción vs k-means
-    agreements = 0
-    disagreements = 0
-    for vowel in all_vowels:
-        if vowel.get('vowel_source') == 'transcription':
-            if vowel['vowel_class'] == vowel['kmeans_vowel']:
-                agreements += 1
-            else:
-                disagreements += 1
+    # (vowel_class y kmeans_vowel comparten vocabulario, así que basta comparar códigos)
+    same = all_vowels.codes('vowel_class') == all_vowels.codes('kmeans_vowel')
+    agreements = int(np.sum(same & from_transcription))
+    disagreements = int(np.sum(~same & from_transcription))
 
     if agreements + disagreements > 0:
         accuracy = agreements / (agreements + disagreements) * 100
@@ -569,8 +905,8 @@ def analyze_by_vowel_type(girls_vowels, boys_vowels):
     Análisis comparativo por tipo de vocal.
 
     Args:
-        girls_vowels: Vocales de niñas (con campo 'vowel_class')
-        boys_vowels: Vocales de niños (con campo 'vowel_class')
+        girls_vowels: VowelTable de niñas (con columna 'vowel_class')
+        boys_vowels: VowelTable de niños (con columna 'vowel_class')
 
     Returns:
         dict con resultados por vocal
@@ -583,8 +919,8 @@ def analyze_by_vowel_type(girls_vowels, boys_vowels):
     results_by_vowel = {}
 
     for vowel_type in vowel_types:
-        girls_v = [v for v in girls_vowels if v.get('vowel_class') == vowel_type]
-        boys_v = [v for v in boys_vowels if v.get('vowel_class') == vowel_type]
+        girls_v = girls_vowels.select(vowel_class=vowel_type)
+        boys_v = boys_vowels.select(vowel_class=vowel_type)
 
         if len(girls_v) < 2 or len(boys_v) < 2:
             print(f"\n{vowel_type}: Insuficientes muestras (niñas:{len(girls_v)}, niños:{len(boys_v)})")
@@ -597,8 +933,8 @@ def analyze_by_vowel_type(girls_vowels, boys_vowels):
         results_by_vowel[vowel_type] = {}
 
         # Comparar pitch
-        girls_pitch = [v['pitch'] for v in girls_v if v['pitch'] > 0]
-        boys_pitch = [v['pitch'] for v in boys_v if v['pitch'] > 0]
+        girls_pitch = girls_v.voiced_pitch()
+        boys_pitch = boys_v.voiced_pitch()
 
         if len(girls_pitch) >= 2 and len(boys_pitch) >= 2:
             t_stat, p_val = stats.ttest_ind(girls_pitch, boys_pitch)
@@ -611,8 +947,8 @@ def analyze_by_vowel_type(girls_vowels, boys_vowels):
             print(f"  F0: niñas={np.mean(girls_pitch):.1f} Hz, niños={np.mean(boys_pitch):.1f} Hz, p={p_val:.4f} {'*' if p_val<0.05 else 'n.s.'}")
 
         # Comparar F1
-        girls_f1 = [v['f1'] for v in girls_v]
-        boys_f1 = [v['f1'] for v in boys_v]
+        girls_f1 = girls_v['f1']
+        boys_f1 = boys_v['f1']
 
         if len(girls_f1) >= 2 and len(boys_f1) >= 2:
             t_stat, p_val = stats.ttest_ind(girls_f1, boys_f1)
@@ -625,8 +961,8 @@ def analyze_by_vowel_type(girls_vowels, boys_vowels):
             print(f"  F1: niñas={np.mean(girls_f1):.0f} Hz, niños={np.mean(boys_f1):.0f} Hz, p={p_val:.4f} {'*' if p_val<0.05 else 'n.s.'}")
 
         # Comparar F2
-        girls_f2 = [v['f2'] for v in girls_v]
-        boys_f2 = [v['f2'] for v in boys_v]
+        girls_f2 = girls_v['f2']
+        boys_f2 = boys_v['f2']
 
         if len(girls_f2) >= 2 and len(boys_f2) >= 2:
             t_stat, p_val = stats.ttest_ind(girls_f2, boys_f2)
@@ -641,47 +977,47 @@ def analyze_by_vowel_type(girls_vowels, boys_vowels):
     return results_by_vowel
 
 
-def compare_genders(analyzers):
+def compare_genders(analyzers, manifest=None):
     """
     Análisis estadístico comparando niños vs niñas.
 
     Prueba la hipótesis de los papers: diferencias acústicas pequeñas
     pero diferencias perceptuales grandes.
+
+    Args:
+        analyzers: lista de WordBasedVoiceAnalyzer con las vocales clasificadas
+        manifest: CorpusManifest con el género de cada grabación (por defecto corpus.csv)
     """
     print("\n" + "="*70)
     print("ANÁLISIS COMPARATIVO: NIÑOS vs NIÑAS")
     print("="*70)
 
-    # Separar por género
-    girls = [a for a in analyzers if 'ninia' in a.name.lower()]
-    boys = [a for a in analyzers if 'ninio' in a.name.lower()]
+    # Separar por género (según el manifiesto del corpus)
+    groups = (manifest or CorpusManifest()).group_analyzers(analyzers, 'gender')
+    girls, boys = groups.get('F', []), groups.get('M', [])
+    if groups.get(None):
+        print(f"\n⚠ Sin género en el manifiesto (se excluyen): {', '.join(a.name for a in groups[None])}")
 
     print(f"\nNiñas: {len(girls)} grabaciones")
     print(f"Niños: {len(boys)} grabaciones")
 
     # Recolectar todas las vocales
-    girls_vowels = []
-    boys_vowels = []
-
-    for a in girls:
-        girls_vowels.extend(a.vowels_analysis)
-
-    for a in boys:
-        boys_vowels.extend(a.vowels_analysis)
+    girls_vowels = VowelTable.concatenate([a.vowels_analysis for a in girls])
+    boys_vowels = VowelTable.concatenate([a.vowels_analysis for a in boys])
 
     print(f"\nVocales totales:")
     print(f"  Niñas: {len(girls_vowels)} vocales")
     print(f"  Niños: {len(boys_vowels)} vocales")
 
     # Extraer métricas
-    girls_pitch = [v['pitch'] for v in girls_vowels if v['pitch'] > 0]
-    boys_pitch = [v['pitch'] for v in boys_vowels if v['pitch'] > 0]
+    girls_pitch = girls_vowels.voiced_pitch()
+    boys_pitch = boys_vowels.voiced_pitch()
 
-    girls_f1 = [v['f1'] for v in girls_vowels]
-    boys_f1 = [v['f1'] for v in boys_vowels]
+    girls_f1 = girls_vowels['f1']
+    boys_f1 = boys_vowels['f1']
 
-    girls_f2 = [v['f2'] for v in girls_vowels]
-    boys_f2 = [v['f2'] for v in boys_vowels]
+    girls_f2 = girls_vowels['f2']
+    boys_f2 = boys_vowels['f2']
 
     # Pruebas estadísticas
     results = {}
@@ -691,7 +1027,7 @@ def compare_genders(analyzers):
     print("-"*70)
 
     # F0
-    if girls_pitch and boys_pitch:
+    if len(girls_pitch) and len(boys_pitch):
         t_stat, p_value = stats.ttest_ind(girls_pitch, boys_pitch)
         cohen_d = (np.mean(girls_pitch) - np.mean(boys_pitch)) / np.sqrt((np.std(girls_pitch)**2 + np.std(boys_pitch)**2) / 2)
 
@@ -715,7 +1051,7 @@ def compare_genders(analyzers):
         print(f"  ¿Significativo? {'SÍ' if p_value < 0.05 else 'NO'} (α=0.05)")
 
     # F1
-    if girls_f1 and boys_f1:
+    if len(girls_f1) and len(boys_f1):
         t_stat, p_value = stats.ttest_ind(girls_f1, boys_f1)
         cohen_d = (np.mean(girls_f1) - np.mean(boys_f1)) / np.sqrt((np.std(girls_f1)**2 + np.std(boys_f1)**2) / 2)
 
@@ -739,7 +1075,7 @@ def compare_genders(analyzers):
         print(f"  ¿Significativo? {'SÍ' if p_value < 0.05 else 'NO'}")
 
     # F2
-    if girls_f2 and boys_f2:
+    if len(girls_f2) and len(boys_f2):
         t_stat, p_value = stats.ttest_ind(girls_f2, boys_f2)
         cohen_d = (np.mean(girls_f2) - np.mean(boys_f2)) / np.sqrt((np.std(girls_f2)**2 + np.std(boys_f2)**2) / 2)
 
@@ -762,6 +1098,34 @@ def compare_genders(analyzers):
         print(f"  Cohen's d = {cohen_d:.3f}")
         print(f"  ¿Significativo? {'SÍ' if p_value < 0.05 else 'NO'}")
 
+    # LTAS: nivel de cada banda relativo al total, por frame sonoro
+    girls_ltas = LTASAccumulator.combine([a.ltas for a in girls])
+    boys_ltas = LTASAccumulator.combine([a.ltas for a in boys])
+    if girls_ltas is not None and boys_ltas is not None and min(girls_ltas.voiced_frames, boys_ltas.voiced_frames) > 1:
+        print(f"\nLTAS (frames sonoros: niñas {girls_ltas.voiced_frames}, niños {boys_ltas.voiced_frames}):")
+        results['ltas'] = {}
+        girls_levels, boys_levels = girls_ltas.band_levels(), boys_ltas.band_levels()
+        for (lo, hi), g, b in zip(girls_ltas.bands, girls_ltas.band_stats, boys_ltas.band_stats):
+            t_stat, p_value = stats.ttest_ind_from_stats(g.mean, g.std * np.sqrt(g.count / (g.count - 1)), g.count,
+                                                         b.mean, b.std * np.sqrt(b.count / (b.count - 1)), b.count)
+            cohen_d = (g.mean - b.mean) / np.sqrt((g.std**2 + b.std**2) / 2)
+
+            results['ltas'][f'{lo}-{hi}'] = {
+                'girls_mean': float(g.mean),
+                'girls_std': float(g.std),
+                'boys_mean': float(b.mean),
+                'boys_std': float(b.std),
+                'girls_ltas_level': float(girls_levels[f'{lo}-{hi}']),
+                'boys_ltas_level': float(boys_levels[f'{lo}-{hi}']),
+                't_statistic': float(t_stat),
+                'p_value': float(p_value),
+                'cohen_d': float(cohen_d),
+                'significant': bool(p_value < 0.05)
+            }
+
+            print(f"  {lo}-{hi} Hz: niñas {g.mean:.1f} ± {g.std:.1f} dB, niños {b.mean:.1f} ± {b.std:.1f} dB, "
+                  f"p = {p_value:.4f}, d = {cohen_d:.3f} {'(SÍ)' if p_value < 0.05 else '(NO)'}")
+
     print("\n" + "-"*70)
     print("INTERPRETACIÓN (según Funk & Simpson 2023):")
     print("-"*70)
@@ -808,8 +1172,8 @@ def create_comparison_visualizations(analyzers, stats_results, girls_vowels, boy
     # 1. Comparación de distribuciones de pitch
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
 
-    girls_pitch = [v['pitch'] for v in girls_vowels if v['pitch'] > 0]
-    boys_pitch = [v['pitch'] for v in boys_vowels if v['pitch'] > 0]
+    girls_pitch = girls_vowels.voiced_pitch()
+    boys_pitch = boys_vowels.voiced_pitch()
 
     # Histogramas
     axes[0, 0].hist(girls_pitch, bins=30, alpha=0.6, color='#FF1493', label='Niñas', density=True)
@@ -839,10 +1203,10 @@ def create_comparison_visualizations(analyzers, stats_results, girls_vowels, boy
                        ha='center', fontsize=11, fontweight='bold')
 
     # Formantes
-    girls_f1 = [v['f1'] for v in girls_vowels]
-    boys_f1 = [v['f1'] for v in boys_vowels]
-    girls_f2 = [v['f2'] for v in girls_vowels]
-    boys_f2 = [v['f2'] for v in boys_vowels]
+    girls_f1 = girls_vowels['f1']
+    boys_f1 = boys_vowels['f1']
+    girls_f2 = girls_vowels['f2']
+    boys_f2 = boys_vowels['f2']
 
     # F1 comparison
     data_f1 = [girls_f1, boys_f1]
@@ -923,17 +1287,17 @@ def visualize_by_vowel_type(vowel_type_results, girls_vowels, boys_vowels):
     # Preparar datos por vocal
     data_by_vowel = {}
     for vowel_type in vowel_types:
-        girls_v = [v for v in girls_vowels if v.get('vowel_class') == vowel_type]
-        boys_v = [v for v in boys_vowels if v.get('vowel_class') == vowel_type]
+        girls_v = girls_vowels.select(vowel_class=vowel_type)
+        boys_v = boys_vowels.select(vowel_class=vowel_type)
 
         if len(girls_v) >= 2 and len(boys_v) >= 2:
             data_by_vowel[vowel_type] = {
-                'girls_f0': [v['pitch'] for v in girls_v if v['pitch'] > 0],
-                'boys_f0': [v['pitch'] for v in boys_v if v['pitch'] > 0],
-                'girls_f1': [v['f1'] for v in girls_v],
-                'boys_f1': [v['f1'] for v in boys_v],
-                'girls_f2': [v['f2'] for v in girls_v],
-                'boys_f2': [v['f2'] for v in boys_v]
+                'girls_f0': girls_v.voiced_pitch(),
+                'boys_f0': boys_v.voiced_pitch(),
+                'girls_f1': girls_v['f1'],
+                'boys_f1': boys_v['f1'],
+                'girls_f2': girls_v['f2'],
+                'boys_f2': boys_v['f2']
             }
 
     if not data_by_vowel:
@@ -1051,33 +1415,31 @@ def visualize_by_vowel_type(vowel_type_results, girls_vowels, boys_vowels):
     plt.close()
 
 
-def visualize_f0_contours(analyzers):
+def visualize_f0_contours(analyzers, manifest=None):
     """
     Visualización #3: Evolución temporal de F0 (contornos de entonación).
 
     Muestra cómo cambia F0 a lo largo del tiempo para cada grabación,
     revelando patrones prosódicos que podrían diferir entre géneros.
+    El género de cada grabación sale del manifiesto (por defecto corpus.csv).
     """
     print("\n  Generando: Contornos de entonación (F0 temporal)...")
 
     # Separar por género
-    girls = [a for a in analyzers if 'ninia' in a.name.lower()]
-    boys = [a for a in analyzers if 'ninio' in a.name.lower()]
+    groups = (manifest or CorpusManifest()).group_analyzers(analyzers, 'gender')
+    girls, boys = groups.get('F', []), groups.get('M', [])
 
     # Crear figura con 2 subplots (niñas arriba, niños abajo)
     fig, axes = plt.subplots(2, 1, figsize=(16, 10))
 
     # Niñas
     for i, analyzer in enumerate(girls):
-        times = []
-        f0_values = []
+        vowels = analyzer.vowels_analysis
+        voiced = vowels['pitch'] > 0
+        times = vowels['global_time'][voiced]
+        f0_values = vowels['pitch'][voiced]
 
-        for vowel in analyzer.vowels_analysis:
-            if vowel['pitch'] > 0:
-                times.append(vowel['global_time'])
-                f0_values.append(vowel['pitch'])
-
-        if times:
+        if len(times):
             color = COLORS_GIRLS[i % len(COLORS_GIRLS)]
             axes[0].plot(times, f0_values, 'o-', label=analyzer.name,
                         color=color, alpha=0.7, linewidth=2, markersize=6)
@@ -1090,15 +1452,12 @@ def visualize_f0_contours(analyzers):
 
     # Niños
     for i, analyzer in enumerate(boys):
-        times = []
-        f0_values = []
-
-        for vowel in analyzer.vowels_analysis:
-            if vowel['pitch'] > 0:
-                times.append(vowel['global_time'])
-                f0_values.append(vowel['pitch'])
+        vowels = analyzer.vowels_analysis
+        voiced = vowels['pitch'] > 0
+        times = vowels['global_time'][voiced]
+        f0_values = vowels['pitch'][voiced]
 
-        if times:
+        if len(times):
             color = COLORS_BOYS[i % len(COLORS_BOYS)]
             axes[1].plot(times, f0_values, 'o-', label=analyzer.name,
                         color=color, alpha=0.7, linewidth=2, markersize=6)
@@ -1119,73 +1478,281 @@ def visualize_f0_contours(analyzers):
     plt.close()
 
 
-def main():
-    """Función principal."""
-    print("="*70)
-    print("ANÁLISIS BASADO EN TRANSCRIPCIÓN AUTOMÁTICA")
-    print("="*70)
-    print("\nEste análisis:")
-    print("  1. Transcribe el audio con Whisper (palabras reales con timestamps)")
-    print("  2. Segmenta basándose en palabras transcritas (no en silencios)")
-    print("  3. Extrae vocales de palabras reales")
-    print("  4. Compara niños vs niñas estadísticamente")
-    print("  5. Relaciona con literatura sobre percepción de género")
-    print("="*70)
+def _analyze_word_chunk(task):
+    """
+    Worker del pool: analiza un tramo de palabras de una grabación.
 
-    # Buscar archivos
-    audio_files = sorted(Path('.').glob('audio_*.wav'))
-    if not audio_files:
-        print("\n❌ No se encontraron archivos audio_*.wav")
-        return
+    Las pistas nuevas se devuelven en lugar de guardarse: el proceso principal
+    las junta y escribe el .npz de la grabación una sola vez.
+    """
+    audio_file, source, words, params, cache, track_store, audio_hash = task
+    # source: SharedAudioDescriptor de la grabación decodificada, o la ruta de un WAV mapeable
+    buffer = SharedRecordingBuffer(source) if isinstance(source, SharedAudioDescriptor) \
+        else open_recording(source, mmap=True)
+    analyzer = WordBasedVoiceAnalyzer(audio_file, {'text': '', 'words': words}, cache=cache,
+                                      params=params, track_store=track_store, buffer=buffer)
+    analyzer.tracks = RecordingTracks(audio_file, analyzer.params, track_store, audio_hash=audio_hash)
+    if cache is not None:
+        hits, misses = cache.hits, cache.misses
+    analyses = [analyzer._cached_analyze_word(word_info) for word_info in words]
+    tracks = analyzer.tracks.take_new()
+
+    del analyzer
+    if isinstance(buffer, SharedRecordingBuffer):
+        buffer.close()
+    if cache is None:
+        return analyses, 0, 0, tracks
+    return analyses, cache.hits - hits, cache.misses - misses, tracks
+
+
+def _analyze_file(task):
+    """Worker del pool: analiza una grabación y devuelve sus tablas de resultados."""
+    audio_file, transcription, kwargs = task
+    analyzer = WordBasedVoiceAnalyzer(audio_file, transcription, **kwargs)
+    analyzer.analyze_all()
+    return analyzer.result_tables()
+
+
+def analyze_files(audio_files, transcriptions, workers=WORKERS, chunksize=CHUNKSIZE, threads=None, **kwargs):
+    """
+    Analiza varias grabaciones en un pool de procesos.
 
-    print(f"\n📁 Archivos: {len(audio_files)}")
-    for f in audio_files:
-        print(f"   • {f.name}")
+    Args:
+        audio_files: archivos de audio
+        transcriptions: dict archivo -> transcripción
+        workers, chunksize, threads: ver parallel.run_parallel
+        **kwargs: argumentos de WordBasedVoiceAnalyzer (cache, track_store, sampler...)
 
-    # Transcribir con Whisper
-    # Modelo "large" es el más preciso (pero más lento)
-    # Opciones: tiny, base, small, medium, large
-    transcriber = WhisperTranscriber(model_name="large")
-
-    transcriptions = {}
-    for audio_file in audio_files:
-        transcription = transcriber.transcribe(audio_file)
-        transcriptions[audio_file] = transcription
-
-        # Guardar transcripción
-        trans_file = audio_file.stem + "_transcription.json"
-        with open(trans_file, 'w', encoding='utf-8') as f:
-            json.dump(transcription, f, ensure_ascii=False, indent=2)
-
-    # Analizar cada archivo
-    analyzers = []
-    for audio_file in audio_files:
-        print(f"\n{'='*70}")
-        analyzer = WordBasedVoiceAnalyzer(audio_file, transcriptions[audio_file])
+    Returns:
+        lista de WordBasedVoiceAnalyzer analizados, en el orden de audio_files
+    """
+    tasks = [(audio_file, transcriptions[audio_file], kwargs) for audio_file in audio_files]
+    tables = run_parallel(_analyze_file, tasks, workers, chunksize,
+                          costs=[os.path.getsize(f) for f in audio_files], threads=threads)
+    return [WordBasedVoiceAnalyzer.from_tables(audio_file, transcriptions[audio_file], result, **kwargs)
+            for audio_file, result in zip(audio_files, tables)]
+
+
+def _analyze_shared_file(task):
+    """Worker del pipeline: analiza una grabación ya decodificada en memoria compartida."""
+    audio_file, descriptor, transcription, kwargs = task
+    with SharedRecordingBuffer(descriptor) as buffer:
+        analyzer = WordBasedVoiceAnalyzer(audio_file, transcription, buffer=buffer, **kwargs)
         analyzer.analyze_all()
+        # Nada debe apuntar al segmento al soltarlo (las tablas no tienen audio)
+        analyzer.buffer = analyzer.formant_cache = analyzer._snd = None
+    return analyzer.result_tables()
 
-        # NUEVO: Exportar audios de palabras individuales
-        analyzer.export_word_audios()
 
-        analyzers.append(analyzer)
+class TranscriptionPipeline:
+    """
+    Decodificación, Whisper, análisis y exportación solapados por archivo.
+
+    main() por fases espera a que Whisper termine con todos los archivos antes
+    de analizar el primero. Aquí cada etapa es una corrutina de asyncio unida
+    a la siguiente por una cola acotada, y el trabajo se hace en executors:
+
+    1. decode (hilos): carga la grabación y la copia a memoria compartida
+    2. transcribe (un hilo: un único modelo de Whisper): reutiliza el JSON si
+       existe; si no, transcribe y lo guarda
+    3. analyze (procesos): análisis acústico por palabras sobre el segmento
+       compartido, sin copiar ni serializar el audio
+    4. persist (hilos): exporta los audios de palabras y libera el segmento
+
+    Así el análisis de un archivo empieza en cuanto termina su transcripción
+    y queda oculto tras Whisper. Las colas acotadas limitan cuántas
+    grabaciones decodificadas esperan en memoria a la vez.
+
+    Cada análisis pasa por el ResourceGate del plan: empieza solo si hay un
+    núcleo libre y su memoria estimada (analysis_task_memory) cabe junto a la
+    del modelo de Whisper. Cuando se acaban las transcripciones el modelo se
+    libera y el análisis pasa a usar todos los núcleos.
+    """
 
+    def __init__(self, model_name="large", plan=None, queue_size=2, export_audio=True, **analyzer_kwargs):
+        """
+        Args:
+            model_name: modelo de Whisper (solo se carga si falta alguna transcripción)
+            plan: ExecutionPlan con los hilos de Whisper y los procesos de análisis
+                (por defecto ExecutionPlan.detect(transcribe=True, workers=WORKERS, model_name=model_name))
+            queue_size: elementos máximos en cada cola entre etapas
+            export_audio: exportar los audios de palabras (export_word_audios)
+            **analyzer_kwargs: argumentos de WordBasedVoiceAnalyzer (cache, track_store...)
+        """
+        self.model_name = model_name
+        self.plan = plan or ExecutionPlan.detect(transcribe=True, workers=WORKERS, model_name=model_name)
+        self.queue_size = queue_size
+        self.export_audio = export_audio
+        self.analyzer_kwargs = analyzer_kwargs
+        self.transcriber = None
+        self.transcriptions = {}
+
+    def run(self, audio_files):
+        """
+        Procesa los archivos.
+
+        Returns:
+            lista de WordBasedVoiceAnalyzer analizados, en el orden de audio_files
+        """
+        return asyncio.run(self._run(list(audio_files)))
+
+    async def _run(self, audio_files):
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(4)]
+        results = [None] * len(audio_files)
+
+        plan = self.plan
+        gate = plan.gate()
+
+        # El pool puede crecer hasta todos los núcleos (los procesos se crean al usarse);
+        # cuántos análisis corren a la vez lo decide gate. Los procesos salen de un
+        # forkserver, no de este proceso (que puede tener Whisper cargado)
+        with SharedAudioManager() as shared, \
+                ThreadPoolExecutor(max_workers=2) as io_pool, \
+                ThreadPoolExecutor(max_workers=1) as whisper_pool, \
+                ProcessPoolExecutor(max_workers=plan.cores, mp_context=worker_context([__name__]),
+                                    initializer=limit_threads,
+                                    initargs=(plan.threads_per_worker,)) as analysis_pool:
+
+            def decode(item):
+                index, audio_file = item
+                return index, audio_file, shared.share(open_recording(audio_file))
+
+            def transcribe(item):
+                index, audio_file, descriptor = item
+                return index, audio_file, descriptor, self._transcription(audio_file)
+
+            def persist(item):
+                index, descriptor, analyzer = item
+                shared.release(descriptor)
+                if self.export_audio:
+                    analyzer.export_word_audios()
+                results[index] = analyzer
+
+            async def analyze(item):
+                index, audio_file, descriptor, transcription = item
+                task = (audio_file, descriptor, transcription, self.analyzer_kwargs)
+                task_memory = analysis_task_memory(descriptor.length / descriptor.sr, descriptor.sr)
+                async with gate.reserve(task_memory):
+                    tables = await asyncio.get_running_loop().run_in_executor(
+                        analysis_pool, _analyze_shared_file, task)
+                analyzer = WordBasedVoiceAnalyzer.from_tables(audio_file, transcription, tables,
+                                                              **self.analyzer_kwargs)
+                return index, descriptor, analyzer
+
+            async def transcription_stage():
+                # La memoria del modelo queda reservada mientras haya transcripciones
+                await gate.acquire(plan.model_memory, slots=0)
+                await self._stage(transcribe, whisper_pool, queues[1], queues[2])
+                if self.transcriber is not None:
+                    self.transcriber.release()
+                    self.transcriber = None
+                await gate.release(plan.model_memory, slots=0)
+                await gate.resize(plan.cores)
+
+            await asyncio.gather(
+                self._feed(enumerate(audio_files), queues[0]),
+                self._stage(decode, io_pool, queues[0], queues[1], concurrency=2),
+                transcription_stage(),
+                self._stage(analyze, None, queues[2], queues[3], concurrency=plan.cores),
+                self._stage(persist, io_pool, queues[3], None),
+            )
+
+        return results
+
+    @staticmethod
+    async def _feed(items, outbox):
+        for item in items:
+            await outbox.put(item)
+        await outbox.put(None)
+
+    @staticmethod
+    async def _stage(fn, executor, inbox, outbox, concurrency=1):
+        """
+        Etapa del pipeline: `concurrency` consumidores leen de inbox, ejecutan fn
+        en el executor (o la esperan si es una corrutina) y escriben en outbox.
+        None marca el final de la cola.
+        """
+        loop = asyncio.get_running_loop()
+
+        async def consumer():
+            while True:
+                item = await inbox.get()
+                if item is None:
+                    await inbox.put(None)  # para los demás consumidores
+                    return
+                if executor is None:
+                    result = await fn(item)
+                else:
+                    result = await loop.run_in_executor(executor, fn, item)
+                if outbox is not None:
+                    await outbox.put(result)
+
+        await asyncio.gather(*(consumer() for _ in range(concurrency)))
+        if outbox is not None:
+            await outbox.put(None)
+
+    def transcribe_all(self, audio_files):
+        """Transcribe (o carga) todos los archivos, sin análisis, y libera Whisper."""
+        for audio_file in audio_files:
+            self._transcription(audio_file)
+        if self.transcriber is not None:
+            self.transcriber.release()
+            self.transcriber = None
+
+    def _transcription(self, audio_file):
+        """Transcripción existente (*_transcription.json) o nueva con Whisper (y se guarda)."""
+        trans_file = transcription_path(audio_file)
+        if trans_file.exists():
+            with open(trans_file, encoding='utf-8') as f:
+                transcription = json.load(f)
+            print(f"  ✓ Transcripción existente: {trans_file}")
+        else:
+            if self.transcriber is None:
+                self.plan.apply_whisper()
+                self.transcriber = WhisperTranscriber(model_name=self.model_name)
+            transcription = self.transcriber.transcribe(audio_file)
+            with open(trans_file, 'w', encoding='utf-8') as f:
+                json.dump(transcription, f, ensure_ascii=False, indent=2)
+
+        self.transcriptions[audio_file] = transcription
+        return transcription
+
+
+def classify_analyzers(analyzers):
+    """
+    Clasifica las vocales de todas las grabaciones a la vez (k-means global)
+    y deja en cada analizador su parte de la tabla clasificada.
+
+    Args:
+        analyzers: lista de WordBasedVoiceAnalyzer ya analizados
+    """
     # NUEVO: Clasificar vocales automáticamente
-    all_vowels = []
-    for analyzer in analyzers:
-        all_vowels.extend(analyzer.vowels_analysis)
+    all_vowels = VowelTable.concatenate([analyzer.vowels_analysis for analyzer in analyzers])
 
     all_vowels = classify_vowels(all_vowels)
 
-    # Actualizar vocales en analyzers con clasificación
+    # Actualizar vocales en analyzers con clasificación (vistas sobre la tabla global)
     idx = 0
     for analyzer in analyzers:
-        for i in range(len(analyzer.vowels_analysis)):
-            analyzer.vowels_analysis[i] = all_vowels[idx]
-            idx += 1
+        n = len(analyzer.vowels_analysis)
+        analyzer.vowels_analysis = all_vowels.filter(slice(idx, idx + n))
+        idx += n
+
 
+def gender_statistics(analyzers, manifest=None):
+    """
+    Compara géneros (general y por tipo de vocal) y guarda los JSON.
+
+    Args:
+        analyzers: lista de WordBasedVoiceAnalyzer con las vocales clasificadas
+        manifest: CorpusManifest (por defecto corpus.csv)
+
+    Returns:
+        (stats_results, vowel_type_results, girls_vowels, boys_vowels)
+    """
     # Comparar géneros
     print(f"\n{'='*70}")
-    stats_results, girls_vowels, boys_vowels = compare_genders(analyzers)
+    stats_results, girls_vowels, boys_vowels = compare_genders(analyzers, manifest)
 
     # NUEVO: Análisis por tipo de vocal
     vowel_type_results = analyze_by_vowel_type(girls_vowels, boys_vowels)
@@ -1195,17 +1762,121 @@ def main():
         json.dump(vowel_type_results, f, ensure_ascii=False, indent=2)
     print("\n  ✓ gender_by_vowel_stats.json")
 
-    # Visualizaciones
+    # Guardar resultados estadísticos
+    with open('gender_comparison_stats.json', 'w', encoding='utf-8') as f:
+        json.dump(stats_results, f, ensure_ascii=False, indent=2)
+    print("  ✓ gender_comparison_stats.json")
+
+    return stats_results, vowel_type_results, girls_vowels, boys_vowels
+
+
+def gender_visualizations(analyzers, stats_results, vowel_type_results, girls_vowels, boys_vowels,
+                          manifest=None):
+    """Guarda las visualizaciones de la comparación de géneros (PNG)."""
     create_comparison_visualizations(analyzers, stats_results, girls_vowels, boys_vowels)
 
     # NUEVAS: Visualizaciones adicionales
     visualize_by_vowel_type(vowel_type_results, girls_vowels, boys_vowels)
-    visualize_f0_contours(analyzers)
+    visualize_f0_contours(analyzers, manifest)
 
-    # Guardar resultados estadísticos
-    with open('gender_comparison_stats.json', 'w', encoding='utf-8') as f:
-        json.dump(stats_results, f, ensure_ascii=False, indent=2)
-    print("  ✓ gender_comparison_stats.json")
+
+def create_transcription_reports(analyzers, manifest=None):
+    """
+    Clasifica las vocales, compara géneros y guarda visualizaciones y JSON.
+
+    Args:
+        analyzers: lista de WordBasedVoiceAnalyzer ya analizados
+        manifest: CorpusManifest con el género de cada grabación (por defecto corpus.csv)
+
+    Returns:
+        (stats_results, vowel_type_results)
+    """
+    manifest = manifest or CorpusManifest()
+    classify_analyzers(analyzers)
+    stats_results, vowel_type_results, girls_vowels, boys_vowels = gender_statistics(analyzers, manifest)
+    gender_visualizations(analyzers, stats_results, vowel_type_results, girls_vowels, boys_vowels, manifest)
+    return stats_results, vowel_type_results
+
+
+def main():
+    """Función principal."""
+    print("="*70)
+    print("ANÁLISIS BASADO EN TRANSCRIPCIÓN AUTOMÁTICA")
+    print("="*70)
+    print("\nEste análisis:")
+    print("  1. Transcribe el audio con Whisper (palabras reales con timestamps)")
+    print("  2. Segmenta basándose en palabras transcritas (no en silencios)")
+    print("  3. Extrae vocales de palabras reales")
+    print("  4. Compara niños vs niñas estadísticamente")
+    print("  5. Relaciona con literatura sobre percepción de género")
+    print("="*70)
+
+    # Grabaciones del manifiesto del corpus (corpus.csv: hablante, género, edad, sesión)
+    manifest = CorpusManifest()
+    audio_files = [recording.path for recording in manifest.recordings()]
+    if not audio_files:
+        print(f"\n❌ No hay grabaciones en {manifest.path}")
+        return
+
+    print(f"\n📁 Archivos: {len(audio_files)}")
+    for f in audio_files:
+        print(f"   • {f}")
+
+    # Descartar grabaciones defectuosas antes de pagar Whisper y Praat
+    gate = QualityGate()
+    audio_files = gate.screen(audio_files)
+    gate.write_report()
+    if not audio_files:
+        print("\n❌ Ningún archivo superó el control de calidad")
+        return
+
+    # Copias de grabaciones ya indexadas (reexportaciones, recortes): se omiten
+    audio_files = FingerprintIndex('.cache/fingerprints.sqlite').screen(audio_files)
+
+    # Caché persistente de resultados por palabra (solo se recalculan las palabras cambiadas)
+    cache = WordResultCache('.cache/word_results.sqlite')
+    # Pistas de Praat en disco (compartidas con analyze_voices_rigorous.py)
+    track_store = TrackStore('.cache/tracks')
+    # Muestreo estratificado por clase de vocal (solo si SAMPLING está configurado),
+    # con el objetivo de cada hablante repartido entre sus grabaciones
+    sampler = None
+    if SAMPLING:
+        sampler = StratifiedWordSampler(**SAMPLING)
+        sampler.assign_speakers(audio_files, manifest)
+
+    # Transcribir con Whisper y analizar, solapados por archivo (pipeline asyncio)
+    # Modelo "large" es el más preciso (pero más lento)
+    # Opciones: tiny, base, small, medium, large
+    # Si ya existe *_transcription.json se reutiliza (conserva las correcciones manuales)
+    # Reparto de núcleos entre Whisper y el análisis (Whisper solo si falta alguna transcripción)
+    transcribe = any(not transcription_path(f).exists() for f in audio_files)
+    if transcribe and sampler is not None:
+        # El plan de muestreo de un hablante necesita todas sus transcripciones:
+        # se transcribe antes de analizar (sin solapar Whisper con el análisis)
+        TranscriptionPipeline(model_name="large").transcribe_all(audio_files)
+        transcribe = False
+    plan = ExecutionPlan.detect(transcribe=transcribe, workers=WORKERS, model_name="large")
+    print(f"\n{plan.describe()}")
+
+    # Primera pasada (solo con ADAPTIVE_PITCH): rango de F0 de cada hablante
+    pitch_ranges = None
+    if ADAPTIVE_PITCH:
+        print("\n🔎 Estimando el rango de F0 de cada hablante...")
+        pitch_ranges = speaker_pitch_ranges(audio_files, manifest, workers=plan.analysis_workers)
+
+    pipeline = TranscriptionPipeline(model_name="large", plan=plan, cache=cache, track_store=track_store,
+                                     sampler=sampler, word_workers=WORD_WORKERS,
+                                     word_chunk_duration=WORD_CHUNK_DURATION,
+                                     adaptive_pitch=ADAPTIVE_PITCH, pitch_ranges=pitch_ranges)
+    analyzers = pipeline.run(audio_files)
+
+    # Clasificación, comparación de géneros, visualizaciones y JSON
+    create_transcription_reports(analyzers, manifest)
+
+    if sampler is not None:
+        # Fracciones de muestreo (peso = 1 / fracción para ponderar los estadísticos)
+        pd.DataFrame(sampling_report(analyzers)).to_csv('sampling_fractions.csv', index=False)
+        print("  ✓ sampling_fractions.csv")
 
     print("\n" + "="*70)
     print("✅ ANÁLISIS COMPLETADO")
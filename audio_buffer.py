@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Capa de buffers de audio compartida por los analizadores
+========================================================
+Utilidades para que cada grabación se procese una sola vez a nivel de señal:
+
+- RecordingBuffer: un único array maestro float32 por grabación; las palabras
+  y vocales son vistas (sin copia) y la única conversión a float64 ocurre al
+  crear el Sound de Praat de cada tramo.
+- MappedWavReader: misma interfaz, pero sobre el bloque 'data' de un WAV PCM
+  mapeado en memoria. Los tramos son vistas sobre el mapeo y solo se
+  decodifican a float32 las regiones que realmente se analizan; varios
+  procesos comparten la page cache en lugar de tener copias privadas.
+- LazyRecording: grabación que solo se abre si se lee, para los analizadores
+  reconstruidos en el proceso principal con los resultados de un worker.
+- SampleStore: array compacto y creciente donde las palabras guardan sus
+  muestras de pitch; los registros solo conservan (offset, count).
+- SharedAudioManager / SharedRecordingBuffer: grabaciones decodificadas en
+  segmentos de multiprocessing.shared_memory. A los procesos solo viaja un
+  descriptor (segmento, offset, longitud, sr) y cada worker ve las muestras
+  sin copiarlas ni serializarlas.
+- ResampledSignalCache: remuestrea a 2× el techo de formantes (p.ej. 11 kHz
+  para 5500 Hz) con el mismo "Resample" de Praat que usa "To Formant (burg)",
+  así que los formantes no cambian. Los tramos se remuestrean una vez por
+  palabra (no una vez por vocal) y la grabación completa una vez por techo.
+"""
+
+import struct
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+import librosa
+import parselmouth
+import soundfile as sf
+from parselmouth.praat import call
+
+
+class RecordingBuffer:
+    """Señal float32 de una grabación con acceso por vistas a sus tramos."""
+
+    def __init__(self, audio, sr):
+        """
+        Args:
+            audio: señal de audio (se guarda como float32 contiguo, sin copiar si ya lo es)
+            sr: sample rate
+        """
+        self.audio = np.ascontiguousarray(audio, dtype=np.float32)
+        self.sr = int(sr)
+
+    @classmethod
+    def load(cls, audio_path):
+        """Carga un archivo a su frecuencia nativa (librosa ya devuelve float32)."""
+        y, sr = librosa.load(audio_path, sr=None)
+        return cls(y, sr)
+
+    @property
+    def n_samples(self):
+        return len(self.audio)
+
+    @property
+    def duration(self):
+        return self.n_samples / self.sr
+
+    def sample_range(self, start_time, end_time):
+        """Convierte un intervalo en segundos a índices de muestra."""
+        start_sample = max(0, int(start_time * self.sr))
+        end_sample = min(self.n_samples, int(end_time * self.sr))
+        return start_sample, max(start_sample, end_sample)
+
+    def read(self, start_sample, end_sample):
+        """Muestras float32 de [start_sample, end_sample) (aquí, una vista sin copia)."""
+        return self.audio[start_sample:end_sample]
+
+    def view(self, start_time, end_time):
+        """Tramo float32 de la grabación, en segundos."""
+        start_sample, end_sample = self.sample_range(start_time, end_time)
+        return self.read(start_sample, end_sample)
+
+    def rms_envelope(self, frame_length, hop_length):
+        """Energía RMS por frame (equivalente a librosa.feature.rms)."""
+        return librosa.feature.rms(y=self.audio, frame_length=frame_length, hop_length=hop_length)[0]
+
+    def sound(self, start_time=None, end_time=None):
+        """
+        Sound de Parselmouth de un tramo (o de toda la grabación).
+
+        Es el único punto donde la señal se convierte a float64.
+        """
+        if start_time is None and end_time is None:
+            segment = self.audio
+        else:
+            segment = self.view(start_time or 0.0, self.duration if end_time is None else end_time)
+        return parselmouth.Sound(segment.astype(np.float64), sampling_frequency=self.sr)
+
+
+class MappedWavReader(RecordingBuffer):
+    """WAV PCM mapeado en memoria con decodificación perezosa por tramos."""
+
+    # (formato WAVE, bits por muestra) -> (dtype en disco, factor de escala)
+    _FORMATS = {
+        (1, 8): (np.uint8, 1 / 128.0),
+        (1, 16): (np.dtype('<i2'), 1 / 32768.0),
+        (1, 24): (np.uint8, 1 / 8388608.0),
+        (1, 32): (np.dtype('<i4'), 1 / 2147483648.0),
+        (3, 32): (np.dtype('<f4'), 1.0),
+        (3, 64): (np.dtype('<f8'), 1.0),
+    }
+
+    # Bloque (en frames RMS) para calcular la envolvente sin decodificar todo
+    RMS_BLOCK_FRAMES = 4096
+
+    def __init__(self, audio_path):
+        """
+        Args:
+            audio_path: ruta a un WAV PCM (entero 8/16/24/32 bits o float 32/64)
+        """
+        self.audio_path = str(audio_path)
+        self.format_tag, self.channels, self.sr, self.bits, offset, size = self._parse_header(self.audio_path)
+
+        if (self.format_tag, self.bits) not in self._FORMATS:
+            raise ValueError(f"Formato WAV no soportado: tag={self.format_tag}, bits={self.bits}")
+        dtype, self._scale = self._FORMATS[(self.format_tag, self.bits)]
+
+        frame_bytes = self.channels * self.bits // 8
+        self._n_samples = size // frame_bytes
+        width = self.channels * 3 if self.bits == 24 else self.channels
+        self._data = np.memmap(self.audio_path, dtype=dtype, mode='r', offset=offset,
+                               shape=(self._n_samples, width))
+
+    @staticmethod
+    def _parse_header(audio_path):
+        """Localiza los bloques 'fmt ' y 'data' de un archivo RIFF/WAVE."""
+        fmt = None
+        with open(audio_path, 'rb') as f:
+            riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+            if riff != b'RIFF' or wave != b'WAVE':
+                raise ValueError(f"{audio_path} no es un archivo RIFF/WAVE")
+
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError(f"{audio_path}: no se encontró el bloque 'data'")
+                chunk_id, chunk_size = struct.unpack('<4sI', header)
+
+                if chunk_id == b'fmt ':
+                    body = f.read(chunk_size)
+                    format_tag, channels, sr, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                    if format_tag == 0xFFFE and len(body) >= 26:
+                        # WAVE_FORMAT_EXTENSIBLE: el formato real está en el GUID
+                        format_tag = struct.unpack('<H', body[24:26])[0]
+                    fmt = (format_tag, channels, sr, bits)
+                elif chunk_id == b'data':
+                    if fmt is None:
+                        raise ValueError(f"{audio_path}: bloque 'data' antes de 'fmt '")
+                    return (*fmt, f.tell(), chunk_size)
+                else:
+                    f.seek(chunk_size, 1)
+
+                if chunk_size % 2:
+                    f.seek(1, 1)
+
+    @property
+    def n_samples(self):
+        return self._n_samples
+
+    @property
+    def audio(self):
+        """Grabación completa decodificada (evitar en grabaciones largas)."""
+        return self.read(0, self.n_samples)
+
+    def raw(self, start_sample, end_sample):
+        """Vista sin decodificar (desplazamiento dentro del mapeo) de un tramo."""
+        return self._data[start_sample:end_sample]
+
+    def read(self, start_sample, end_sample):
+        """Decodifica a float32 mono solo las muestras [start_sample, end_sample)."""
+        raw = self.raw(max(0, start_sample), min(self.n_samples, end_sample))
+
+        if self.bits == 24:
+            b = raw.reshape(len(raw), self.channels, 3).astype(np.int32)
+            samples = b[..., 0] | (b[..., 1] << 8) | (b[..., 2] << 16)
+            samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples)
+        elif self.bits == 8:
+            samples = raw.astype(np.int16) - 128
+        else:
+            samples = raw
+
+        decoded = samples.astype(np.float32)
+        if self._scale != 1.0:
+            decoded *= np.float32(self._scale)
+        if self.channels > 1:
+            return decoded.mean(axis=1)
+        return decoded[:, 0]
+
+    def rms_envelope(self, frame_length, hop_length):
+        """
+        Energía RMS por frame calculada por bloques.
+
+        Reproduce librosa.feature.rms (frames centrados, relleno con ceros)
+        sin decodificar nunca la grabación completa.
+        """
+        n_frames = 1 + self.n_samples // hop_length
+        pad = frame_length // 2
+        rms = np.empty(n_frames, dtype=np.float32)
+
+        for f0 in range(0, n_frames, self.RMS_BLOCK_FRAMES):
+            f1 = min(n_frames, f0 + self.RMS_BLOCK_FRAMES)
+            start = f0 * hop_length - pad
+            end = (f1 - 1) * hop_length - pad + frame_length
+
+            block = np.zeros(end - start, dtype=np.float32)
+            lo, hi = max(0, start), min(self.n_samples, end)
+            if hi > lo:
+                block[lo - start:hi - start] = self.read(lo, hi)
+
+            frames = np.lib.stride_tricks.sliding_window_view(block, frame_length)[::hop_length]
+            rms[f0:f1] = np.sqrt(np.mean(np.abs(frames) ** 2, axis=1))
+
+        return rms
+
+
+class SampleStore:
+    """Array compacto compartido para series cortas (p.ej. el pitch de cada palabra)."""
+
+    def __init__(self, dtype=np.float32, capacity=1024):
+        """
+        Args:
+            dtype: tipo de las muestras
+            capacity: muestras reservadas inicialmente (crece al doble cuando se llena)
+        """
+        self._data = np.zeros(max(1, capacity), dtype=dtype)
+        self._size = 0
+
+    def append(self, values):
+        """
+        Añade una serie al final del array.
+
+        Returns:
+            (offset, count) para recuperarla con get()
+        """
+        values = np.asarray(values, dtype=self._data.dtype)
+        if self._size + len(values) > len(self._data):
+            data = np.zeros(max(self._size + len(values), 2 * len(self._data)), dtype=self._data.dtype)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+        offset = self._size
+        self._data[offset:offset + len(values)] = values
+        self._size += len(values)
+        return offset, len(values)
+
+    def get(self, offset, count):
+        """Vista (sin copia) de una serie guardada."""
+        return self._data[offset:offset + count]
+
+    @property
+    def values(self):
+        """Todas las muestras guardadas (vista)."""
+        return self._data[:self._size]
+
+    def __len__(self):
+        return self._size
+
+
+# Tramo float32 de un segmento de memoria compartida (offset y length en muestras)
+SharedAudioDescriptor = namedtuple('SharedAudioDescriptor', ['name', 'offset', 'length', 'sr'])
+
+
+class SharedRecordingBuffer(RecordingBuffer):
+    """RecordingBuffer sobre un segmento de memoria compartida (lo abre un worker)."""
+
+    def __init__(self, descriptor):
+        """
+        Args:
+            descriptor: SharedAudioDescriptor creado por SharedAudioManager.share()
+        """
+        self.descriptor = descriptor
+        self._shm = shared_memory.SharedMemory(name=descriptor.name)
+        self.audio = np.ndarray(descriptor.length, dtype=np.float32, buffer=self._shm.buf,
+                                offset=descriptor.offset * np.dtype(np.float32).itemsize)
+        self.sr = descriptor.sr
+
+    def close(self):
+        """Suelta el segmento en este proceso (no lo borra: eso lo hace el manager)."""
+        if self._shm is not None:
+            self.audio = None
+            self._shm.close()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SharedAudioManager:
+    """
+    Grabaciones decodificadas en memoria compartida para los procesos del pool.
+
+    Se usa como context manager: al salir se cierran y borran todos los
+    segmentos creados, también si hay una excepción.
+    """
+
+    def __init__(self):
+        self._segments = []
+
+    def share(self, buffer):
+        """
+        Copia una grabación a un segmento nuevo.
+
+        Args:
+            buffer: RecordingBuffer (o cualquier objeto con .audio y .sr)
+
+        Returns:
+            SharedAudioDescriptor de la grabación completa
+        """
+        audio = np.ascontiguousarray(buffer.audio, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, audio.nbytes))
+        self._segments.append(shm)
+        np.ndarray(len(audio), dtype=np.float32, buffer=shm.buf)[:] = audio
+        return SharedAudioDescriptor(shm.name, 0, len(audio), buffer.sr)
+
+    def release(self, descriptor):
+        """Cierra y borra el segmento de un descriptor (cuando ya no lo usa ningún worker)."""
+        for shm in self._segments:
+            if shm.name == descriptor.name:
+                self._segments.remove(shm)
+                shm.close()
+                shm.unlink()
+                return
+
+    def close(self):
+        """Cierra y borra todos los segmentos."""
+        while self._segments:
+            shm = self._segments.pop()
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_recording(audio_path, mmap=False):
+    """
+    Abre una grabación como buffer en RAM o como WAV mapeado en memoria.
+
+    Args:
+        audio_path: ruta al archivo de audio
+        mmap: si True, mapea el WAV en lugar de cargarlo entero; 'auto' lo mapea
+            si es un WAV PCM y si no lo carga
+
+    Returns:
+        RecordingBuffer o MappedWavReader
+    """
+    if mmap == 'auto':
+        try:
+            return MappedWavReader(audio_path)
+        except ValueError:
+            return RecordingBuffer.load(audio_path)
+    if mmap:
+        return MappedWavReader(audio_path)
+    return RecordingBuffer.load(audio_path)
+
+
+class LazyRecording:
+    """
+    Grabación que se abre con open_recording() la primera vez que se lee.
+
+    sr y duration salen de la cabecera (sf.info) sin abrir el audio; los
+    informes casi nunca leen la señal, así que un analizador reconstruido en
+    el proceso principal no decodifica ni mapea nada hasta que algo (p.ej. la
+    exportación de palabras) lo pide.
+    """
+
+    def __init__(self, audio_path, mmap='auto'):
+        """
+        Args:
+            audio_path: ruta al archivo de audio
+            mmap: modo de open_recording al abrirla
+        """
+        self.audio_path = audio_path
+        self.mmap = mmap
+        self._buffer = None
+        try:
+            info = sf.info(str(audio_path))
+            self.sr, self.duration = info.samplerate, info.frames / info.samplerate
+        except RuntimeError:
+            # Formato sin cabecera legible por soundfile: hay que abrirla
+            self.sr, self.duration = self.open().sr, self._buffer.duration
+
+    def open(self):
+        """Buffer de la grabación (RecordingBuffer o MappedWavReader), abierto una vez."""
+        if self._buffer is None:
+            self._buffer = open_recording(self.audio_path, mmap=self.mmap)
+        return self._buffer
+
+    def __getattr__(self, name):
+        # Cualquier otro atributo (audio, read, sound...) es del buffer real
+        if name.startswith('__') or name == '_buffer':
+            raise AttributeError(name)
+        return getattr(self.open(), name)
+
+
+class ResampledSignalCache:
+    """Señal remuestreada a 2× el techo de formantes, con el remuestreo de Praat."""
+
+    # Precisión (semiancho en muestras de la interpolación sinc) que usa Praat
+    # al remuestrear dentro de "To Formant (burg)"
+    PRECISION = 50
+
+    def __init__(self, buffer):
+        """
+        Args:
+            buffer: RecordingBuffer (o MappedWavReader) de la grabación
+        """
+        self.buffer = buffer
+        self.sr = buffer.sr
+        self._cache = {}
+
+    @staticmethod
+    def rate_for_ceiling(max_formant):
+        """Frecuencia de muestreo que usa Praat para un techo de formantes dado."""
+        return int(round(2 * max_formant))
+
+    def _resample(self, sound, new_sr):
+        if new_sr == self.sr:
+            return sound
+        return call(sound, "Resample", new_sr, self.PRECISION)
+
+    def get(self, max_formant=5500):
+        """
+        Devuelve la grabación completa remuestreada para un techo dado.
+
+        Args:
+            max_formant: techo (Hz); la señal queda a 2× este valor
+
+        Returns:
+            (señal remuestreada en float32, nuevo sample rate)
+        """
+        new_sr = self.rate_for_ceiling(max_formant)
+        if new_sr not in self._cache:
+            resampled = self._resample(self.buffer.sound(), new_sr)
+            self._cache[new_sr] = resampled.values[0].astype(np.float32)
+        return self._cache[new_sr], new_sr
+
+    def sound(self, start_time, end_time, max_formant=5500):
+        """
+        Crea un Sound de Parselmouth de un tramo, ya remuestreado.
+
+        Se remuestrea solo el tramo, con la misma llamada que haría Praat
+        dentro de "To Formant (burg)" sobre el Sound de la palabra: el
+        resultado es idéntico al de analizar la palabra a su frecuencia
+        original (Praat no vuelve a remuestrear), y con cualquier buffer solo
+        se lee y convierte la región analizada. El Sound empieza en t=0 igual
+        que los Sound de palabra, así que los tiempos locales coinciden.
+
+        Args:
+            start_time: inicio del tramo en la grabación (segundos)
+            end_time: fin del tramo en la grabación (segundos)
+            max_formant: techo de formantes (Hz)
+
+        Returns:
+            parselmouth.Sound a 2× el techo de formantes
+        """
+        new_sr = self.rate_for_ceiling(max_formant)
+        return self._resample(self.buffer.sound(start_time, end_time), new_sr)
+
+    def clear(self):
+        """Libera todas las señales remuestreadas."""
+        self._cache.clear()
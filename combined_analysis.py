@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Análisis combinado: segmentación por silencios y por transcripción
+==================================================================
+analyze_voices_rigorous.py (palabras por silencios) y
+analyze_with_transcription.py (palabras de Whisper) procesan el mismo audio
+de forma independiente. Este modo:
+
+1. Decodifica cada grabación una sola vez (un RecordingBuffer compartido)
+2. Calcula una sola vez las pistas de pitch, intensidad y formantes de la
+   grabación completa (persistentes en el TrackStore)
+3. Aplica las dos segmentaciones recortando esas pistas a cada palabra
+4. Genera los resultados de ambos métodos y una concordancia vocal a vocal
+
+Comparar los métodos cuesta así aproximadamente lo mismo que ejecutar uno.
+Las pistas de la grabación completa no tienen los efectos de borde de
+analizar cada palabra por separado, así que los valores pueden diferir
+ligeramente de los de los scripts independientes.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analyze_voices_rigorous import RigorousVoiceAnalyzer, create_rigorous_reports
+from analyze_with_transcription import WhisperTranscriber, WordBasedVoiceAnalyzer, create_transcription_reports
+from audio_buffer import ResampledSignalCache, open_recording
+from corpus import CorpusManifest, transcription_path
+from fingerprint import FingerprintIndex
+from praat_tracks import DEFAULT_TRACK_PARAMS, RecordingTracks, TrackStore
+from quality_gate import QualityGate
+
+
+class SharedTracks:
+    """
+    Pistas de la grabación completa, calculadas una vez y recortadas por tramo.
+
+    Tiene la misma interfaz que RecordingTracks (get/save/audio_hash), así que
+    ambos analizadores pueden usarla como su atributo `tracks`.
+    """
+
+    def __init__(self, buffer, audio_path, track_store=None):
+        """
+        Args:
+            buffer: RecordingBuffer compartido de la grabación
+            audio_path: archivo de audio (para la clave del almacén)
+            track_store: TrackStore donde persistir las pistas (opcional)
+        """
+        self.buffer = buffer
+        self.sr = buffer.sr
+        self.formant_cache = ResampledSignalCache(buffer)
+        self.recording_tracks = RecordingTracks(audio_path, DEFAULT_TRACK_PARAMS, track_store)
+        self._full = None
+
+    @property
+    def audio_hash(self):
+        return self.recording_tracks.audio_hash
+
+    @property
+    def full(self):
+        """WordTracks de la grabación completa (del almacén o calculadas una vez)."""
+        if self._full is None:
+            duration = self.buffer.duration
+            self._full = self.recording_tracks.get(0.0, duration, lambda: (
+                self.buffer.sound(),
+                self.formant_cache.sound(0.0, duration, DEFAULT_TRACK_PARAMS['max_formant'])
+            ))
+            # La señal remuestreada ya no hace falta
+            self.formant_cache.clear()
+        return self._full
+
+    def get(self, start_time, end_time, make_sounds=None):
+        """Pistas de un tramo, con tiempos locales como las de su Sound de palabra."""
+        start_sample, end_sample = self.buffer.sample_range(start_time, end_time)
+        return self.full.window(start_sample / self.sr, (end_sample - start_sample) / self.sr)
+
+    def save(self):
+        self.recording_tracks.save()
+
+
+def analyze_recording(audio_path, transcription, track_store=None, mmap=False):
+    """
+    Analiza una grabación con ambas segmentaciones sobre las mismas pistas.
+
+    Args:
+        audio_path: archivo de audio
+        transcription: transcripción de Whisper (dict con 'text' y 'words')
+        track_store: TrackStore para persistir las pistas (opcional)
+        mmap: mapear el WAV en memoria
+
+    Returns:
+        (RigorousVoiceAnalyzer, WordBasedVoiceAnalyzer) ya analizados
+    """
+    buffer = open_recording(audio_path, mmap=mmap)
+    shared = SharedTracks(buffer, audio_path, track_store)
+
+    rigorous = RigorousVoiceAnalyzer(audio_path, buffer=buffer)
+    rigorous.tracks = shared
+    rigorous.analyze()
+
+    words = WordBasedVoiceAnalyzer(audio_path, transcription, buffer=buffer)
+    words.tracks = shared
+    words.analyze_all()
+
+    return rigorous, words
+
+
+def vowel_concordance(rigorous, words, min_overlap=0.0):
+    """
+    Empareja vocal a vocal los resultados de ambas segmentaciones.
+
+    Cada vocal ocupa [global_time - duration/2, global_time + duration/2]; las
+    parejas se forman de mayor a menor solapamiento (IoU), una a una.
+
+    Args:
+        rigorous: RigorousVoiceAnalyzer analizado
+        words: WordBasedVoiceAnalyzer analizado
+        min_overlap: IoU mínimo para aceptar una pareja
+
+    Returns:
+        DataFrame con una fila por pareja o vocal sin pareja
+    """
+    a = rigorous.vowel_formants
+    b = words.vowels_analysis
+
+    def intervals(table):
+        return table['global_time'] - table['duration'] / 2, table['global_time'] + table['duration'] / 2
+
+    a_start, a_end = intervals(a)
+    b_start, b_end = intervals(b)
+
+    # Solapamiento e IoU de todas las parejas (vocales de una grabación: matriz pequeña)
+    inter = np.clip(np.minimum(a_end[:, None], b_end[None, :]) - np.maximum(a_start[:, None], b_start[None, :]), 0, None)
+    union = (a_end - a_start)[:, None] + (b_end - b_start)[None, :] - inter
+    iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+    pairs = []
+    used_a, used_b = set(), set()
+    for flat in np.argsort(-iou, axis=None):
+        i, j = np.unravel_index(flat, iou.shape)
+        if iou[i, j] <= min_overlap:
+            break
+        if i not in used_a and j not in used_b:
+            used_a.add(i)
+            used_b.add(j)
+            pairs.append((i, j))
+
+    b_class = b['vowel_class']
+    b_word = b['word']
+    rows = []
+    for i, j in sorted(pairs + [(i, None) for i in range(len(a)) if i not in used_a]
+                       + [(None, j) for j in range(len(b)) if j not in used_b],
+                       key=lambda p: a['global_time'][p[0]] if p[0] is not None else b['global_time'][p[1]]):
+        row = {'speaker': rigorous.name, 'matched': i is not None and j is not None,
+               'iou': float(iou[i, j]) if i is not None and j is not None else 0.0,
+               'vowel_class': b_class[j] if j is not None else None,
+               'word': b_word[j] if j is not None else None}
+        for key in ('global_time', 'duration', 'f1', 'f2', 'f3', 'pitch'):
+            row[f'{key}_silence'] = float(a[key][i]) if i is not None else np.nan
+            row[f'{key}_transcription'] = float(b[key][j]) if j is not None else np.nan
+        rows.append(row)
+
+    df = pd.DataFrame(rows)
+    if len(df):
+        for key in ('f1', 'f2', 'f3', 'pitch'):
+            df[f'{key}_diff'] = df[f'{key}_transcription'] - df[f'{key}_silence']
+    return df
+
+
+def summarize_concordance(df):
+    """Resumen de la concordancia: vocales emparejadas y diferencias medias."""
+    matched = df[df['matched']]
+    summary = {
+        'vowels_silence': int(df['global_time_silence'].notna().sum()),
+        'vowels_transcription': int(df['global_time_transcription'].notna().sum()),
+        'matched': int(len(matched)),
+        'mean_iou': float(matched['iou'].mean()) if len(matched) else np.nan,
+    }
+    for key in ('f1', 'f2', 'f3', 'pitch'):
+        summary[f'{key}_mean_abs_diff'] = float(matched[f'{key}_diff'].abs().mean()) if len(matched) else np.nan
+    return summary
+
+
+def main():
+    """Ejecuta ambos métodos sobre las grabaciones del manifiesto con pistas compartidas."""
+    print("=" * 70)
+    print("ANÁLISIS COMBINADO: SILENCIOS + TRANSCRIPCIÓN")
+    print("=" * 70)
+
+    manifest = CorpusManifest()
+    audio_files = [recording.path for recording in manifest.recordings()]
+    if not audio_files:
+        print(f"\n❌ No hay grabaciones en {manifest.path}")
+        return
+
+    print(f"\n📁 Archivos: {len(audio_files)}")
+
+    gate = QualityGate()
+    audio_files = gate.screen(audio_files)
+    if not audio_files:
+        print("\n❌ Ningún archivo superó el control de calidad")
+        return
+
+    # Copias de grabaciones ya indexadas (reexportaciones, recortes): se omiten
+    audio_files = FingerprintIndex('.cache/fingerprints.sqlite').screen(audio_files)
+
+    # Transcripciones existentes (Whisper solo si falta alguna)
+    transcriber = None
+    transcriptions = {}
+    for audio_file in audio_files:
+        trans_file = transcription_path(audio_file)
+        if trans_file.exists():
+            with open(trans_file, encoding='utf-8') as f:
+                transcriptions[audio_file] = json.load(f)
+            continue
+        if transcriber is None:
+            transcriber = WhisperTranscriber(model_name="large")
+        transcriptions[audio_file] = transcriber.transcribe(audio_file)
+        with open(trans_file, 'w', encoding='utf-8') as f:
+            json.dump(transcriptions[audio_file], f, ensure_ascii=False, indent=2)
+
+    track_store = TrackStore('.cache/tracks')
+    rigorous_analyzers, word_analyzers, concordance = [], [], []
+    for audio_file in audio_files:
+        rigorous, words = analyze_recording(audio_file.resolve(), transcriptions[audio_file], track_store)
+        rigorous_analyzers.append(rigorous)
+        word_analyzers.append(words)
+        concordance.append(vowel_concordance(rigorous, words))
+
+    # Resultados en una carpeta propia (no sobrescribe los de los scripts independientes)
+    output_dir = Path('resultados_combinados')
+    output_dir.mkdir(exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(output_dir)
+    try:
+        create_rigorous_reports(rigorous_analyzers, manifest)
+        create_transcription_reports(word_analyzers, manifest)
+
+        concordance = pd.concat(concordance, ignore_index=True)
+        concordance.to_csv('concordancia_vocales.csv', index=False)
+        print("  ✓ concordancia_vocales.csv")
+        gate.write_report()
+    finally:
+        os.chdir(cwd)
+
+    print(f"\n{'='*70}")
+    print("CONCORDANCIA VOCAL A VOCAL")
+    print("=" * 70)
+    for speaker, group in concordance.groupby('speaker', sort=False):
+        s = summarize_concordance(group)
+        print(f"\n{speaker}: {s['matched']} emparejadas "
+              f"(silencios: {s['vowels_silence']}, transcripción: {s['vowels_transcription']})")
+        if s['matched']:
+            print(f"  IoU medio: {s['mean_iou']:.2f}")
+            print(f"  |ΔF1| = {s['f1_mean_abs_diff']:.0f} Hz, |ΔF2| = {s['f2_mean_abs_diff']:.0f} Hz, "
+                  f"|ΔF0| = {s['pitch_mean_abs_diff']:.1f} Hz")
+
+    print(f"\n✅ Resultados en {output_dir}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Manifiesto del corpus (hablante, género, edad y sesión de cada grabación)
+=========================================================================
+Las grabaciones se buscaban con Path('.').glob('audio_*.wav') y el género se
+deducía del nombre ('ninia' in name) en compare_genders(),
+visualize_f0_contours() y los informes: el corpus tenía que estar en una
+sola carpeta, con esa convención de nombres, y no se podía agrupar por
+hablante, edad o sesión.
+
+El manifiesto es un CSV editable (corpus.csv) con una fila por grabación:
+
+    path,speaker,gender,age,session
+    audio_ninia_1.wav,ninia_1,F,,
+    sesion_2/alumno_07.wav,alumno_07,M,7,sesion_2
+
+- path: ruta relativa a la carpeta del CSV (puede haber subcarpetas)
+- speaker: identificador del hablante (varias grabaciones por hablante)
+- gender: F (niña), M (niño) o vacío si no se conoce
+- age, session: opcionales
+
+Para consultarlo se indexa en SQLite (.cache/corpus_<ruta>.sqlite, uno por
+manifiesto, con índices por ruta, hablante, género y sesión), que se
+reconstruye solo cuando cambia el CSV: buscar una grabación o agrupar
+decenas de miles cuesta una consulta.
+`python corpus.py scan <carpeta>` recorre la carpeta y añade al CSV las
+grabaciones que aún no están, con los metadatos vacíos para completarlos.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+import pandas as pd
+
+from result_cache import file_hash, make_key
+
+
+# Manifiesto por defecto (en la carpeta de trabajo)
+MANIFEST_PATH = 'corpus.csv'
+
+# Carpeta de los índices SQLite (uno por manifiesto)
+INDEX_DIR = Path('.cache')
+
+MANIFEST_COLUMNS = ('path', 'speaker', 'gender', 'age', 'session')
+
+# Valores de la columna gender
+GENDER_LABELS = {'F': 'niñas', 'M': 'niños'}
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.mp3', '.m4a')
+
+# Carpetas que no son grabaciones del corpus (audios de palabras exportados)
+SKIP_DIRS = ('word_audios',)
+
+Recording = namedtuple('Recording', 'path speaker gender age session')
+
+
+def transcription_path(audio_path):
+    """*_transcription.json de una grabación (junto al audio)."""
+    audio_path = Path(audio_path)
+    return audio_path.with_name(audio_path.stem + '_transcription.json')
+
+
+def scan_audio(root, extensions=AUDIO_EXTENSIONS):
+    """
+    Archivos de audio bajo una carpeta (recorrido con os.walk; se saltan las
+    carpetas ocultas y SKIP_DIRS).
+
+    Yields:
+        rutas de los archivos, en orden por carpeta y nombre
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.') and d not in SKIP_DIRS)
+        for filename in sorted(filenames):
+            if filename.lower().endswith(extensions):
+                yield Path(dirpath) / filename
+
+
+class CorpusManifest:
+    """Grabaciones del corpus y sus metadatos, con consultas indexadas."""
+
+    def __init__(self, path=MANIFEST_PATH, index=None):
+        """
+        Args:
+            path: CSV del manifiesto
+            index: archivo SQLite donde se indexa (por defecto, uno en
+                INDEX_DIR por ruta absoluta del CSV: dos manifiestos no se
+                pisan el índice)
+        """
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"No existe el manifiesto {self.path} "
+                                    f"(python corpus.py scan <carpeta> para crearlo)")
+        self.root = self.path.parent
+        if index is None:
+            index = INDEX_DIR / f"corpus_{make_key(str(self.path.resolve()))[:16]}.sqlite"
+        # Absoluto: los informes pueden consultarlo tras cambiar de carpeta
+        self.index = Path(index).resolve()
+        self.index.parent.mkdir(parents=True, exist_ok=True)
+        self._refresh()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.index, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _refresh(self):
+        """Reconstruye el índice si el CSV cambió desde la última vez."""
+        source = str(self.path.resolve())
+        digest = file_hash(self.path)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (source TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+            row = conn.execute("SELECT hash FROM meta WHERE source = ?", (source,)).fetchone()
+            if row is not None and row[0] == digest:
+                return
+
+            df = self._read_csv()
+            conn.execute("DELETE FROM meta")
+            conn.execute("DROP TABLE IF EXISTS recordings")
+            conn.execute("""CREATE TABLE recordings (
+                                abspath TEXT PRIMARY KEY,
+                                path TEXT NOT NULL,
+                                speaker TEXT,
+                                gender TEXT,
+                                age REAL,
+                                session TEXT)""")
+            conn.executemany(
+                "INSERT INTO recordings (abspath, path, speaker, gender, age, session) VALUES (?, ?, ?, ?, ?, ?)",
+                ((str((self.root / p).resolve()), p, s or None, g or None, float(a) if a else None, se or None)
+                 for p, s, g, a, se in df[list(MANIFEST_COLUMNS)].itertuples(index=False)))
+            for column in ('speaker', 'gender', 'session'):
+                conn.execute(f"CREATE INDEX recordings_{column} ON recordings ({column}, path)")
+            conn.execute("CREATE INDEX recordings_path ON recordings (path)")
+            conn.execute("INSERT INTO meta (source, hash) VALUES (?, ?)", (source, digest))
+
+    def _read_csv(self):
+        """Lee y valida el CSV (todas las columnas como texto)."""
+        df = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+        for column in MANIFEST_COLUMNS:
+            if column not in df:
+                df[column] = ''
+        df['gender'] = df['gender'].str.strip().str.upper()
+
+        invalid = df[~df['gender'].isin([*GENDER_LABELS, ''])]
+        if len(invalid):
+            raise ValueError(f"{self.path}: género no válido en {invalid['path'].iloc[0]} "
+                             f"('{invalid['gender'].iloc[0]}'; opciones: {', '.join(GENDER_LABELS)} o vacío)")
+        duplicated = df[df['path'].duplicated()]
+        if len(duplicated):
+            raise ValueError(f"{self.path}: grabación repetida: {duplicated['path'].iloc[0]}")
+        return df
+
+    def _recording(self, row):
+        path, speaker, gender, age, session = row
+        return Recording(self.root / path, speaker, gender, age, session)
+
+    def recordings(self, speaker=None, gender=None, session=None):
+        """
+        Grabaciones del manifiesto, opcionalmente filtradas (por índice).
+
+        Args:
+            speaker, gender, session: valor o lista de valores (None = todos)
+
+        Returns:
+            lista de Recording ordenada por ruta
+        """
+        clauses, values = [], []
+        for column, wanted in (('speaker', speaker), ('gender', gender), ('session', session)):
+            if wanted is None:
+                continue
+            wanted = [wanted] if isinstance(wanted, str) else list(wanted)
+            clauses.append(f"{column} IN ({', '.join('?' * len(wanted))})")
+            values.extend(wanted)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT path, speaker, gender, age, session FROM recordings{where} "
+                                f"ORDER BY path", values).fetchall()
+        return [self._recording(row) for row in rows]
+
+    def lookup(self, paths):
+        """
+        Metadatos de varias grabaciones a la vez.
+
+        Args:
+            paths: rutas de audio (relativas a la carpeta de trabajo o absolutas)
+
+        Returns:
+            lista de Recording (o None si la grabación no está en el manifiesto),
+            en el orden de paths
+        """
+        abspaths = [str(Path(p).resolve()) for p in paths]
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE query (abspath TEXT)")
+            conn.executemany("INSERT INTO query (abspath) VALUES (?)", ((p,) for p in abspaths))
+            rows = conn.execute("""SELECT r.abspath, r.path, r.speaker, r.gender, r.age, r.session
+                                   FROM query q JOIN recordings r ON r.abspath = q.abspath""").fetchall()
+        found = {row[0]: self._recording(row[1:]) for row in rows}
+        return [found.get(p) for p in abspaths]
+
+    def get(self, path):
+        """Metadatos de una grabación (o None si no está en el manifiesto)."""
+        return self.lookup([path])[0]
+
+    def group_by(self, column):
+        """
+        Grabaciones agrupadas por una columna.
+
+        Returns:
+            dict valor -> lista de Recording (ordenadas por ruta)
+        """
+        if column not in MANIFEST_COLUMNS:
+            raise ValueError(f"Columna desconocida: {column}")
+        groups = {}
+        with self._connect() as conn:
+            for row in conn.execute(f"SELECT path, speaker, gender, age, session FROM recordings "
+                                    f"ORDER BY {column}, path"):
+                recording = self._recording(row)
+                groups.setdefault(getattr(recording, column), []).append(recording)
+        return groups
+
+    def group_analyzers(self, analyzers, column='gender'):
+        """
+        Agrupa analizadores (con atributo audio_path) por una columna del manifiesto.
+
+        Returns:
+            dict valor -> lista de analizadores, en el orden de analyzers; las
+            grabaciones que no están en el manifiesto quedan en la clave None
+        """
+        groups = {}
+        for analyzer, recording in zip(analyzers, self.lookup([a.audio_path for a in analyzers])):
+            value = getattr(recording, column) if recording is not None else None
+            groups.setdefault(value, []).append(analyzer)
+        return groups
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+
+
+def add_recordings(manifest_path, root='.'):
+    """
+    Añade al manifiesto (o lo crea) las grabaciones de una carpeta que aún no están.
+
+    Args:
+        manifest_path: CSV del manifiesto
+        root: carpeta a recorrer (subcarpetas incluidas)
+
+    Returns:
+        número de grabaciones añadidas
+    """
+    manifest_path = Path(manifest_path)
+    base = manifest_path.resolve().parent
+    known = set()
+    if manifest_path.exists():
+        known = set(pd.read_csv(manifest_path, dtype=str, keep_default_na=False, usecols=['path'])['path'])
+
+    new = [Path(os.path.relpath(path.resolve(), base)).as_posix() for path in scan_audio(root)]
+    new = [path for path in new if path not in known]
+    if new:
+        rows = pd.DataFrame({column: new if column == 'path' else '' for column in MANIFEST_COLUMNS})
+        rows.to_csv(manifest_path, mode='a', header=not manifest_path.exists(), index=False)
+    return len(new)
+
+
+def main(argv=None):
+    """Crea o amplía el manifiesto (scan) o resume su contenido."""
+    parser = argparse.ArgumentParser(description="Manifiesto del corpus")
+    parser.add_argument('command', nargs='?', choices=('scan', 'summary'), default='summary')
+    parser.add_argument('root', nargs='?', default='.', help="carpeta a recorrer (scan)")
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help="CSV del manifiesto")
+    args = parser.parse_args(argv)
+
+    if args.command == 'scan':
+        added = add_recordings(args.manifest, args.root)
+        print(f"✓ {args.manifest}: {added} grabaciones nuevas (completar speaker, gender, age, session)")
+        return
+
+    try:
+        manifest = CorpusManifest(args.manifest)
+    except (FileNotFoundError, ValueError) as e:
+        sys.exit(f"❌ {e}")
+    print(f"📁 {args.manifest}: {len(manifest)} grabaciones")
+    for column in ('gender', 'session'):
+        groups = manifest.group_by(column)
+        print(f"\n  Por {column}:")
+        for value, recordings in groups.items():
+            label = GENDER_LABELS.get(value, value) if column == 'gender' else value
+            print(f"   • {label or '(sin dato)'}: {len(recordings)} grabaciones, "
+                  f"{len({r.speaker for r in recordings})} hablantes")
+
+
+if __name__ == "__main__":
+    main()
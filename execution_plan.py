@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Plan de ejecución: núcleos para Whisper y para los procesos de análisis
+=======================================================================
+torch (Whisper), OpenBLAS/MKL y OpenMP arrancan por defecto un hilo por
+núcleo en cada proceso. Con Whisper y varios procesos de Praat en la misma
+máquina eso multiplica los hilos por el número de procesos y, a partir de
+cierto punto, añadir workers hace el pipeline más lento.
+
+El plan:
+
+1. Detecta los núcleos disponibles: afinidad del proceso y cuota de CPU del
+   cgroup (v2: cpu.max; v1: cpu.cfs_quota_us / cpu.cfs_period_us), lo que
+   sea menor (en un contenedor con --cpus=2 os.cpu_count() da los del host)
+2. Reparte los núcleos: si hay que transcribir, Whisper se queda con la
+   mayor parte (es el cuello de botella) y el análisis con el resto; si no,
+   todos los núcleos van a procesos de análisis
+3. Fija los hilos de cada proceso: torch.set_num_threads() para Whisper y
+   variables de entorno + threadpoolctl (si está instalado) para
+   BLAS/OpenMP en los workers, que con Praat necesitan un único hilo
+
+La memoria se planifica igual: el presupuesto es la memoria disponible
+(MemAvailable y el límite del cgroup), Whisper reserva la huella de su
+modelo mientras transcribe y cada análisis una estimación a partir de la
+duración y la frecuencia de muestreo de la grabación. ResourceGate solo deja
+empezar una tarea si caben sus núcleos y su memoria; al terminar Whisper se
+libera su reserva y el análisis se expande a todos los núcleos.
+
+Los procesos de análisis que conviven con Whisper se crean desde un
+forkserver (worker_context): un fork del proceso con el modelo cargado
+heredaría sus páginas (liberarlo no devolvería nada) y los hilos de
+torch/OpenMP a medio usar, con riesgo de bloqueo en el hijo.
+
+describe() devuelve el plan para el log de la ejecución.
+"""
+
+import asyncio
+import math
+import multiprocessing
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+
+# Variables de entorno que leen OpenMP y las bibliotecas BLAS
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                   'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS')
+
+# Con transcripción, fracción de los núcleos para los procesos de análisis
+ANALYSIS_SHARE = 0.25
+
+# Memoria (bytes) de un proceso con el modelo de Whisper cargado
+WHISPER_MODEL_MEMORY = {
+    'tiny': 1 << 30,
+    'base': 1 << 30,
+    'small': 2 << 30,
+    'medium': 5 << 30,
+    'large': 10 << 30,
+}
+
+# Worker de análisis: intérprete + numpy/scipy/librosa/parselmouth
+WORKER_BASE_MEMORY = 300 << 20
+# Bytes por muestra de la grabación en un worker: float32 decodificado, señal
+# remuestreada para formantes y copias float64 de Praat por palabra
+BYTES_PER_SAMPLE = 12
+
+
+def cgroup_cpu_limit(root='/sys/fs/cgroup'):
+    """
+    Cuota de CPU del cgroup en núcleos (redondeada hacia arriba).
+
+    Returns:
+        número de núcleos, o None si no hay cuota
+    """
+    root = Path(root)
+    try:
+        quota, period = (root / 'cpu.max').read_text().split()
+        if quota != 'max':
+            return max(1, math.ceil(int(quota) / int(period)))
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        quota = int((root / 'cpu' / 'cpu.cfs_quota_us').read_text())
+        period = int((root / 'cpu' / 'cpu.cfs_period_us').read_text())
+        if quota > 0 and period > 0:
+            return max(1, math.ceil(quota / period))
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cores():
+    """Núcleos que puede usar este proceso (afinidad y cuota del cgroup)."""
+    if hasattr(os, 'sched_getaffinity'):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    return min(cores, limit) if limit else cores
+
+
+def _read_int(path):
+    try:
+        value = Path(path).read_text().strip()
+        return None if value == 'max' else int(value)
+    except (OSError, ValueError):
+        return None
+
+
+def available_memory(root='/sys/fs/cgroup'):
+    """
+    Memoria (bytes) que pueden usar aún los procesos de esta ejecución.
+
+    Es el mínimo entre MemAvailable del sistema y lo que queda hasta el
+    límite del cgroup (v2: memory.max - memory.current; v1: limit_in_bytes -
+    usage_in_bytes). None si no se puede saber.
+    """
+    candidates = []
+    try:
+        for line in Path('/proc/meminfo').read_text().splitlines():
+            if line.startswith('MemAvailable:'):
+                candidates.append(int(line.split()[1]) * 1024)
+    except (OSError, ValueError):
+        pass
+
+    root = Path(root)
+    for limit_file, usage_file in (('memory.max', 'memory.current'),
+                                   ('memory/memory.limit_in_bytes', 'memory/memory.usage_in_bytes')):
+        limit, usage = _read_int(root / limit_file), _read_int(root / usage_file)
+        # v1 sin límite da un valor enorme (PAGE_COUNTER_MAX)
+        if limit is not None and usage is not None and limit < 1 << 60:
+            candidates.append(max(0, limit - usage))
+            break
+
+    return min(candidates) if candidates else None
+
+
+def analysis_task_memory(duration, sr):
+    """Memoria estimada (bytes) de un worker que analiza una grabación."""
+    return WORKER_BASE_MEMORY + int(duration * sr * BYTES_PER_SAMPLE)
+
+
+def limit_threads(n_threads):
+    """
+    Limita los hilos de BLAS/OpenMP del proceso actual (y de sus hijos).
+
+    Se usa como initializer de los pools: las variables de entorno valen para
+    bibliotecas que aún no se han cargado y threadpoolctl para las ya cargadas.
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(n_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(n_threads)
+    except ImportError:
+        pass
+
+
+def worker_context(preload=()):
+    """
+    Contexto de multiprocessing para pools que conviven con Whisper.
+
+    forkserver (spawn donde no existe): los workers salen de un proceso
+    limpio, sin el modelo ni los hilos del proceso principal.
+
+    Args:
+        preload: módulos que el forkserver importa una vez (los workers los
+            heredan ya importados en lugar de importarlos cada uno)
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(list(preload))
+    return context
+
+
+class ExecutionPlan:
+    """Reparto de núcleos entre Whisper y los procesos de análisis."""
+
+    def __init__(self, cores, transcribe=False, workers=None, memory=None, model_name='large'):
+        """
+        Args:
+            cores: núcleos disponibles
+            transcribe: si hay que ejecutar Whisper en esta ejecución
+            workers: procesos de análisis fijos (None = según los núcleos)
+            memory: memoria disponible en bytes (None = sin límite conocido)
+            model_name: modelo de Whisper (para su huella de memoria)
+        """
+        self.cores = cores
+        self.transcribe = transcribe
+        self.memory = memory
+        self.model_memory = WHISPER_MODEL_MEMORY.get(model_name.split('.')[0].split('-')[0], 10 << 30) \
+            if transcribe else 0
+        if transcribe:
+            self.analysis_workers = workers or max(1, int(cores * ANALYSIS_SHARE))
+            self.whisper_threads = max(1, cores - self.analysis_workers)
+        else:
+            self.analysis_workers = workers or cores
+            self.whisper_threads = 0
+        # Praat es de un hilo: BLAS/OpenMP con un hilo por worker salvo que sobren núcleos
+        spare = cores - self.whisper_threads
+        self.threads_per_worker = max(1, spare // self.analysis_workers)
+
+    @classmethod
+    def detect(cls, transcribe=False, workers=None, model_name='large'):
+        """Plan para los núcleos y la memoria disponibles en esta máquina o contenedor."""
+        return cls(available_cores(), transcribe, workers, available_memory(), model_name)
+
+    def fit_workers(self, task_memory):
+        """
+        Procesos de análisis que caben en memoria a la vez (con Whisper cargado si transcribe).
+
+        Args:
+            task_memory: memoria estimada de la tarea más grande (analysis_task_memory)
+        """
+        if self.memory is None:
+            return self.analysis_workers
+        fits = (self.memory - self.model_memory) // max(1, task_memory)
+        return int(max(1, min(self.analysis_workers, fits)))
+
+    def gate(self):
+        """ResourceGate con los núcleos y la memoria del plan para el análisis."""
+        return ResourceGate(self.analysis_workers, self.memory)
+
+    def apply_whisper(self):
+        """Hilos de torch para Whisper (en el proceso que transcribe)."""
+        if not self.whisper_threads:
+            return
+        try:
+            import torch
+            torch.set_num_threads(self.whisper_threads)
+        except ImportError:
+            pass
+
+    def describe(self):
+        """Plan en texto para el log de la ejecución."""
+        limit = cgroup_cpu_limit()
+        source = f"cuota cgroup {limit}" if limit else "sin cuota cgroup"
+        lines = [f"🧵 Plan de ejecución: {self.cores} núcleos ({source})"]
+        if self.transcribe:
+            lines.append(f"   • Whisper: {self.whisper_threads} hilos de torch")
+        lines.append(f"   • Análisis: {self.analysis_workers} procesos × {self.threads_per_worker} hilo(s) BLAS/OpenMP")
+        if self.memory is not None:
+            model = f", modelo de Whisper {self.model_memory / 2**30:.0f} GB" if self.model_memory else ""
+            lines.append(f"   • Memoria disponible: {self.memory / 2**30:.1f} GB{model}")
+        return '\n'.join(lines)
+
+
+class ResourceGate:
+    """
+    Admisión de tareas de asyncio por núcleos (slots) y memoria (bytes).
+
+    Una tarea espera hasta que haya un slot libre y su memoria quepa en el
+    presupuesto; si no hay ninguna otra en marcha se admite siempre, para que
+    una tarea más grande que el presupuesto no bloquee la ejecución.
+    """
+
+    def __init__(self, slots, memory=None):
+        """
+        Args:
+            slots: tareas simultáneas
+            memory: presupuesto de memoria en bytes (None = sin límite)
+        """
+        self.slots = slots
+        self.memory = memory
+        self.running = 0
+        self.reserved = 0
+        self._condition = None
+
+    @property
+    def condition(self):
+        # Se crea dentro del bucle de eventos que la usa
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _fits(self, nbytes, slots):
+        # Sin otra tarea en marcha se admite siempre (aunque haya memoria reservada
+        # sin slots, como el modelo de Whisper): si no, las colas del pipeline se bloquean
+        if self.running == 0:
+            return True
+        if self.running + slots > self.slots:
+            return False
+        return self.memory is None or self.reserved + nbytes <= self.memory
+
+    async def acquire(self, nbytes, slots=1):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self._fits(nbytes, slots))
+            self.running += slots
+            self.reserved += nbytes
+
+    async def release(self, nbytes, slots=1):
+        async with self.condition:
+            self.running -= slots
+            self.reserved -= nbytes
+            self.condition.notify_all()
+
+    async def resize(self, slots):
+        """Cambia el número de slots (p.ej. al liberar los núcleos de Whisper)."""
+        async with self.condition:
+            self.slots = slots
+            self.condition.notify_all()
+
+    @asynccontextmanager
+    async def reserve(self, nbytes, slots=1):
+        """async with gate.reserve(bytes): ... (libera también si hay excepción)."""
+        await self.acquire(nbytes, slots)
+        try:
+            yield
+        finally:
+            await self.release(nbytes, slots)
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Detección de grabaciones duplicadas (huellas acústicas)
+=======================================================
+La recogida de datos a veces vuelve a subir la misma sesión con otro nombre
+(reexportaciones, copias recortadas) y main() paga el análisis completo de
+cada copia, que además cuenta dos veces en la comparación estadística.
+
+Cada grabación se indexa con una huella de picos espectrales:
+
+1. Señal diezmada a 8 kHz (independiente de la frecuencia del archivo)
+2. Picos locales del espectrograma log (constelación)
+3. Pares de picos (f1, f2, Δt) cuantizados y empaquetados en un entero de
+   18 bits, con el frame del pico ancla
+
+Dos grabaciones son la misma si muchos hashes coinciden con el mismo
+desplazamiento temporal (t_original - t_copia), que da además el recorte de
+la copia. Una copia recortada en un instante arbitrario no cae alineada con
+los frames del original: el hop es corto (8 ms), f y Δt se cuantizan para
+que un pico que se mueve un bin o un frame no cambie el hash, y los
+desplazamientos vecinos (±DELTA_TOLERANCE frames) se suman al puntuar.
+
+El índice es SQLite persistente con un índice por hash: comprobar un archivo
+nuevo cuesta lo mismo con 10 que con 10 000 grabaciones indexadas, y un
+archivo ya indexado (mismo hash de contenido) no se vuelve a procesar.
+"""
+
+import argparse
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+from scipy import ndimage, signal
+
+from audio_buffer import ResampledSignalCache, open_recording
+from result_cache import file_hash
+
+
+# Parámetros de la huella (cambiarlos obliga a subir FINGERPRINT_VERSION)
+FINGERPRINT_VERSION = 3
+FINGERPRINT_SR = 8000
+N_FFT = 512
+HOP = 64
+PEAK_NEIGHBORHOOD = (9, 41)    # (bins de frecuencia, frames)
+PEAK_RANGE_DB = 60             # picos a menos de 60 dB del máximo
+FAN_OUT = 10                   # pares por pico ancla
+MAX_DT = 252                   # Δt máximo entre picos (frames, ~2 s)
+BIN_QUANT = 4                  # bins de frecuencia por celda del hash (6 bits)
+DT_QUANT = 4                   # frames de Δt por celda del hash (6 bits)
+
+# Criterio de duplicado: hashes alineados (absolutos y relativos a la más corta)
+MIN_MATCHES = 20
+MIN_SCORE = 0.2
+DELTA_TOLERANCE = 2            # frames de desalineación sumados al puntuar
+
+# Recortes de prueba de check_trims() (s, no múltiplos del hop)
+TRIM_CUTS = (0.5, 1.0, 2.0, 0.37)
+
+
+def spectral_peaks(audio, sr):
+    """
+    Constelación de picos del espectrograma.
+
+    Returns:
+        (frames, bins) de los picos, ordenados por tiempo
+    """
+    _, _, spec = signal.stft(audio, sr, nperseg=N_FFT, noverlap=N_FFT - HOP, boundary=None)
+    spec_db = 20 * np.log10(np.abs(spec[:-1]) + 1e-10)
+
+    is_peak = (spec_db == ndimage.maximum_filter(spec_db, size=PEAK_NEIGHBORHOOD)) \
+        & (spec_db > spec_db.max() - PEAK_RANGE_DB) & (spec_db > np.median(spec_db))
+    bins, frames = np.nonzero(is_peak)
+    order = np.lexsort((bins, frames))
+    return frames[order], bins[order]
+
+
+def peak_hashes(frames, bins):
+    """
+    Hashes de pares de picos (ancla, FAN_OUT siguientes dentro de MAX_DT).
+
+    Returns:
+        (hashes, frames del ancla) como arrays int64
+    """
+    hashes, anchors = [], []
+    cells = bins // BIN_QUANT
+    for k in range(1, FAN_OUT + 1):
+        dt = frames[k:] - frames[:-k]
+        valid = (dt > 0) & (dt <= MAX_DT)
+        hashes.append((cells[:-k][valid] << 12) | (cells[k:][valid] << 6) | (dt[valid] // DT_QUANT))
+        anchors.append(frames[:-k][valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hashes).astype(np.int64), np.concatenate(anchors).astype(np.int64)
+
+
+def fingerprint(buffer):
+    """
+    Huella de una grabación.
+
+    Args:
+        buffer: RecordingBuffer (o MappedWavReader) de la grabación
+
+    Returns:
+        (hashes, frames del ancla)
+    """
+    decimated, sr = ResampledSignalCache(buffer).get(FINGERPRINT_SR / 2)
+    return peak_hashes(*spectral_peaks(decimated, sr))
+
+
+class FingerprintIndex:
+    """Índice persistente de huellas para detectar duplicados entre lotes."""
+
+    def __init__(self, path='.cache/fingerprints.sqlite'):
+        """
+        Args:
+            path: archivo SQLite del índice
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._connect() as conn:
+            # Huellas de otra versión no son comparables: el índice se rehace
+            if conn.execute("PRAGMA user_version").fetchone()[0] != FINGERPRINT_VERSION:
+                conn.execute("DROP TABLE IF EXISTS recordings")
+                conn.execute("DROP TABLE IF EXISTS hashes")
+                conn.execute(f"PRAGMA user_version = {FINGERPRINT_VERSION}")
+            conn.execute("""CREATE TABLE IF NOT EXISTS recordings (
+                                id INTEGER PRIMARY KEY,
+                                path TEXT NOT NULL,
+                                audio_hash TEXT NOT NULL,
+                                duration REAL NOT NULL,
+                                n_hashes INTEGER NOT NULL,
+                                duplicate_of INTEGER,
+                                offset REAL,
+                                score REAL,
+                                exact INTEGER NOT NULL DEFAULT 0)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS recordings_hash ON recordings (audio_hash)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS hashes (
+                                hash INTEGER NOT NULL,
+                                recording INTEGER NOT NULL,
+                                t INTEGER NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS hashes_hash ON hashes (hash)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def check(self, audio_path):
+        """
+        Busca una grabación en el índice y la añade si es nueva.
+
+        Si la grabación nueva es más larga que la indexada con la que
+        coincide, pasa a ser el original: la anterior y sus copias quedan como
+        copias de la nueva (con los desplazamientos referidos a ella).
+
+        Args:
+            audio_path: archivo de audio
+
+        Returns:
+            None si es una grabación original, o dict con 'original' (ruta),
+            'offset' (s desde el inicio del original), 'score', 'matches' y
+            'exact' (mismo contenido byte a byte)
+        """
+        # Rutas absolutas: el mismo archivo con ruta relativa y absoluta no es una copia
+        audio_path = Path(audio_path).resolve()
+        audio_hash = file_hash(audio_path)
+
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, path, duplicate_of, offset, score, exact FROM recordings "
+                                "WHERE audio_hash = ? ORDER BY id", (audio_hash,)).fetchall()
+            row = next((r for r in rows if Path(r[1]) == audio_path), None)
+            if row is None:
+                moved = next((r for r in rows if not Path(r[1]).exists()), None)
+                if moved is not None:
+                    # Archivo renombrado: la entrada pasa a la ruta nueva
+                    conn.execute("UPDATE recordings SET path = ? WHERE id = ?", (str(audio_path), moved[0]))
+                    row = moved
+            if row is None and rows:
+                # Mismo contenido con otro nombre: copia exacta del mismo original
+                rec_id, _, duplicate_of, offset, score, _ = rows[0]
+                conn.execute("INSERT INTO recordings (path, audio_hash, duration, n_hashes, duplicate_of, "
+                             "offset, score, exact) SELECT ?, audio_hash, duration, n_hashes, ?, ?, ?, 1 "
+                             "FROM recordings WHERE id = ?",
+                             (str(audio_path), duplicate_of or rec_id, offset or 0.0, score or 1.0, rec_id))
+                original = conn.execute("SELECT path FROM recordings WHERE id = ?",
+                                        (duplicate_of or rec_id,)).fetchone()[0]
+                return {'original': original, 'offset': offset or 0.0, 'score': score or 1.0, 'matches': None,
+                        'exact': True}
+            if row is not None:
+                _, _, duplicate_of, offset, score, exact = row
+                if duplicate_of is None:
+                    return None
+                original = conn.execute("SELECT path FROM recordings WHERE id = ?", (duplicate_of,)).fetchone()[0]
+                return {'original': original, 'offset': offset, 'score': score, 'matches': None,
+                        'exact': bool(exact)}
+
+        buffer = open_recording(audio_path, mmap='auto')
+        hashes, frames = fingerprint(buffer)
+        match = self._best_match(hashes, frames)
+        promote = match is not None and buffer.duration > match['duration']
+
+        with self._connect() as conn:
+            # Entrada anterior de la misma ruta con otro contenido (archivo sobrescrito)
+            conn.execute("DELETE FROM hashes WHERE recording IN (SELECT id FROM recordings WHERE path = ?)",
+                         (str(audio_path),))
+            conn.execute("DELETE FROM recordings WHERE path = ?", (str(audio_path),))
+
+            copy = match is not None and not promote
+            cursor = conn.execute(
+                "INSERT INTO recordings (path, audio_hash, duration, n_hashes, duplicate_of, offset, score, exact) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (str(audio_path), audio_hash, buffer.duration, len(hashes),
+                 match['id'] if copy else None, match['offset'] if copy else None,
+                 match['score'] if copy else None))
+            # Las copias no se indexan: sus hashes ya están en el original
+            if not copy:
+                conn.executemany("INSERT INTO hashes (hash, recording, t) VALUES (?, ?, ?)",
+                                 zip(hashes.tolist(), [cursor.lastrowid] * len(hashes), frames.tolist()))
+            if promote:
+                # El original anterior empieza en -offset de la nueva grabación
+                conn.execute("UPDATE recordings SET duplicate_of = ?, offset = offset - ? WHERE duplicate_of = ?",
+                             (cursor.lastrowid, match['offset'], match['id']))
+                conn.execute("UPDATE recordings SET duplicate_of = ?, offset = ?, score = ? WHERE id = ?",
+                             (cursor.lastrowid, -match['offset'], match['score'], match['id']))
+                conn.execute("DELETE FROM hashes WHERE recording = ?", (match['id'],))
+
+        if not copy:
+            return None
+        return {'original': match['path'], 'offset': match['offset'], 'score': match['score'],
+                'matches': match['matches'], 'exact': False}
+
+    def _best_match(self, hashes, frames):
+        """Grabación indexada con más hashes alineados (o None si no supera el criterio)."""
+        if len(hashes) == 0:
+            return None
+
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE query (hash INTEGER, t INTEGER)")
+            conn.executemany("INSERT INTO query (hash, t) VALUES (?, ?)", zip(hashes.tolist(), frames.tolist()))
+            rows = conn.execute("""SELECT h.recording, h.t - q.t AS delta, COUNT(*) AS n
+                                   FROM query q JOIN hashes h ON h.hash = q.hash
+                                   GROUP BY h.recording, delta""").fetchall()
+            if not rows:
+                return None
+            rec_id, delta, matches = self._pooled_peak(rows)
+            path, n_hashes, duration = conn.execute(
+                "SELECT path, n_hashes, duration FROM recordings WHERE id = ?", (rec_id,)).fetchone()
+
+        score = min(matches / min(len(hashes), n_hashes), 1.0)
+        if matches < MIN_MATCHES or score < MIN_SCORE:
+            return None
+        return {'id': rec_id, 'path': path, 'duration': duration, 'offset': delta * HOP / FINGERPRINT_SR,
+                'score': score, 'matches': matches}
+
+    @staticmethod
+    def _pooled_peak(rows):
+        """
+        Desplazamiento con más coincidencias sumando los ±DELTA_TOLERANCE vecinos.
+
+        Args:
+            rows: (recording, delta, n) agrupados por grabación y desplazamiento
+
+        Returns:
+            (recording, delta, coincidencias)
+        """
+        rows = np.array(rows, dtype=np.int64)
+        best = (None, None, -1)
+        for rec_id in np.unique(rows[:, 0]):
+            deltas, counts = rows[rows[:, 0] == rec_id, 1:].T
+            lo = deltas.min() - DELTA_TOLERANCE
+            histogram = np.bincount(deltas - lo, weights=counts,
+                                    minlength=deltas.max() - lo + DELTA_TOLERANCE + 1)
+            pooled = np.convolve(histogram, np.ones(2 * DELTA_TOLERANCE + 1), mode='same')
+            peak = int(np.argmax(pooled))
+            if pooled[peak] > best[2]:
+                best = (int(rec_id), peak + int(lo), int(pooled[peak]))
+        return best
+
+    def duplicates(self, audio_files):
+        """
+        Copias que sobran en un conjunto de grabaciones ya comprobadas.
+
+        De cada grupo (un original y sus copias) se queda el original si está
+        en el conjunto y, si no, la copia más larga: una copia cuyo original
+        ya no forma parte del corpus vuelve a analizarse.
+
+        Args:
+            audio_files: rutas de las grabaciones (las no indexadas se quedan)
+
+        Returns:
+            dict ruta (como se pasó) -> dict con 'original' (la ruta que se
+            queda, como se pasó), 'offset' (s desde su inicio), 'score' y
+            'exact'
+        """
+        with self._connect() as conn:
+            known = {path: (rec_id, root, duration, offset or 0.0, score, bool(exact))
+                     for rec_id, path, root, duration, offset, score, exact in conn.execute(
+                         "SELECT id, path, COALESCE(duplicate_of, id), duration, offset, score, exact "
+                         "FROM recordings")}
+
+        groups = {}
+        for audio_file in audio_files:
+            entry = known.get(str(Path(audio_file).resolve()))
+            if entry is not None:
+                groups.setdefault(entry[1], []).append((audio_file, entry))
+
+        duplicates = {}
+        for root, members in groups.items():
+            # El original si está; si no, la copia más larga (la primera si empatan)
+            keeper, (_, _, _, keeper_offset, _, _) = next(
+                (m for m in members if m[1][0] == root), max(members, key=lambda m: m[1][2]))
+            for audio_file, (_, _, _, offset, score, exact) in members:
+                if audio_file is not keeper:
+                    duplicates[audio_file] = {'original': keeper, 'offset': offset - keeper_offset,
+                                              'score': score, 'exact': exact}
+        return duplicates
+
+    def screen(self, audio_files):
+        """
+        Quita de una lista las copias de otras grabaciones de la lista.
+
+        Args:
+            audio_files: rutas de las grabaciones
+
+        Returns:
+            lista de grabaciones originales (ver duplicates()), en el mismo orden
+        """
+        print("\n🔎 Detección de duplicados")
+        for audio_file in audio_files:
+            self.check(audio_file)
+        duplicates = self.duplicates(audio_files)
+
+        originals = []
+        for audio_file in audio_files:
+            duplicate = duplicates.get(audio_file)
+            if duplicate is None:
+                originals.append(audio_file)
+                continue
+            kind = "copia exacta" if duplicate['exact'] else f"copia (coincidencia {duplicate['score']:.0%})"
+            print(f"  ♻ {Path(audio_file).name}: {kind} de {Path(duplicate['original']).name}, "
+                  f"desde {duplicate['offset']:.2f} s; se omite (cuentan los resultados del original)")
+
+        print(f"  ✓ Originales: {len(originals)}/{len(audio_files)}")
+        return originals
+
+
+def check_trims(audio_path, cuts=TRIM_CUTS):
+    """
+    Comprobación de regresión: copias recortadas fuera de la rejilla del hop.
+
+    Indexa la grabación en un índice temporal y comprueba que cada copia que
+    empieza en uno de los recortes (hasta el final del archivo) se detecta
+    como copia del original con el desplazamiento correcto.
+
+    Args:
+        audio_path: grabación original
+        cuts: inicios de las copias (s)
+
+    Returns:
+        lista de (recorte, resultado de check() o None)
+    """
+    audio, sr = sf.read(audio_path, always_2d=False)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        index = FingerprintIndex(Path(tmp) / 'fingerprints.sqlite')
+        if index.check(audio_path) is not None:
+            raise RuntimeError(f"{audio_path} ya figura como copia en un índice vacío")
+        for cut in cuts:
+            trimmed = Path(tmp) / f"{Path(audio_path).stem}_desde_{cut:g}.wav"
+            sf.write(trimmed, audio[int(round(cut * sr)):], sr)
+            results.append((cut, index.check(trimmed)))
+    return results
+
+
+def main(argv=None):
+    """Comprueba que las copias recortadas de cada grabación se detectan."""
+    parser = argparse.ArgumentParser(description="Detección de copias recortadas")
+    parser.add_argument('audio_files', nargs='+', help="grabaciones originales")
+    parser.add_argument('--cuts', type=float, nargs='+', default=TRIM_CUTS, help="inicios de las copias (s)")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for audio_file in args.audio_files:
+        print(f"\n🔎 {Path(audio_file).name}")
+        for cut, duplicate in check_trims(audio_file, args.cuts):
+            if duplicate is None or abs(duplicate['offset'] - cut) > 2 * DELTA_TOLERANCE * HOP / FINGERPRINT_SR:
+                failed += 1
+                print(f"  ❌ desde {cut:.2f} s: no detectada" if duplicate is None else
+                      f"  ❌ desde {cut:.2f} s: desplazamiento {duplicate['offset']:.3f} s")
+            else:
+                print(f"  ✓ desde {cut:.2f} s: coincidencia {duplicate['score']:.0%}, "
+                      f"desplazamiento {duplicate['offset']:.3f} s")
+    if failed:
+        sys.exit(f"❌ {failed} copias recortadas sin detectar")
+
+
+if __name__ == "__main__":
+    main()
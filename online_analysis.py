@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+Análisis en línea (baja latencia) de vocales
+============================================
+Versión incremental de VowelDetector para retroalimentación en vivo
+(p.ej. sesiones de logopedia). El audio llega en bloques pequeños
+(10-20 ms) y el detector:
+
+1. Mantiene un buffer circular acotado con el audio reciente
+2. Calcula pitch (Praat) e intensidad frame a frame (cada 10 ms)
+3. Decide la sonoridad con un umbral de intensidad móvil (percentil del
+   historial reciente, en lugar del percentil de toda la palabra)
+4. Al cerrarse un segmento sonoro emite un evento con F0, F1, F2 y F3
+5. Mide la latencia de cada evento frente a un presupuesto configurado
+
+Latencia de un evento = retardo algorítmico (desde el final de la vocal
+hasta el final del bloque que permitió cerrarla) + tiempo de cómputo
+(desde que llegó ese bloque hasta que se emitió el evento).
+
+StreamingWordSegmenter es la versión en bloques de WordSegmenter: memoria
+constante, nivel de referencia fijo o móvil e histéresis de entrada/salida.
+"""
+
+import time
+from collections import deque
+
+import numpy as np
+import parselmouth
+from parselmouth.praat import call
+import soundfile as sf
+
+from corpus import CorpusManifest
+
+
+class OnlineVowelDetector:
+    """Detector incremental de vocales con presupuesto de latencia por evento."""
+
+    def __init__(self, sr, pitch_floor=150, pitch_ceiling=500, min_vowel_duration=0.05,
+                 max_vowel_duration=0.4, latency_budget=0.1, block_duration=0.02,
+                 intensity_history=2.0, intensity_percentile=25):
+        """
+        Args:
+            sr: sample rate del audio entrante
+            pitch_floor: frecuencia mínima de pitch (Hz) - mínimo 150 Hz para Praat
+            pitch_ceiling: frecuencia máxima de pitch (Hz)
+            min_vowel_duration: duración mínima de una vocal (segundos)
+            max_vowel_duration: las vocales más largas se cortan y se emiten,
+                para acotar la latencia y el buffer
+            latency_budget: latencia máxima aceptable por evento (segundos)
+            block_duration: duración esperada de cada bloque de entrada (segundos)
+            intensity_history: ventana del umbral móvil de intensidad (segundos)
+            intensity_percentile: percentil de intensidad para considerar un frame sonoro
+        """
+        self.sr = int(sr)
+        self.pitch_floor = max(150, pitch_floor)  # Praat requiere mínimo 150 Hz
+        self.pitch_ceiling = pitch_ceiling
+        self.min_vowel_duration = min_vowel_duration
+        self.latency_budget = latency_budget
+        self.intensity_percentile = intensity_percentile
+
+        self.time_step = 0.01  # 10ms, igual que VowelDetector
+        self.max_vowel_frames = int(round(max_vowel_duration / self.time_step))
+
+        # Ventana de intensidad equivalente a "To Intensity" con pitch mínimo 75 Hz
+        self._intensity_window = np.kaiser(int(3.2 / 75 * self.sr), 20)
+        # Contexto necesario a cada lado de un frame (pitch e intensidad)
+        self.lookahead = max(3.0 / self.pitch_floor, 1.6 / 75) + 0.005
+        # Contexto alrededor del punto medio para el análisis de formantes
+        self.formant_context = 0.03
+
+        algorithmic = block_duration + self.time_step + self.lookahead
+        if algorithmic > latency_budget:
+            raise ValueError(f"Presupuesto de latencia {latency_budget*1000:.0f} ms inalcanzable: "
+                             f"el retardo algorítmico mínimo es {algorithmic*1000:.0f} ms")
+
+        # Estado del buffer circular
+        self._ring = np.zeros(0, dtype=np.float32)
+        self._ring_start = 0        # índice (muestra) del primer elemento del buffer
+        self._received = 0          # muestras recibidas en total
+        self._next_frame = 0        # siguiente frame a calcular
+
+        # Estado de la vocal en curso
+        self._run_start = None
+        self._run_pitch = []
+        self._run_intensity = []
+        self._history = deque(maxlen=int(intensity_history / self.time_step))
+
+        # Métricas de latencia
+        self.events = []
+        self.block_times = []
+
+    @property
+    def stream_time(self):
+        """Tiempo de audio recibido hasta ahora (segundos)."""
+        return self._received / self.sr
+
+    def process_block(self, block):
+        """
+        Procesa un bloque de audio y devuelve los eventos vocálicos cerrados.
+
+        Args:
+            block: muestras nuevas (mono)
+
+        Returns:
+            lista de eventos (dict) emitidos por este bloque
+        """
+        arrival = time.perf_counter()
+        block = np.asarray(block, dtype=np.float32)
+        self._ring = np.concatenate([self._ring, block])
+        self._received += len(block)
+
+        events = []
+        ready = self._ready_frames()
+        if ready > self._next_frame:
+            frame_times = np.arange(self._next_frame, ready) * self.time_step
+            pitch_values, intensity_values = self._analyze_frames(frame_times)
+
+            for f0, intens in zip(pitch_values, intensity_values):
+                event = self._update_run(self._next_frame, f0, intens)
+                if event:
+                    events.append(self._finish_event(event, arrival))
+                self._next_frame += 1
+
+        self._trim_ring()
+        self.block_times.append(time.perf_counter() - arrival)
+        return events
+
+    def flush(self):
+        """Cierra la vocal en curso al final del flujo."""
+        arrival = time.perf_counter()
+        events = []
+        if self._run_start is not None:
+            event = self._close_run(self._next_frame)
+            if event:
+                events.append(self._finish_event(event, arrival))
+        return events
+
+    def _ready_frames(self):
+        """Número de frames con contexto suficiente para calcularse."""
+        available = self.stream_time - self.lookahead
+        if available < 0:
+            return 0
+        return int(np.floor(available / self.time_step)) + 1
+
+    def _segment(self, start_time, end_time):
+        """Audio del buffer entre dos tiempos (recortado a lo disponible)."""
+        start = max(self._ring_start, int(start_time * self.sr))
+        end = min(self._received, int(end_time * self.sr))
+        return self._ring[start - self._ring_start:max(start, end) - self._ring_start], start / self.sr
+
+    def _analyze_frames(self, frame_times):
+        """Pitch e intensidad de un grupo de frames con una sola llamada a Praat."""
+        segment, offset = self._segment(frame_times[0] - self.lookahead, frame_times[-1] + self.lookahead)
+
+        pitch_values = np.zeros(len(frame_times))
+        try:
+            snd = parselmouth.Sound(segment.astype(np.float64), sampling_frequency=self.sr)
+            pitch = call(snd, "To Pitch", 0.0, self.pitch_floor, self.pitch_ceiling)
+            for i, t in enumerate(frame_times):
+                f0 = call(pitch, "Get value at time", t - offset, "Hertz", "Linear")
+                pitch_values[i] = f0 if f0 and not np.isnan(f0) else 0
+        except Exception:
+            pass
+
+        half = len(self._intensity_window) // 2
+        intensity_values = np.zeros(len(frame_times))
+        for i, t in enumerate(frame_times):
+            center = int(t * self.sr) - self._ring_start
+            frame = self._ring[max(0, center - half):center - half + len(self._intensity_window)]
+            if len(frame) < len(self._intensity_window):
+                continue
+            frame = frame - frame.mean()
+            power = np.sum(self._intensity_window * frame ** 2) / np.sum(self._intensity_window)
+            if power > 0:
+                intensity_values[i] = 10 * np.log10(power / 4e-10)
+
+        return pitch_values, intensity_values
+
+    def _update_run(self, frame, f0, intens):
+        """Actualiza el estado de la vocal en curso con un frame nuevo."""
+        if intens > 0:
+            self._history.append(intens)
+        threshold = np.percentile(self._history, self.intensity_percentile) if self._history else np.inf
+        voiced = f0 > 0 and intens > threshold
+
+        if voiced:
+            if self._run_start is None:
+                self._run_start = frame
+            self._run_pitch.append(f0)
+            self._run_intensity.append(intens)
+            if len(self._run_pitch) >= self.max_vowel_frames:
+                # Vocal demasiado larga: se emite ya para respetar la latencia
+                return self._close_run(frame + 1)
+            return None
+
+        if self._run_start is not None:
+            return self._close_run(frame)
+        return None
+
+    def _close_run(self, end_frame):
+        """Cierra la vocal en curso y, si es válida, extrae sus formantes."""
+        start_time = self._run_start * self.time_step
+        end_time = end_frame * self.time_step
+        pitch_values = np.array(self._run_pitch)
+        intensity_values = np.array(self._run_intensity)
+        self._run_start = None
+        self._run_pitch = []
+        self._run_intensity = []
+
+        duration = end_time - start_time
+        if duration < self.min_vowel_duration:
+            return None
+
+        mid_time = (start_time + end_time) / 2
+        valid_pitch = pitch_values[pitch_values > 0]
+        event = {
+            'start_time': start_time,
+            'end_time': end_time,
+            'mid_time': mid_time,
+            'duration': duration,
+            'pitch': float(np.mean(valid_pitch)) if len(valid_pitch) > 0 else 0,
+            'intensity_mean': float(np.mean(intensity_values)),
+            'f1': None,
+            'f2': None,
+            'f3': None,
+        }
+        formants = self._extract_formants(mid_time)
+        if formants:
+            event.update(formants)
+        return event
+
+    def _extract_formants(self, mid_time):
+        """F1, F2, F3 en el punto medio (mismos parámetros y validación que VowelDetector)."""
+        segment, offset = self._segment(mid_time - self.formant_context, mid_time + self.formant_context)
+        try:
+            snd = parselmouth.Sound(segment.astype(np.float64), sampling_frequency=self.sr)
+            formant = call(snd, "To Formant (burg)", 0.0, 5, 5500, 0.025, 50)
+            local_time = mid_time - offset
+            f1 = call(formant, "Get value at time", 1, local_time, "Hertz", "Linear")
+            f2 = call(formant, "Get value at time", 2, local_time, "Hertz", "Linear")
+            f3 = call(formant, "Get value at time", 3, local_time, "Hertz", "Linear")
+
+            if f1 and not np.isnan(f1) and f1 > 0 and f1 < 1500:
+                if f2 and not np.isnan(f2) and f2 > f1 and f2 < 3500:
+                    if f3 and not np.isnan(f3) and f3 > f2 and f3 < 5000:
+                        return {'f1': f1, 'f2': f2, 'f3': f3}
+        except Exception:
+            pass
+        return None
+
+    def _finish_event(self, event, arrival):
+        """Añade las medidas de latencia al evento y lo registra."""
+        event['emitted_at'] = self.stream_time
+        event['algorithmic_latency'] = self.stream_time - event['end_time']
+        event['compute_latency'] = time.perf_counter() - arrival
+        event['latency'] = event['algorithmic_latency'] + event['compute_latency']
+        event['within_budget'] = event['latency'] <= self.latency_budget
+        self.events.append({k: event[k] for k in ('latency', 'algorithmic_latency', 'compute_latency', 'within_budget')})
+        return event
+
+    def _trim_ring(self):
+        """Descarta el audio que ya no puede necesitarse (buffer acotado)."""
+        keep_from = self._next_frame * self.time_step - self.lookahead
+        if self._run_start is not None:
+            keep_from = min(keep_from, self._run_start * self.time_step - self.formant_context)
+        keep_sample = max(self._ring_start, int(keep_from * self.sr) - 1)
+        if keep_sample > self._ring_start:
+            self._ring = self._ring[keep_sample - self._ring_start:]
+            self._ring_start = keep_sample
+
+    def latency_report(self):
+        """
+        Percentiles de latencia de los eventos emitidos.
+
+        Returns:
+            dict con p50/p90/p95/p99/max de la latencia total, eventos fuera de
+            presupuesto y factor de tiempo real del procesamiento por bloque
+        """
+        report = {
+            'num_events': len(self.events),
+            'latency_budget': self.latency_budget,
+            'over_budget': sum(1 for e in self.events if not e['within_budget']),
+        }
+        if self.events:
+            latencies = np.array([e['latency'] for e in self.events])
+            for q in (50, 90, 95, 99):
+                report[f'latency_p{q}'] = float(np.percentile(latencies, q))
+            report['latency_max'] = float(latencies.max())
+            report['compute_p95'] = float(np.percentile([e['compute_latency'] for e in self.events], 95))
+        if self.block_times:
+            report['block_time_p95'] = float(np.percentile(self.block_times, 95))
+            report['real_time_factor'] = float(np.sum(self.block_times) / max(self.stream_time, 1e-9))
+        return report
+
+
+class StreamingWordSegmenter:
+    """
+    Segmentación en palabras por bloques, con histéresis y estado entre bloques.
+
+    Calcula la misma envolvente RMS que WordSegmenter (frames de 25 ms centrados,
+    salto de 10 ms) a medida que llegan las muestras y emite cada segmento en
+    cuanto se cierra. Con una referencia fija igual al máximo RMS de la
+    grabación y sin histéresis, los segmentos son idénticos a los de
+    WordSegmenter.segment().
+    """
+
+    AMIN = 1e-5  # como librosa.amplitude_to_db
+
+    def __init__(self, sr, silence_thresh_db=-40, min_word_len=0.2, exit_thresh_db=None,
+                 reference=None, reference_release=0.0, top_db=80.0):
+        """
+        Args:
+            sr: sample rate
+            silence_thresh_db: umbral de entrada en habla (dB respecto a la referencia)
+            min_word_len: duración mínima de una palabra válida (segundos)
+            exit_thresh_db: umbral de salida (por defecto igual al de entrada); si es
+                menor, un segmento no se corta por caídas breves de energía
+            reference: nivel RMS de referencia fijo; None = máximo móvil de lo recibido
+            reference_release: caída del máximo móvil en dB/s (0 = no cae nunca)
+            top_db: suelo de la envolvente en dB por debajo de la referencia
+        """
+        self.sr = int(sr)
+        self.enter_thresh_db = silence_thresh_db
+        self.exit_thresh_db = silence_thresh_db if exit_thresh_db is None else exit_thresh_db
+        if self.exit_thresh_db > self.enter_thresh_db:
+            raise ValueError("El umbral de salida no puede ser mayor que el de entrada")
+        self.min_word_len = min_word_len
+        self.fixed_reference = reference is not None
+        self.reference = np.float32(reference if reference is not None else 0.0)
+        self.top_db = top_db
+
+        self.frame_length = int(0.025 * self.sr)  # 25ms frames
+        self.hop_length = int(0.010 * self.sr)    # 10ms hop
+        self._pad = self.frame_length // 2
+        self._release = np.float32(10 ** (-reference_release * 0.010 / 20))
+
+        # Estado entre bloques
+        self._tail = np.zeros(self._pad, dtype=np.float32)  # relleno inicial (frames centrados)
+        self._tail_start = -self._pad  # muestra del primer elemento de _tail
+        self._received = 0
+        self._next_frame = 0
+        self._in_speech = False
+        self._start_time = 0
+        self._last_time = 0
+        self._count = 0
+
+    def _frame_time(self, frame):
+        return frame * self.hop_length / float(self.sr)
+
+    def process_block(self, block):
+        """
+        Procesa un bloque de muestras.
+
+        Returns:
+            lista de segmentos cerrados en este bloque (mismo formato que WordSegmenter)
+        """
+        block = np.asarray(block, dtype=np.float32)
+        self._tail = np.concatenate([self._tail, block])
+        self._received += len(block)
+
+        # Frames completos disponibles: el frame k necesita hasta k*hop - pad + frame_length
+        ready = (self._received + self._pad - self.frame_length) // self.hop_length + 1
+        return self._consume(max(self._next_frame, ready))
+
+    def flush(self):
+        """Cierra el flujo: calcula los últimos frames (relleno con ceros) y el segmento abierto."""
+        n_frames = 1 + self._received // self.hop_length
+        self._tail = np.concatenate([self._tail, np.zeros(self.frame_length, dtype=np.float32)])
+        segments = self._consume(n_frames)
+
+        # Si termina en habla, el segmento llega hasta el último frame (sin duración mínima)
+        if self._in_speech:
+            segments.append(self._segment(self._start_time, self._last_time))
+            self._in_speech = False
+        return segments
+
+    def _consume(self, end_frame):
+        """Calcula los frames [_next_frame, end_frame) y actualiza la máquina de estados."""
+        if end_frame <= self._next_frame:
+            return []
+
+        start = self._next_frame * self.hop_length - self._pad - self._tail_start
+        end = (end_frame - 1) * self.hop_length - self._pad + self.frame_length - self._tail_start
+        frames = np.lib.stride_tricks.sliding_window_view(self._tail[start:end], self.frame_length)[::self.hop_length]
+        rms = np.sqrt(np.mean(np.abs(frames) ** 2, axis=1))
+        rms_db = self._to_db(rms)
+
+        segments = []
+        for i, level in enumerate(rms_db):
+            time = self._frame_time(self._next_frame + i)
+            if not self._in_speech and level > self.enter_thresh_db:
+                # Inicio de habla
+                self._start_time = time
+                self._in_speech = True
+            elif self._in_speech and not level > self.exit_thresh_db:
+                # Fin de habla: solo se guarda si es suficientemente largo
+                if time - self._start_time >= self.min_word_len:
+                    segments.append(self._segment(self._start_time, time))
+                self._in_speech = False
+            self._last_time = time
+
+        # Descartar las muestras que ya no necesita ningún frame
+        self._next_frame = end_frame
+        keep_from = self._next_frame * self.hop_length - self._pad
+        self._tail = self._tail[keep_from - self._tail_start:]
+        self._tail_start = keep_from
+        return segments
+
+    def _to_db(self, rms):
+        """RMS a dB respecto a la referencia (misma aritmética que librosa.amplitude_to_db)."""
+        if self.fixed_reference:
+            reference = self.reference
+        else:
+            reference = np.empty_like(rms)
+            level = self.reference
+            for i, value in enumerate(rms):
+                level = max(value, level * self._release)
+                reference[i] = level
+            self.reference = np.float32(level)
+
+        power = np.square(np.abs(rms))
+        db = 10.0 * np.log10(np.maximum(self.AMIN ** 2, power))
+        db -= 10.0 * np.log10(np.maximum(self.AMIN ** 2, np.square(np.abs(reference))))
+        if self.top_db is not None:
+            db = np.maximum(db, -self.top_db)
+        return db
+
+    def _segment(self, start, end):
+        segment = {
+            'index': self._count,
+            'start_time': start,
+            'end_time': end,
+            'duration': end - start,
+            'start_sample': int(start * self.sr),
+            'end_sample': int(end * self.sr),
+        }
+        self._count += 1
+        return segment
+
+
+def segment_stream(audio_path, block_duration=0.5, **kwargs):
+    """
+    Segmenta un archivo leyéndolo por bloques (memoria constante).
+
+    Args:
+        audio_path: ruta al archivo de audio
+        block_duration: duración de cada bloque (segundos)
+        **kwargs: parámetros de StreamingWordSegmenter
+
+    Yields:
+        segmentos (dict) a medida que se cierran
+    """
+    sr = sf.info(str(audio_path)).samplerate
+    segmenter = StreamingWordSegmenter(sr, **kwargs)
+    for block in sf.blocks(str(audio_path), blocksize=int(block_duration * sr), dtype='float32', always_2d=True):
+        yield from segmenter.process_block(block.mean(axis=1))
+    yield from segmenter.flush()
+
+
+def run_online(audio_path, block_duration=0.02, **kwargs):
+    """
+    Simula una sesión en vivo alimentando un archivo en bloques pequeños.
+
+    Args:
+        audio_path: ruta al archivo de audio
+        block_duration: duración de cada bloque (segundos), p.ej. 0.01-0.02
+        **kwargs: parámetros de OnlineVowelDetector
+
+    Returns:
+        (lista de eventos, informe de latencia)
+    """
+    sr = sf.info(str(audio_path)).samplerate
+    detector = OnlineVowelDetector(sr, block_duration=block_duration, **kwargs)
+    blocksize = int(block_duration * sr)
+
+    events = []
+    for block in sf.blocks(str(audio_path), blocksize=blocksize, dtype='float32', always_2d=True):
+        events.extend(detector.process_block(block.mean(axis=1)))
+    events.extend(detector.flush())
+
+    return events, detector.latency_report()
+
+
+def main():
+    """Demostración del modo en línea sobre las grabaciones del proyecto."""
+    print("="*70)
+    print("ANÁLISIS EN LÍNEA DE VOCALES (BAJA LATENCIA)")
+    print("="*70)
+
+    manifest = CorpusManifest()
+    audio_files = [recording.path for recording in manifest.recordings()]
+    if not audio_files:
+        print(f"\n❌ No hay grabaciones en {manifest.path}")
+        return
+
+    for audio_file in audio_files:
+        events, report = run_online(audio_file)
+        print(f"\n{audio_file.name}: {report['num_events']} vocales emitidas")
+        if report['num_events']:
+            print(f"  Latencia p50/p95/p99: {report['latency_p50']*1000:.0f} / "
+                  f"{report['latency_p95']*1000:.0f} / {report['latency_p99']*1000:.0f} ms "
+                  f"(presupuesto {report['latency_budget']*1000:.0f} ms, "
+                  f"fuera: {report['over_budget']})")
+        print(f"  Factor de tiempo real: {report.get('real_time_factor', 0):.2f}")
+
+        segments = list(segment_stream(audio_file))
+        print(f"  Segmentos (streaming, referencia móvil): {len(segments)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Análisis en paralelo de varias grabaciones
+==========================================
+El trabajo de Praat de cada archivo es independiente y limitado por CPU, así
+que cada grabación se analiza en un proceso del pool. Los workers devuelven
+solo tablas de resultados (VowelTable, dicts, arrays; ver
+WordBasedVoiceAnalyzer.result_tables) y el proceso principal reconstruye el
+analizador sin abrir la grabación hasta que algo la lee (LazyRecording).
+
+Las tareas se envían de la más larga a la más corta (el archivo más largo no
+queda para el final) y los resultados se devuelven en el orden de entrada,
+así que classify_vowels() y compare_genders() ven siempre lo mismo que en la
+ejecución en serie.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from execution_plan import available_cores, limit_threads
+
+
+def default_workers():
+    """Número de procesos por defecto (un proceso por núcleo disponible, con la cuota del cgroup)."""
+    return available_cores()
+
+
+def run_parallel(worker, tasks, workers=None, chunksize=1, costs=None, threads=None):
+    """
+    Ejecuta worker(task) para cada tarea en un pool de procesos.
+
+    Args:
+        worker: función de nivel de módulo (picklable) que analiza una tarea
+        tasks: lista de tareas (picklables)
+        workers: número de procesos (None = default_workers(); 1 = en serie, sin pool)
+        chunksize: tareas que recibe cada proceso de una vez
+        costs: coste estimado de cada tarea (p.ej. tamaño del archivo) para
+            enviar primero las más caras
+        threads: hilos de BLAS/OpenMP por proceso (ver execution_plan.limit_threads)
+
+    Returns:
+        lista de resultados en el mismo orden que tasks
+    """
+    tasks = list(tasks)
+    workers = min(workers or default_workers(), len(tasks)) if tasks else 1
+    if workers <= 1:
+        return [worker(task) for task in tasks]
+
+    order = sorted(range(len(tasks)), key=lambda i: -costs[i]) if costs is not None else list(range(len(tasks)))
+    pool_kwargs = {} if threads is None else {'initializer': limit_threads, 'initargs': (threads,)}
+    with ProcessPoolExecutor(max_workers=workers, **pool_kwargs) as pool:
+        results = list(pool.map(worker, [tasks[i] for i in order], chunksize=chunksize))
+
+    ordered = [None] * len(tasks)
+    for i, result in zip(order, results):
+        ordered[i] = result
+    return ordered
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Rango de F0 adaptado a cada hablante (análisis en dos pasadas)
+==============================================================
+Ambos analizadores usan por defecto un rango fijo de 150-500 Hz en cada
+palabra. En modo de dos pasadas:
+
+1. Primera pasada barata: la grabación completa, diezmada a 8 kHz, con un
+   único "To Pitch" de rango amplio (75-600 Hz), da la distribución de F0
+   del hablante.
+2. Segunda pasada: todas las palabras se analizan con un suelo y un techo
+   ajustados a esa distribución (regla de Hirst: 0.75 × Q1 y 1.5 × Q3).
+
+Un techo más bajo reduce el rango de retardos de la autocorrelación y los
+errores de octava; un suelo más alto acorta la ventana de análisis
+(3 periodos del suelo) y, con ella, el coste por frame.
+
+Con el manifiesto del corpus, speaker_pitch_ranges() junta la primera pasada
+de todas las grabaciones de cada hablante: una grabación corta o con poca
+voz usa el rango de su hablante en lugar de uno estimado con pocos frames.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import parselmouth
+from parselmouth.praat import call
+
+from audio_buffer import ResampledSignalCache, open_recording
+from parallel import run_parallel
+
+
+# Rango fijo por defecto (el de ambos pipelines)
+DEFAULT_PITCH_RANGE = (150, 500)
+
+# Primera pasada: rango amplio sobre la señal diezmada
+FIRST_PASS_FLOOR = 75
+FIRST_PASS_CEILING = 600
+FIRST_PASS_SR = 8000
+
+# Frames sonoros mínimos para fiarse de la estimación
+MIN_VOICED_FRAMES = 50
+
+
+def pitch_range_from_values(f0_values, floor_factor=0.75, ceiling_factor=1.5,
+                            limits=(FIRST_PASS_FLOOR, FIRST_PASS_CEILING)):
+    """
+    Rango de análisis a partir de valores de F0 sonoros.
+
+    Args:
+        f0_values: valores de F0 (Hz) de frames sonoros (p.ej. de varias grabaciones
+            del mismo hablante)
+        floor_factor: suelo = floor_factor × percentil 25
+        ceiling_factor: techo = ceiling_factor × percentil 75
+        limits: (mínimo, máximo) admisibles para el rango
+
+    Returns:
+        dict con floor, ceiling, q25, median, q75, n_voiced y adapted
+        (False si no hay frames suficientes y se usa el rango por defecto)
+    """
+    values = np.asarray(f0_values, dtype=np.float64)
+    values = values[values > 0]
+
+    if len(values) < MIN_VOICED_FRAMES:
+        floor, ceiling = DEFAULT_PITCH_RANGE
+        return {'floor': floor, 'ceiling': ceiling, 'q25': np.nan, 'median': np.nan, 'q75': np.nan,
+                'n_voiced': len(values), 'adapted': False}
+
+    q25, median, q75 = np.percentile(values, [25, 50, 75])
+    floor = int(np.floor(max(limits[0], floor_factor * q25)))
+    ceiling = int(np.ceil(min(limits[1], ceiling_factor * q75)))
+
+    return {'floor': floor, 'ceiling': ceiling, 'q25': q25, 'median': median, 'q75': q75,
+            'n_voiced': len(values), 'adapted': True}
+
+
+def first_pass_f0(buffer, analysis_sr=FIRST_PASS_SR, floor=FIRST_PASS_FLOOR, ceiling=FIRST_PASS_CEILING):
+    """
+    Primera pasada: F0 de toda la grabación sobre la señal diezmada.
+
+    Args:
+        buffer: RecordingBuffer (o MappedWavReader) de la grabación
+        analysis_sr: frecuencia de muestreo de la primera pasada
+        floor, ceiling: rango amplio de búsqueda (Hz)
+
+    Returns:
+        array con los valores de F0 de los frames sonoros
+    """
+    decimated, sr = ResampledSignalCache(buffer).get(analysis_sr / 2)
+    snd = parselmouth.Sound(decimated.astype(np.float64), sampling_frequency=sr)
+    pitch = call(snd, "To Pitch", 0.0, floor, ceiling)
+    values = pitch.selected_array['frequency']
+    return values[values > 0]
+
+
+def estimate_pitch_range(buffer, **kwargs):
+    """
+    Rango de F0 de una grabación (un hablante) en una pasada barata.
+
+    Args:
+        buffer: RecordingBuffer (o MappedWavReader) de la grabación
+        **kwargs: parámetros de pitch_range_from_values
+
+    Returns:
+        dict de pitch_range_from_values
+    """
+    return pitch_range_from_values(first_pass_f0(buffer), **kwargs)
+
+
+def _first_pass(audio_path):
+    """Worker de run_parallel: primera pasada de una grabación."""
+    return first_pass_f0(open_recording(audio_path, mmap='auto'))
+
+
+def speaker_pitch_ranges(audio_files, manifest, workers=None, **kwargs):
+    """
+    Rango de F0 por hablante, con la primera pasada de todas sus grabaciones.
+
+    Se agrupan las grabaciones de audio_files por la columna speaker del
+    manifiesto (las que no tienen hablante se estiman cada una por separado).
+
+    Args:
+        audio_files: grabaciones que se van a analizar
+        manifest: CorpusManifest con el hablante de cada grabación
+        workers: procesos para la primera pasada (ver parallel.run_parallel)
+        **kwargs: parámetros de pitch_range_from_values
+
+    Returns:
+        dict ruta absoluta (str) -> dict de pitch_range_from_values
+    """
+    wanted = {str(Path(f).resolve()) for f in audio_files}
+    groups = []
+    for speaker, recordings in manifest.group_by('speaker').items():
+        if speaker is None:
+            continue
+        group = [path for path in (str(r.path.resolve()) for r in recordings) if path in wanted]
+        if group:
+            groups.append(group)
+    grouped = {path for group in groups for path in group}
+    groups.extend([path] for path in sorted(wanted - grouped))
+
+    paths = [path for group in groups for path in group]
+    f0_values = dict(zip(paths, run_parallel(_first_pass, paths, workers,
+                                             costs=[os.path.getsize(p) for p in paths])))
+
+    ranges = {}
+    for group in groups:
+        pitch_range = pitch_range_from_values(np.concatenate([f0_values[p] for p in group]), **kwargs)
+        ranges.update(dict.fromkeys(group, pitch_range))
+    return ranges
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Pistas de Praat persistentes (pitch, intensidad, formantes)
+===========================================================
+Las pistas que calcula Praat para cada palabra (Pitch, Intensity y Formant)
+se guardan en disco como arrays de NumPy comprimidos (.npz), un archivo por
+grabación y conjunto de parámetros:
+
+    .cache/tracks/<sha256(hash del audio, parámetros, versión)>.npz
+
+Al cambiar de pipeline, volver a graficar o recalcular estadísticas no se
+vuelve a ejecutar Praat: las consultas "Get value at time" se resuelven sobre
+los arrays con la misma interpolación que Praat (lineal para Pitch/Formant,
+cúbica para Intensity), con resultados idénticos.
+
+El almacén tiene un tamaño máximo y expulsa los archivos usados hace más
+tiempo (LRU). Las escrituras son atómicas (archivo temporal + rename) y se
+serializan con un lock de archivo, así que varios procesos pueden leer y
+escribir a la vez.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from parselmouth.praat import call
+
+from result_cache import file_hash, make_key
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+
+# Parámetros por defecto de las pistas (los mismos en ambos analizadores)
+DEFAULT_TRACK_PARAMS = {
+    'pitch_floor': 150,
+    'pitch_ceiling': 500,
+    'intensity_min_pitch': 75,
+    'num_formants': 5,
+    'max_formant': 5500,
+    'formant_window': 0.025,
+    'pre_emphasis': 50,
+}
+
+# Versión del formato/cálculo de las pistas: subirla invalida el almacén
+TRACKS_VERSION = '1'
+
+
+class Track:
+    """Pista muestreada de Praat: valores por frame (NaN = indefinido) y eje temporal."""
+
+    def __init__(self, values, x1, dx, xmin, xmax):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.x1 = float(x1)
+        self.dx = float(dx)
+        self.xmin = float(xmin)
+        self.xmax = float(xmax)
+
+    @classmethod
+    def from_praat(cls, obj, values):
+        """Pista con el eje temporal de un objeto Praat (Pitch, Intensity, Formant)."""
+        return cls(values, obj.x1, obj.dx, obj.xmin, obj.xmax)
+
+    def to_array(self):
+        """Serializa como [x1, dx, xmin, xmax, valores...]."""
+        return np.concatenate([[self.x1, self.dx, self.xmin, self.xmax], self.values])
+
+    @classmethod
+    def from_array(cls, array):
+        return cls(array[4:], *array[:4])
+
+    def window(self, offset, duration):
+        """
+        Frames con centro en [offset, offset + duration], con tiempos relativos a offset.
+
+        Returns:
+            Track del tramo, o None si no contiene ningún frame
+        """
+        first = max(0, int(np.ceil((offset - self.x1) / self.dx)))
+        last = min(len(self.values) - 1, int(np.floor((offset + duration - self.x1) / self.dx)))
+        if last < first:
+            return None
+        return Track(self.values[first:last + 1], self.x1 + first * self.dx - offset, self.dx, 0.0, duration)
+
+    def _index(self, times):
+        return (np.asarray(times, dtype=np.float64) - self.x1) / self.dx + 1.0
+
+    def linear(self, times):
+        """
+        Valor en los tiempos dados con interpolación lineal (como "Get value at
+        time ... Linear" de Pitch y Formant): si el vecino está indefinido se
+        usa el frame más cercano.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        n = len(self.values)
+        padded = np.concatenate([[np.nan], self.values, [np.nan]])
+
+        ireal = self._index(times)
+        ileft = np.floor(ireal)
+        phase = ireal - ileft
+        left_is_near = phase < 0.5
+        inear = np.where(left_is_near, ileft, ileft + 1)
+        ifar = np.where(left_is_near, ileft + 1, ileft)
+        phase = np.where(left_is_near, phase, 1.0 - phase)
+
+        fnear = padded[np.clip(inear, 0, n + 1).astype(int)]
+        ffar = padded[np.clip(ifar, 0, n + 1).astype(int)]
+        result = np.where(np.isnan(ffar), fnear, fnear + phase * (ffar - fnear))
+        return np.where((times < self.xmin) | (times > self.xmax), np.nan, result)
+
+    def cubic(self, times):
+        """Valor en los tiempos dados con interpolación cúbica (como Intensity "Cubic")."""
+        times = np.asarray(times, dtype=np.float64)
+        y = self.values
+        n = len(y)
+        padded = np.concatenate([[np.nan], y, [np.nan]])
+
+        x = self._index(times)
+        xc = np.clip(x, 1, n)
+        midleft = np.floor(xc)
+        midright = midleft + 1
+        depth = np.minimum(2, np.minimum(midright - 1, n - midleft))
+
+        def at(i):
+            return padded[np.clip(i, 0, n + 1).astype(int)]
+
+        yl, yr = at(midleft), at(midright)
+        fil, fir = xc - midleft, midright - xc
+        dyl = 0.5 * (yr - at(midleft - 1))
+        dyr = 0.5 * (at(midright + 1) - yl)
+        cubic = yl * fir + yr * fil - fil * fir * (0.5 * (dyr - dyl) + (fil - 0.5) * (dyl + dyr - 2 * (yr - yl)))
+        linear = yl + fil * (yr - yl)
+        nearest = at(np.floor(xc + 0.5))
+
+        result = np.select([x < 1, x > n, xc == midleft, depth <= 0, depth == 1],
+                           [y[0], y[n - 1], yl, nearest, linear], cubic)
+        left_edge = self.x1 - 0.5 * self.dx
+        right_edge = left_edge + n * self.dx
+        return np.where((times < left_edge) | (times > right_edge), np.nan, result)
+
+
+class WordTracks:
+    """Pistas de un tramo (tiempos locales, empezando en 0) y errores de Praat si los hubo."""
+
+    def __init__(self, duration, pitch=None, intensity=None, formants=None, errors=None):
+        """
+        Args:
+            duration: duración del tramo (s)
+            pitch: Track de F0 (Hz, NaN en frames sordos)
+            intensity: Track de intensidad (dB)
+            formants: lista [F1, F2, F3] de Track (Hz, NaN si el frame no tiene ese formante)
+            errors: dict pista -> mensaje de Praat de las pistas que no se pudieron calcular
+        """
+        self.duration = duration
+        self.pitch = pitch
+        self.intensity = intensity
+        self.formants = formants
+        self.errors = errors or {}
+
+    @classmethod
+    def compute(cls, snd, formant_snd=None, params=None):
+        """
+        Calcula las pistas con Praat.
+
+        Args:
+            snd: Sound del tramo
+            formant_snd: Sound del mismo tramo ya remuestreado para formantes (opcional)
+            params: parámetros (ver DEFAULT_TRACK_PARAMS)
+        """
+        p = {**DEFAULT_TRACK_PARAMS, **(params or {})}
+        tracks = cls(call(snd, "Get total duration"))
+
+        try:
+            pitch = call(snd, "To Pitch", 0.0, p['pitch_floor'], p['pitch_ceiling'])
+            values = pitch.selected_array['frequency'].astype(np.float64)
+            values[(values <= 0) | (values >= pitch.ceiling)] = np.nan
+            tracks.pitch = Track.from_praat(pitch, values)
+        except Exception as e:
+            tracks.errors['pitch'] = str(e)
+
+        try:
+            intensity = call(snd, "To Intensity", p['intensity_min_pitch'], 0.0, "yes")
+            tracks.intensity = Track.from_praat(intensity, intensity.values[0])
+        except Exception as e:
+            tracks.errors['intensity'] = str(e)
+
+        try:
+            source = formant_snd if formant_snd is not None else snd
+            formant = call(source, "To Formant (burg)", 0.0, p['num_formants'], p['max_formant'],
+                           p['formant_window'], p['pre_emphasis'])
+            tracks.formants = []
+            for number in (1, 2, 3):
+                values = call(formant, "To Matrix", number).values[0].astype(np.float64)
+                values[values <= 0] = np.nan
+                tracks.formants.append(Track.from_praat(formant, values))
+        except Exception as e:
+            tracks.formants = None
+            tracks.errors['formants'] = str(e)
+
+        return tracks
+
+    def grid(self, time_step=0.01):
+        """Instantes de muestreo cada time_step desde 0 (igual que el bucle while t < duración)."""
+        times = []
+        t = 0
+        while t < self.duration:
+            times.append(t)
+            t += time_step
+        return np.array(times)
+
+    def window(self, offset, duration):
+        """
+        Pistas de un tramo de estas pistas (p.ej. una palabra dentro de la grabación).
+
+        Args:
+            offset: inicio del tramo (s, en el tiempo de estas pistas)
+            duration: duración del tramo (s)
+        """
+        errors = dict(self.errors)
+
+        def cut(name, track):
+            if track is None:
+                return None
+            part = track.window(offset, duration)
+            if part is None:
+                errors.setdefault(name, 'el tramo no contiene ningún frame')
+            return part
+
+        formants = None
+        if self.formants is not None:
+            formants = [cut('formants', track) for track in self.formants]
+            if any(track is None for track in formants):
+                formants = None
+        return WordTracks(duration, cut('pitch', self.pitch), cut('intensity', self.intensity), formants, errors)
+
+    def voiced_pitch(self):
+        """Valores de F0 de los frames sonoros."""
+        values = self.pitch.values
+        return values[~np.isnan(values)]
+
+    def formant_at(self, number, time):
+        """Valor del formante `number` (1-3) en un instante (NaN si no está definido)."""
+        return float(self.formants[number - 1].linear(time))
+
+    def to_arrays(self, prefix):
+        """Arrays para guardar en un .npz (claves con el prefijo del tramo)."""
+        arrays = {f'{prefix}duration': np.array([self.duration])}
+        if self.pitch is not None:
+            arrays[f'{prefix}pitch'] = self.pitch.to_array()
+        if self.intensity is not None:
+            arrays[f'{prefix}intensity'] = self.intensity.to_array()
+        if self.formants is not None:
+            for number, track in enumerate(self.formants, start=1):
+                arrays[f'{prefix}f{number}'] = track.to_array()
+        for name, message in self.errors.items():
+            arrays[f'{prefix}error_{name}'] = np.array(message)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        def track(name):
+            key = prefix + name
+            return Track.from_array(arrays[key]) if key in arrays else None
+
+        formants = [track(f'f{n}') for n in (1, 2, 3)]
+        errors = {key[len(prefix) + len('error_'):]: str(value)
+                  for key, value in arrays.items() if key.startswith(prefix + 'error_')}
+        return cls(float(arrays[prefix + 'duration'][0]), track('pitch'), track('intensity'),
+                   formants if formants[0] is not None else None, errors)
+
+
+class TrackStore:
+    """Almacén en disco de pistas (.npz por grabación) con tamaño máximo y expulsión LRU."""
+
+    def __init__(self, directory='.cache/tracks', max_bytes=512 * 2**20):
+        """
+        Args:
+            directory: carpeta del almacén
+            max_bytes: tamaño máximo total; al superarlo se borran los archivos menos usados
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return self.directory / f'{key}.npz'
+
+    def _lock(self):
+        """Lock exclusivo del almacén (para escrituras y expulsión)."""
+        handle = open(self.directory / '.lock', 'a')
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def load(self, key):
+        """
+        Lee las pistas guardadas bajo una clave.
+
+        Returns:
+            dict nombre -> array, o {} si no hay nada guardado
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)  # marca de último uso para LRU
+            return arrays
+        except (FileNotFoundError, OSError, ValueError):
+            return {}
+
+    def save(self, key, arrays):
+        """
+        Guarda pistas bajo una clave, fusionándolas con lo que otro proceso
+        haya guardado entretanto, y aplica el límite de tamaño.
+        """
+        lock = self._lock()
+        try:
+            merged = {**self.load(key), **arrays}
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **merged)
+            os.replace(tmp, self._path(key))
+            self._evict(keep=self._path(key))
+        finally:
+            lock.close()
+
+    def _evict(self, keep=None):
+        """Borra los archivos usados hace más tiempo hasta quedar bajo max_bytes."""
+        entries = []
+        for path in self.directory.glob('*.npz'):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def size(self):
+        """Tamaño total del almacén en bytes."""
+        return sum(path.stat().st_size for path in self.directory.glob('*.npz'))
+
+
+class RecordingTracks:
+    """Pistas de los tramos de una grabación, respaldadas (opcionalmente) por un TrackStore."""
+
+    def __init__(self, audio_path, params=None, store=None, audio_hash=None):
+        """
+        Args:
+            audio_path: archivo de audio (su contenido forma parte de la clave)
+            params: parámetros de las pistas (ver DEFAULT_TRACK_PARAMS)
+            store: TrackStore; sin él las pistas solo se guardan en memoria
+            audio_hash: hash del audio ya calculado (p.ej. por el proceso que
+                reparte la grabación en tramos); por defecto se calcula al pedirlo
+        """
+        self.audio_path = Path(audio_path)
+        self.params = {name: (params or {}).get(name, default) for name, default in DEFAULT_TRACK_PARAMS.items()}
+        self.store = store
+        self._audio_hash = audio_hash
+        self._arrays = None
+        self._new = {}
+
+    @property
+    def audio_hash(self):
+        """Hash del contenido del audio (se calcula una vez)."""
+        if self._audio_hash is None:
+            self._audio_hash = file_hash(self.audio_path)
+        return self._audio_hash
+
+    @property
+    def key(self):
+        return make_key(self.audio_hash, self.params, TRACKS_VERSION)
+
+    def get(self, start_time, end_time, make_sounds):
+        """
+        Pistas de un tramo; se calculan con Praat solo si no están en el almacén.
+
+        Args:
+            start_time, end_time: límites del tramo en la grabación (s)
+            make_sounds: función sin argumentos que devuelve (snd, formant_snd)
+
+        Returns:
+            WordTracks
+        """
+        prefix = f'{start_time!r}_{end_time!r}/'
+        if self._arrays is None:
+            self._arrays = self.store.load(self.key) if self.store is not None else {}
+
+        for arrays in (self._arrays, self._new):
+            if prefix + 'duration' in arrays:
+                return WordTracks.from_arrays(arrays, prefix)
+
+        snd, formant_snd = make_sounds()
+        tracks = WordTracks.compute(snd, formant_snd, self.params)
+        self._new.update(tracks.to_arrays(prefix))
+        return tracks
+
+    def __getstate__(self):
+        """Estado para pickle: las pistas cargadas no viajan (se releen del almacén)."""
+        state = self.__dict__.copy()
+        state['_arrays'] = None
+        state['_new'] = {}
+        return state
+
+    def take_new(self):
+        """
+        Pistas calculadas desde el último save(), que dejan de estar pendientes
+        (p.ej. para devolverlas desde un proceso del pool en lugar de guardarlas).
+        """
+        new, self._new = self._new, {}
+        return new
+
+    def add(self, arrays):
+        """Añade pistas calculadas en otro proceso (se guardan con el próximo save())."""
+        self._new.update(arrays)
+
+    def save(self):
+        """Guarda en el almacén las pistas calculadas desde la última vez."""
+        if self.store is not None and self._new:
+            self.store.save(self.key, self._new)
+            self._new = {}
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Control de calidad previo (antes de Whisper y Praat)
+====================================================
+Las grabaciones defectuosas (saturadas, casi en silencio, con ruido o
+remuestreadas desde una frecuencia baja) hoy solo se detectan al final, tras
+la transcripción con Whisper large y todo el análisis de Praat. Este filtro
+mide sobre la señal decodificada, con operaciones vectorizadas:
+
+- clipping_ratio: fracción de muestras saturadas (|x| >= CLIP_LEVEL)
+- peak_dbfs, dc_offset: nivel de pico y componente continua
+- active_ratio: fracción de frames con voz (umbral de WordSegmenter)
+- snr_db: SNR estimada (percentil 95 - percentil 10 de la energía por frame)
+- bandwidth: frecuencia más alta con energía a menos de 60 dB del máximo del
+  espectro medio (un audio subido desde 8 kHz no pasa de 4 kHz aunque el
+  archivo diga 44.1 kHz)
+
+Cada archivo se aprueba, se marca con aviso o se rechaza según QUALITY_RULES;
+los rechazados no se procesan (y se mueven a una carpeta de cuarentena si se
+indica) y el informe queda en un CSV. Un archivo movido a la cuarentena sigue
+en corpus.csv: en las ejecuciones siguientes se rechaza sin leerlo ("en
+cuarentena") hasta que se quite del manifiesto o se devuelva a su carpeta.
+"""
+
+import operator
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import signal
+
+from audio_buffer import open_recording
+from segmentation_sweep import rms_db_envelope
+
+
+# Muestras con |x| por encima de este nivel se consideran saturadas
+CLIP_LEVEL = 0.999
+
+# Frames activos: mismo umbral relativo al máximo que WordSegmenter
+ACTIVE_THRESH_DB = -40
+
+# Ancho de banda efectivo: energía a menos de BANDWIDTH_DB del máximo del espectro
+BANDWIDTH_DB = -60
+
+# Reglas (métrica, condición, umbral, acción); acción 'reject' o 'warn'
+QUALITY_RULES = [
+    ('sr', '<', 11025, 'reject'),             # 2 × techo de formantes (5500 Hz)
+    ('bandwidth', '<', 5500, 'reject'),       # audio remuestreado desde una frecuencia baja
+    ('duration', '<', 1.0, 'reject'),
+    ('peak_dbfs', '<', -40, 'reject'),        # casi en silencio
+    ('clipping_ratio', '>', 0.01, 'reject'),
+    ('clipping_ratio', '>', 0.001, 'warn'),
+    ('active_ratio', '<', 0.2, 'reject'),
+    ('snr_db', '<', 10, 'reject'),
+    ('snr_db', '<', 20, 'warn'),
+    ('dc_offset', '>', 0.05, 'warn'),
+]
+
+_OPERATORS = {'<': operator.lt, '>': operator.gt}
+
+
+def measure_quality(buffer):
+    """
+    Métricas de calidad de una grabación.
+
+    Args:
+        buffer: RecordingBuffer (o MappedWavReader) de la grabación
+
+    Returns:
+        dict con sr, duration, clipping_ratio, peak_dbfs, dc_offset,
+        active_ratio, snr_db y bandwidth
+    """
+    audio = buffer.audio
+    sr = buffer.sr
+    abs_audio = np.abs(audio)
+    peak = float(abs_audio.max()) if len(audio) else 0.0
+
+    metrics = {
+        'sr': sr,
+        'duration': buffer.duration,
+        'clipping_ratio': float(np.mean(abs_audio >= CLIP_LEVEL)) if len(audio) else 0.0,
+        'peak_dbfs': 20 * np.log10(peak) if peak > 0 else -np.inf,
+        'dc_offset': float(abs(audio.mean())) if len(audio) else 0.0,
+        'active_ratio': 0.0,
+        'snr_db': 0.0,
+        'bandwidth': 0.0,
+    }
+    if peak == 0:
+        return metrics
+
+    rms_db, _ = rms_db_envelope(buffer, sr)
+    metrics['active_ratio'] = float(np.mean(rms_db > ACTIVE_THRESH_DB))
+    p10, p95 = np.percentile(rms_db, [10, 95])
+    metrics['snr_db'] = float(p95 - p10)
+
+    freqs, psd = signal.welch(audio, sr, nperseg=min(2048, len(audio)))
+    psd_db = 10 * np.log10(psd + 1e-20)
+    above = np.nonzero(psd_db > psd_db.max() + BANDWIDTH_DB)[0]
+    metrics['bandwidth'] = float(freqs[above[-1]])
+
+    return metrics
+
+
+def apply_rules(metrics, rules=QUALITY_RULES):
+    """
+    Aplica las reglas a las métricas de una grabación.
+
+    Returns:
+        (estado, motivos): estado 'ok', 'warn' o 'reject'; motivos, lista de
+        reglas incumplidas como texto
+    """
+    status = 'ok'
+    reasons = []
+    for metric, condition, threshold, action in rules:
+        if _OPERATORS[condition](metrics[metric], threshold):
+            reasons.append(f"{metric} {condition} {threshold}")
+            if action == 'reject' or status == 'ok':
+                status = action
+    return status, reasons
+
+
+class QualityGate:
+    """Filtra las grabaciones antes de transcribir y analizar."""
+
+    def __init__(self, rules=None, quarantine_dir=None):
+        """
+        Args:
+            rules: reglas (métrica, condición, umbral, acción); por defecto QUALITY_RULES
+            quarantine_dir: carpeta a la que mover los archivos rechazados
+                (None = solo se excluyen del análisis)
+        """
+        self.rules = QUALITY_RULES if rules is None else rules
+        self.quarantine_dir = Path(quarantine_dir) if quarantine_dir else None
+        self.report = []
+
+    def check(self, audio_path):
+        """Mide y clasifica una grabación; devuelve su fila del informe."""
+        quarantined = self._quarantine_path(audio_path)
+        if quarantined is not None and not Path(audio_path).exists() and quarantined.exists():
+            row = {'file': Path(audio_path).name, 'status': 'reject',
+                   'reasons': f"en cuarentena en {quarantined.parent}; quitarlo de corpus.csv"}
+            self.report.append(row)
+            return row
+
+        try:
+            metrics = measure_quality(open_recording(audio_path, mmap='auto'))
+            status, reasons = apply_rules(metrics, self.rules)
+        except Exception as e:
+            metrics, status, reasons = {}, 'reject', [f"no se pudo leer: {e}"]
+
+        row = {'file': Path(audio_path).name, 'status': status, 'reasons': '; '.join(reasons), **metrics}
+        self.report.append(row)
+        return row
+
+    def screen(self, audio_files):
+        """
+        Filtra una lista de archivos.
+
+        Args:
+            audio_files: rutas de las grabaciones
+
+        Returns:
+            lista de archivos aceptados (estado 'ok' o 'warn'), en el mismo orden
+        """
+        print("\n🔎 Control de calidad previo")
+        accepted = []
+        for audio_file in audio_files:
+            row = self.check(audio_file)
+            if row['status'] == 'reject':
+                print(f"  ❌ {row['file']}: rechazado ({row['reasons']})")
+                self._quarantine(audio_file)
+                continue
+            if row['status'] == 'warn':
+                print(f"  ⚠ {row['file']}: {row['reasons']}")
+            accepted.append(audio_file)
+
+        print(f"  ✓ Aceptados: {len(accepted)}/{len(audio_files)}")
+        return accepted
+
+    def _quarantine_path(self, audio_file):
+        """Ruta del archivo en la carpeta de cuarentena (None si no hay cuarentena)."""
+        if self.quarantine_dir is None:
+            return None
+        return self.quarantine_dir / Path(audio_file).name
+
+    def _quarantine(self, audio_file):
+        """Mueve un archivo rechazado a la carpeta de cuarentena (si hay y el archivo existe)."""
+        target = self._quarantine_path(audio_file)
+        if target is None or not Path(audio_file).exists():
+            return
+        self.quarantine_dir.mkdir(parents=True, exist_ok=True)
+        # shutil.move: la cuarentena puede estar en otro sistema de archivos
+        shutil.move(str(audio_file), str(target))
+
+    def write_report(self, path='quality_report.csv'):
+        """Guarda el informe de calidad como CSV."""
+        pd.DataFrame(self.report).to_csv(path, index=False)
+        print(f"  ✓ {path}")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Caché persistente de resultados por palabra
+===========================================
+Cuando se corrigen unas pocas fronteras de palabra en *_transcription.json,
+no hace falta volver a analizar toda la grabación: cada palabra se guarda
+con una clave que depende de
+
+    (hash del audio, inicio, fin, texto de la palabra, parámetros, versión)
+
+y al reanalizar solo se recalculan las palabras cuya clave ha cambiado.
+
+El almacén es un archivo SQLite (biblioteca estándar), seguro frente a
+varios procesos que leen y escriben a la vez.
+"""
+
+import hashlib
+import json
+import pickle
+import sqlite3
+import time
+from pathlib import Path
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 del contenido de un archivo (leído por bloques)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(*parts):
+    """Clave estable a partir de valores serializables en JSON."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class WordResultCache:
+    """Resultados de analyze_word() persistidos por clave de contenido."""
+
+    def __init__(self, path='.cache/word_results.sqlite'):
+        """
+        Args:
+            path: archivo SQLite donde se guardan los resultados
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS words (
+                                key TEXT PRIMARY KEY,
+                                value BLOB NOT NULL,
+                                created REAL NOT NULL)""")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def word_key(audio_hash, word_info, params, engine_version):
+        """
+        Clave de una palabra.
+
+        Args:
+            audio_hash: hash del contenido del audio
+            word_info: dict con 'word', 'start', 'end' (de la transcripción)
+            params: parámetros del análisis
+            engine_version: versión de la lógica de análisis
+        """
+        return make_key(audio_hash, round(word_info['start'], 6), round(word_info['end'], 6),
+                        word_info['word'], params, engine_version)
+
+    def get(self, key):
+        """
+        Busca un resultado.
+
+        Returns:
+            (encontrado, valor); el valor puede ser None si la palabra no se pudo analizar
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM words WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, pickle.loads(row[0])
+
+    def put(self, key, value):
+        """Guarda (o reemplaza) un resultado."""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO words (key, value, created) VALUES (?, ?, ?)",
+                         (key, blob, time.time()))
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM words").fetchone()[0]
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Muestreo estratificado con presupuesto (corpus grandes)
+=======================================================
+Para análisis exploratorios no hace falta cada vocal de cada grabación.
+Antes de cualquier trabajo acústico, el muestreador elige qué palabras
+analizar a partir de las vocales esperadas de la transcripción
+(_extract_vowels_from_text), con uno de dos objetivos por hablante:
+
+- target_per_class: N vocales esperadas por clase (/a/, /e/, /i/, /o/, /u/)
+- cpu_budget: segundos de CPU, con un modelo de coste lineal en la duración
+  de la palabra (calibrado con el análisis por palabra de este proyecto)
+
+Las palabras se toman en orden aleatorio (semilla fija), alternando entre
+clases y empezando siempre por la clase con menos vocales seleccionadas, de
+modo que las clases raras no se quedan sin muestras. Se reportan las
+fracciones de muestreo por clase para poder ponderar los estadísticos
+(peso = 1 / fracción). Con cpu_budget, una palabra que ya no cabe se salta
+y se sigue con las demás hasta que ninguna clase puede añadir una palabra
+dentro del presupuesto restante.
+
+Con assign_speakers() (hablantes del manifiesto del corpus) el objetivo es
+del hablante, no de cada grabación: el plan se hace con las palabras de todas
+sus grabaciones juntas y cada grabación analiza su parte.
+"""
+
+import json
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from corpus import transcription_path
+
+
+VOWEL_CLASSES = ['a', 'e', 'i', 'o', 'u']
+
+# Coste de analyze_word(): segundos de CPU por segundo de audio y por palabra
+COST_PER_SECOND = 0.03
+COST_PER_WORD = 0.005
+
+
+class StratifiedWordSampler:
+    """Selecciona palabras por estratos de vocal esperada hasta un objetivo o presupuesto."""
+
+    def __init__(self, target_per_class=None, cpu_budget=None, seed=0,
+                 cost_per_second=COST_PER_SECOND, cost_per_word=COST_PER_WORD):
+        """
+        Args:
+            target_per_class: vocales esperadas por clase y hablante (None = sin límite)
+            cpu_budget: segundos de CPU por hablante (None = sin límite)
+            seed: semilla del orden aleatorio (muestreo reproducible)
+            cost_per_second, cost_per_word: modelo de coste estimado por palabra
+        """
+        if target_per_class is None and cpu_budget is None:
+            raise ValueError("Indica target_per_class, cpu_budget o ambos")
+        self.target_per_class = target_per_class
+        self.cpu_budget = cpu_budget
+        self.seed = seed
+        self.cost_per_second = cost_per_second
+        self.cost_per_word = cost_per_word
+        # Ruta absoluta -> (hablante, grabaciones del hablante), ver assign_speakers
+        self.speakers = {}
+
+    def assign_speakers(self, audio_files, manifest):
+        """
+        Agrupa las grabaciones por hablante (columna speaker del manifiesto).
+
+        Las grabaciones sin hablante en el manifiesto se muestrean solas.
+
+        Args:
+            audio_files: grabaciones que se van a analizar
+            manifest: CorpusManifest
+        """
+        groups = {}
+        for path, recording in zip(audio_files, manifest.lookup(audio_files)):
+            if recording is not None and recording.speaker is not None:
+                groups.setdefault(recording.speaker, []).append(str(Path(path).resolve()))
+        self.speakers = {path: (speaker, paths) for speaker, paths in groups.items() for path in paths}
+
+    def speaker_recordings(self, audio_path):
+        """Grabaciones (rutas absolutas) que comparten objetivo con audio_path."""
+        path = str(Path(audio_path).resolve())
+        return self.speakers.get(path, (None, [path]))[1]
+
+    def word_cost(self, word):
+        """Coste estimado (s de CPU) de analizar una palabra."""
+        return self.cost_per_word + self.cost_per_second * (word['end'] - word['start'])
+
+    def plan(self, words, extract_vowels, speaker=''):
+        """
+        Elige las palabras a analizar.
+
+        Args:
+            words: palabras de la transcripción (dicts con 'word', 'start', 'end')
+            extract_vowels: función texto -> lista de vocales esperadas
+            speaker: nombre del hablante (se mezcla con la semilla)
+
+        Returns:
+            dict con 'selected' (índices en words, en orden temporal), 'expected'
+            y 'selected_vowels' (vocales por clase), 'fractions' (por clase),
+            'word_fraction' y 'estimated_cost'
+        """
+        vowels = [extract_vowels(w['word']) for w in words]
+        expected = {c: sum(v.count(c) for v in vowels) for c in VOWEL_CLASSES}
+
+        rng = np.random.default_rng([self.seed, sum(map(ord, speaker))])
+        order = rng.permutation(len(words))
+        queues = {c: deque(i for i in order if c in vowels[i]) for c in VOWEL_CLASSES}
+
+        selected = set()
+        counts = {c: 0 for c in VOWEL_CLASSES}
+        cost = 0.0
+
+        while True:
+            progress = False
+            # La clase más atrasada elige primero
+            for c in sorted(VOWEL_CLASSES, key=lambda c: counts[c]):
+                if self.target_per_class is not None and counts[c] >= self.target_per_class:
+                    continue
+                queue = queues[c]
+                # El coste acumulado solo crece: una palabra que no cabe ya no cabrá
+                while queue and (queue[0] in selected or self.cpu_budget is not None
+                                 and cost + self.word_cost(words[queue[0]]) > self.cpu_budget):
+                    queue.popleft()
+                if not queue:
+                    continue
+
+                i = queue.popleft()
+                selected.add(i)
+                cost += self.word_cost(words[i])
+                for v in vowels[i]:
+                    counts[v] += 1
+                progress = True
+            if not progress:
+                break
+
+        return {
+            'selected': sorted(selected, key=lambda i: words[i]['start']),
+            'expected': expected,
+            'selected_vowels': counts,
+            'fractions': {c: counts[c] / expected[c] if expected[c] else np.nan for c in VOWEL_CLASSES},
+            'word_fraction': len(selected) / len(words) if words else np.nan,
+            'estimated_cost': cost,
+            'speaker': speaker,
+        }
+
+    def plan_recording(self, audio_path, words, extract_vowels):
+        """
+        Elige las palabras de una grabación con el objetivo de su hablante.
+
+        Si el hablante tiene varias grabaciones (assign_speakers), el plan se
+        hace con las palabras de todas (sus *_transcription.json) y de esta
+        grabación se devuelven sus palabras elegidas y su parte del coste; el
+        resto del plan (fracciones por clase) es el del hablante.
+
+        Args:
+            audio_path: grabación
+            words: palabras de su transcripción, en orden temporal
+            extract_vowels: función texto -> lista de vocales esperadas
+
+        Returns:
+            dict como plan(), con 'selected' relativo a words
+        """
+        path = str(Path(audio_path).resolve())
+        speaker, recordings = self.speakers.get(path, (Path(audio_path).stem, [path]))
+
+        pooled, owner = [], []
+        for recording in recordings:
+            if recording == path:
+                recording_words = words
+            else:
+                with open(transcription_path(recording), encoding='utf-8') as f:
+                    recording_words = sorted(json.load(f)['words'], key=lambda w: w['start'])
+            pooled.extend(recording_words)
+            owner.extend([recording == path] * len(recording_words))
+
+        plan = self.plan(pooled, extract_vowels, speaker)
+        offset = owner.index(True) if words else 0
+        own = [i for i in plan['selected'] if owner[i]]
+        plan['selected'] = sorted((i - offset for i in own), key=lambda i: words[i]['start'])
+        plan['estimated_cost'] = sum(self.word_cost(pooled[i]) for i in own)
+        return plan
+
+
+def sampling_report(analyzers):
+    """
+    Tabla de fracciones de muestreo por hablante y clase de vocal.
+
+    Args:
+        analyzers: WordBasedVoiceAnalyzer analizados con muestreo
+
+    Returns:
+        lista de dicts (speaker, vowel_class, expected, selected, fraction, weight),
+        una vez por hablante aunque tenga varias grabaciones
+    """
+    rows = []
+    seen = set()
+    for analyzer in analyzers:
+        plan = analyzer.sampling_plan
+        if plan is None or plan['speaker'] in seen:
+            continue
+        seen.add(plan['speaker'])
+        for c in VOWEL_CLASSES:
+            fraction = plan['fractions'][c]
+            rows.append({
+                'speaker': plan['speaker'],
+                'vowel_class': f'/{c}/',
+                'expected': plan['expected'][c],
+                'selected': plan['selected_vowels'][c],
+                'fraction': fraction,
+                'weight': 1 / fraction if fraction else np.nan,
+            })
+    return rows
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Barrido vectorizado de parámetros de segmentación
+=================================================
+Evalúa una rejilla completa de parámetros de WordSegmenter
+
+    silence_thresh_db × min_silence_len × min_word_len
+
+calculando la envolvente RMS en dB una sola vez por archivo. Cada umbral es
+una comparación sobre la envolvente; los intervalos de habla salen de un
+np.diff y cada duración mínima es una máscara sobre esos intervalos, así que
+no hay ningún recorrido de frames en Python.
+
+Los segmentos son idénticos a los de WordSegmenter.segment() para cada
+configuración. Nota: WordSegmenter no usa min_silence_len (no fusiona pausas
+cortas), así que ese eje no cambia los segmentos; se conserva en la rejilla
+para que los resultados se puedan cruzar con las configuraciones existentes.
+
+Por configuración se reporta número de segmentos, duraciones y, si hay
+transcripción de Whisper, la concordancia con sus fronteras de palabra.
+"""
+
+import json
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import librosa
+import pandas as pd
+
+from audio_buffer import RecordingBuffer, open_recording
+from corpus import CorpusManifest
+
+
+# Rejilla por defecto
+DEFAULT_GRID = {
+    'silence_thresh_db': [-50, -45, -40, -35, -30],
+    'min_silence_len': [0.1, 0.15, 0.2, 0.3],
+    'min_word_len': [0.05, 0.1, 0.15, 0.2, 0.3],
+}
+
+
+def rms_db_envelope(audio, sr, frame_ms=25, hop_ms=10):
+    """
+    Envolvente RMS en dB (referida al máximo) y tiempos de frame, como WordSegmenter.
+
+    Args:
+        audio: señal (array o RecordingBuffer/MappedWavReader)
+        sr: sample rate
+
+    Returns:
+        (rms_db, times)
+    """
+    frame_length = int(frame_ms / 1000 * sr)
+    hop_length = int(hop_ms / 1000 * sr)
+
+    if isinstance(audio, RecordingBuffer):
+        rms = audio.rms_envelope(frame_length, hop_length)
+    else:
+        rms = librosa.feature.rms(y=audio, frame_length=frame_length, hop_length=hop_length)[0]
+
+    rms_db = librosa.amplitude_to_db(rms, ref=np.max)
+    times = librosa.frames_to_time(np.arange(len(rms_db)), sr=sr, hop_length=hop_length)
+    return rms_db, times
+
+
+def _speech_runs(rms_db, thresholds):
+    """
+    Intervalos de habla (frames por encima del umbral) para varios umbrales a la vez.
+
+    Returns:
+        (fila del umbral, frame de inicio, frame de fin, termina_en_habla) por intervalo
+    """
+    is_speech = rms_db[None, :] > np.asarray(thresholds, dtype=float)[:, None]
+    padded = np.pad(is_speech, ((0, 0), (1, 1))).astype(np.int8)
+    change = np.diff(padded, axis=1)
+
+    rows, starts = np.nonzero(change == 1)
+    end_rows, ends = np.nonzero(change == -1)
+    # Ambos vienen ordenados por (fila, frame), así que se emparejan en orden
+    assert np.array_equal(rows, end_rows)
+    at_end = ends == rms_db.shape[0]
+    return rows, starts, ends, at_end
+
+
+def _merge_intervals(intervals):
+    """Une intervalos solapados; devuelve arrays (inicios, finales) ordenados."""
+    if not len(intervals):
+        return np.empty(0), np.empty(0)
+    intervals = np.asarray(sorted(intervals), dtype=float)
+    starts, ends = [intervals[0, 0]], [intervals[0, 1]]
+    for start, end in intervals[1:]:
+        if start <= ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return np.array(starts), np.array(ends)
+
+
+class SegmentationSweep:
+    """Barrido de parámetros de segmentación sobre una grabación."""
+
+    def __init__(self, audio, sr, reference_words=None, tolerance=0.05):
+        """
+        Args:
+            audio: señal (array o RecordingBuffer/MappedWavReader)
+            sr: sample rate
+            reference_words: palabras de Whisper (dicts con 'start' y 'end') para la concordancia
+            tolerance: tolerancia (s) para considerar que dos fronteras coinciden
+        """
+        self.sr = sr
+        self.rms_db, self.times = rms_db_envelope(audio, sr)
+        self.tolerance = tolerance
+
+        self.reference_words = reference_words or []
+        if self.reference_words:
+            bounds = [b for w in self.reference_words for b in (w['start'], w['end'])]
+            self.reference_bounds = np.unique(np.asarray(bounds, dtype=float))
+            # Tiempo cubierto por palabras (unión), acumulado en función de t
+            starts, ends = _merge_intervals([(w['start'], w['end']) for w in self.reference_words])
+            knots = np.ravel(np.column_stack([starts, ends]))
+            covered = np.ravel(np.column_stack([np.zeros_like(starts), ends - starts]))
+            self._cover_t = knots
+            self._cover_c = np.cumsum(covered)
+            self.reference_duration = float(np.sum(ends - starts))
+
+    @classmethod
+    def from_file(cls, audio_path, transcription_path=None, mmap=False, **kwargs):
+        """
+        Crea el barrido de un archivo (con su *_transcription.json si existe).
+
+        Args:
+            audio_path: archivo de audio
+            transcription_path: JSON de Whisper (por defecto <audio>_transcription.json)
+        """
+        audio_path = Path(audio_path)
+        buffer = open_recording(audio_path, mmap=mmap)
+        if transcription_path is None:
+            transcription_path = audio_path.with_name(audio_path.stem + '_transcription.json')
+        words = None
+        if Path(transcription_path).exists():
+            with open(transcription_path, encoding='utf-8') as f:
+                words = json.load(f)['words']
+        return cls(buffer, buffer.sr, reference_words=words, **kwargs)
+
+    def _intervals(self, thresholds):
+        """Intervalos de habla por umbral (tiempos y duraciones como WordSegmenter)."""
+        rows, starts, ends, at_end = _speech_runs(self.rms_db, thresholds)
+        start_times = self.times[starts]
+        # Un intervalo que llega al final de la señal termina en el último frame
+        end_times = self.times[np.where(at_end, len(self.times) - 1, ends)]
+        return rows, start_times, end_times, end_times - start_times, at_end
+
+    def segments(self, silence_thresh_db=-40, min_silence_len=0.3, min_word_len=0.2):
+        """
+        Segmentos de una configuración (mismo formato que WordSegmenter.segment()).
+
+        min_silence_len se acepta por compatibilidad; WordSegmenter no lo usa.
+        """
+        _, start_times, end_times, durations, at_end = self._intervals([silence_thresh_db])
+        keep = (durations >= min_word_len) | at_end
+        return [{
+            'index': i,
+            'start_time': start,
+            'end_time': end,
+            'duration': end - start,
+            'start_sample': int(start * self.sr),
+            'end_sample': int(end * self.sr),
+        } for i, (start, end) in enumerate(zip(start_times[keep], end_times[keep]))]
+
+    def _covered(self, t):
+        """Tiempo cubierto por palabras de referencia en [0, t]."""
+        return np.interp(t, self._cover_t, self._cover_c, left=0.0)
+
+    def run(self, silence_thresh_db=None, min_silence_len=None, min_word_len=None):
+        """
+        Evalúa la rejilla completa.
+
+        Args:
+            silence_thresh_db, min_silence_len, min_word_len: listas de valores
+                (por defecto, DEFAULT_GRID)
+
+        Returns:
+            DataFrame con una fila por configuración
+        """
+        def axis(values, name):
+            return np.asarray(DEFAULT_GRID[name] if values is None else values, dtype=float)
+
+        thresholds = axis(silence_thresh_db, 'silence_thresh_db')
+        silences = axis(min_silence_len, 'min_silence_len')
+        word_lens = axis(min_word_len, 'min_word_len')
+
+        rows, start_times, end_times, durations, at_end = self._intervals(thresholds)
+
+        # keep[k, j]: el intervalo k sobrevive con la duración mínima j
+        keep = (durations[:, None] >= word_lens[None, :]) | at_end[:, None]
+        n_t, n_w = len(thresholds), len(word_lens)
+
+        def per_config(values):
+            """Suma por (umbral, duración mínima) de un valor por intervalo."""
+            out = np.zeros((n_t, n_w))
+            np.add.at(out, rows, keep * values[:, None])
+            return out
+
+        counts = per_config(np.ones_like(durations))
+        total = per_config(durations)
+        total_sq = per_config(durations ** 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(counts > 0, total / counts, 0.0)
+            std = np.sqrt(np.maximum(np.where(counts > 0, total_sq / counts, 0.0) - mean ** 2, 0.0))
+
+        # Duraciones mínima y máxima por configuración
+        shortest = np.full((n_t, n_w), np.inf)
+        longest = np.full((n_t, n_w), -np.inf)
+        for j in range(n_w):
+            np.minimum.at(shortest[:, j], rows[keep[:, j]], durations[keep[:, j]])
+            np.maximum.at(longest[:, j], rows[keep[:, j]], durations[keep[:, j]])
+
+        metrics = {
+            'num_segments': counts.astype(int),
+            'mean_duration': mean,
+            'std_duration': std,
+            'min_duration': np.where(counts > 0, shortest, np.nan),
+            'max_duration': np.where(counts > 0, longest, np.nan),
+            'speech_time': total,
+        }
+        if self.reference_words:
+            metrics.update(self._agreement(rows, start_times, end_times, keep, n_t, n_w, total))
+            metrics['segments_per_word'] = counts / len(self.reference_words)
+
+        # Expandir a la rejilla completa (min_silence_len no cambia los segmentos)
+        records = []
+        for (i, thr), silence, (j, word_len) in product(enumerate(thresholds), silences, enumerate(word_lens)):
+            record = {'silence_thresh_db': thr, 'min_silence_len': silence, 'min_word_len': word_len}
+            record.update({name: values[i, j].item() for name, values in metrics.items()})
+            records.append(record)
+        return pd.DataFrame(records)
+
+    def _agreement(self, rows, start_times, end_times, keep, n_t, n_w, speech_time):
+        """Concordancia de fronteras y cobertura con las palabras de Whisper, por configuración."""
+        ref = self.reference_bounds
+        tol = self.tolerance
+
+        # Fronteras de cada configuración, desplazadas para ordenarlas todas juntas
+        span = self.times[-1] + 10 * tol + 1.0
+        seg_cfg, seg_bounds = [], []
+        for j in range(n_w):
+            cfg = rows[keep[:, j]] * n_w + j
+            for times in (start_times[keep[:, j]], end_times[keep[:, j]]):
+                seg_cfg.append(cfg)
+                seg_bounds.append(times)
+        seg_cfg = np.concatenate(seg_cfg)
+        seg_bounds = np.concatenate(seg_bounds)
+
+        def nearest_distance(sorted_values, queries):
+            idx = np.searchsorted(sorted_values, queries)
+            left = sorted_values[np.clip(idx - 1, 0, len(sorted_values) - 1)]
+            right = sorted_values[np.clip(idx, 0, len(sorted_values) - 1)]
+            return np.minimum(np.abs(queries - left), np.abs(queries - right))
+
+        # Precisión: fronteras de segmento cerca de alguna frontera de palabra
+        seg_hit = nearest_distance(ref, seg_bounds) <= tol
+        n_cfg = n_t * n_w
+        n_bounds = np.bincount(seg_cfg, minlength=n_cfg)
+        precision = np.bincount(seg_cfg, weights=seg_hit, minlength=n_cfg) / np.maximum(n_bounds, 1)
+
+        # Recall: fronteras de palabra cerca de alguna frontera de segmento de la misma configuración
+        keyed = np.sort(seg_cfg * span + seg_bounds)
+        queries = (np.arange(n_cfg)[:, None] * span + ref[None, :]).ravel()
+        ref_hit = (nearest_distance(keyed, queries) <= tol).reshape(n_cfg, len(ref)) if len(keyed) else \
+            np.zeros((n_cfg, len(ref)), dtype=bool)
+        recall = ref_hit.mean(axis=1)
+        with np.errstate(invalid='ignore'):
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+        # Cobertura temporal de las palabras por los segmentos
+        overlap = np.zeros((n_t, n_w))
+        seg_overlap = self._covered(end_times) - self._covered(start_times)
+        np.add.at(overlap, rows, keep * seg_overlap[:, None])
+
+        return {
+            'boundary_precision': precision.reshape(n_t, n_w),
+            'boundary_recall': recall.reshape(n_t, n_w),
+            'boundary_f1': f1.reshape(n_t, n_w),
+            'word_coverage': overlap / self.reference_duration,
+            'speech_precision': np.where(speech_time > 0, overlap / np.maximum(speech_time, 1e-12), np.nan),
+        }
+
+
+def sweep_files(audio_files, grid=None, mmap=False, tolerance=0.05):
+    """
+    Barrido sobre varios archivos.
+
+    Args:
+        audio_files: lista de archivos de audio
+        grid: dict con listas para silence_thresh_db, min_silence_len y min_word_len
+        mmap: mapear los WAV en memoria
+
+    Returns:
+        DataFrame con una fila por (archivo, configuración)
+    """
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    frames = []
+    for audio_file in audio_files:
+        sweep = SegmentationSweep.from_file(audio_file, mmap=mmap, tolerance=tolerance)
+        results = sweep.run(**grid)
+        results.insert(0, 'file', Path(audio_file).stem)
+        frames.append(results)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    """Barrido sobre las grabaciones del manifiesto y resumen de las mejores configuraciones."""
+    print("=" * 70)
+    print("BARRIDO DE PARÁMETROS DE SEGMENTACIÓN")
+    print("=" * 70)
+
+    manifest = CorpusManifest()
+    audio_files = [recording.path for recording in manifest.recordings()]
+    if not audio_files:
+        print(f"\n❌ No hay grabaciones en {manifest.path}")
+        return
+
+    n_configs = int(np.prod([len(v) for v in DEFAULT_GRID.values()]))
+    print(f"\n📁 Archivos: {len(audio_files)}")
+    print(f"   Configuraciones: {n_configs}")
+
+    results = sweep_files(audio_files)
+    results.to_csv('segmentation_sweep.csv', index=False)
+    print("\n✓ segmentation_sweep.csv")
+
+    # Resumen por configuración (promedio entre archivos)
+    params = list(DEFAULT_GRID)
+    summary = results.groupby(params).mean(numeric_only=True).reset_index()
+    if 'boundary_f1' in summary:
+        print("\nMejores configuraciones (F1 de fronteras respecto a Whisper):")
+        best = summary.sort_values('boundary_f1', ascending=False).drop_duplicates(
+            ['silence_thresh_db', 'min_word_len']).head(5)
+        for _, row in best.iterrows():
+            print(f"  {row['silence_thresh_db']:.0f} dB, palabra ≥ {row['min_word_len']*1000:.0f} ms → "
+                  f"{row['num_segments']:.1f} segmentos, F1 = {row['boundary_f1']:.2f}, "
+                  f"cobertura = {row['word_coverage']:.0%}")
+    print("\n⚠ min_silence_len no influye en WordSegmenter.segment(); las filas que solo difieren en ese valor son iguales.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,659 @@
+#!/usr/bin/env python3
+"""
+Ejecución por etapas con reejecución incremental
+================================================
+main() de analyze_with_transcription.py ejecuta siempre todo, de Whisper a
+los PNG: para retocar compare_genders() hay que volver a pasar por Whisper y
+Praat (o esperar a que las cachés respondan). Aquí el análisis es un grafo de
+etapas con entradas y salidas declaradas:
+
+    decode ─ transcribe ─ segment ─ analyze ─┬─ classify ─ stats ─ plot
+                                             └─ export
+
+- decode: decodifica y mide cada grabación (control de calidad y huella
+  para duplicados); las rechazadas y las copias no siguen
+- transcribe: *_transcription.json con Whisper (uno existente se adopta
+  sin volver a transcribir: conserva las correcciones manuales)
+- segment: palabras a analizar (todas, o la muestra de SAMPLING)
+- analyze: análisis de Praat por palabra (analizador serializado)
+- classify: clasificación de vocales de todo el corpus
+- stats: comparación de géneros (gender_*_stats.json)
+- plot: visualizaciones (PNG)
+- export: audios de palabras (word_audios/)
+
+Las grabaciones, y el género con el que stats y plot las agrupan, salen del
+manifiesto del corpus (corpus.py); cambiar un género en el CSV solo vuelve a
+ejecutar stats y plot. Los filtros (--files, --speaker, --gender, --session)
+eligen las grabaciones de las etapas por archivo; classify, stats y plot son
+siempre del corpus completo (se omiten si alguna grabación aún no tiene
+análisis, en lugar de sobrescribirse con un subconjunto).
+
+Como make, pero por contenido: cada objetivo (un archivo, o el corpus) tiene
+una clave con el hash del contenido de sus entradas y otra con sus
+parámetros (y, en las etapas baratas, el código de sus funciones). Solo se
+ejecuta si alguna clave cambió desde la última vez o falta alguna salida.
+Modificar compare_genders() vuelve a ejecutar stats y plot, nunca Whisper
+ni Praat. El registro de ejecuciones y los hashes de archivos (por tamaño y
+fecha de modificación, para no releer el audio) están en SQLite.
+
+Uso:
+    python stages.py                          # todo lo desactualizado
+    python stages.py -n                       # qué se ejecutaría (dry run)
+    python stages.py stats plot               # esas etapas (y las previas si hace falta)
+    python stages.py stats --only --force     # solo stats, aunque esté al día
+    python stages.py analyze --files 'audio_ninia*' --workers 4
+    python stages.py --session sesion_2          # filtros del manifiesto (corpus.py)
+"""
+
+import argparse
+import fnmatch
+import inspect
+import json
+import os
+import pickle
+import sqlite3
+import time
+from pathlib import Path
+
+import pandas as pd
+import soundfile as sf
+
+import analyze_with_transcription as W
+from corpus import MANIFEST_PATH, CorpusManifest, transcription_path
+from execution_plan import ExecutionPlan, analysis_task_memory
+from fingerprint import FingerprintIndex
+from parallel import run_parallel
+from pitch_range import speaker_pitch_ranges
+from praat_tracks import TrackStore
+from quality_gate import QUALITY_RULES, QualityGate
+from result_cache import WordResultCache, file_hash, make_key
+from sampling import StratifiedWordSampler, sampling_report
+
+
+# Artefactos intermedios de las etapas
+STAGE_DIR = Path('.cache/stages')
+
+PLOT_FILES = ('gender_comparison_statistical.png', 'vowel_spaces_overlap.png',
+              'gender_by_vowel_comparison.png', 'f0_contours_by_gender.png')
+
+
+def source_key(*functions):
+    """Hash del código de unas funciones (cambiarlo invalida la etapa)."""
+    return make_key(*[inspect.getsource(fn) for fn in functions])
+
+
+def load_artifact(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_artifact(obj, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+class StageLog:
+    """Registro persistente de ejecuciones de etapas y de hashes de archivos."""
+
+    def __init__(self, path='.cache/stages.sqlite'):
+        """
+        Args:
+            path: archivo SQLite del registro
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS runs (
+                                stage TEXT NOT NULL,
+                                target TEXT NOT NULL,
+                                inputs_key TEXT NOT NULL,
+                                params_key TEXT NOT NULL,
+                                outputs TEXT NOT NULL,
+                                finished REAL NOT NULL,
+                                PRIMARY KEY (stage, target))""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS files (
+                                path TEXT PRIMARY KEY,
+                                size INTEGER NOT NULL,
+                                mtime_ns INTEGER NOT NULL,
+                                hash TEXT NOT NULL)""")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def file_hash(self, path):
+        """Hash del contenido de un archivo (se recalcula solo si cambió su tamaño o fecha)."""
+        st = os.stat(path)
+        path = str(Path(path).resolve())
+        with self._connect() as conn:
+            row = conn.execute("SELECT size, mtime_ns, hash FROM files WHERE path = ?", (path,)).fetchone()
+            if row is not None and row[:2] == (st.st_size, st.st_mtime_ns):
+                return row[2]
+            digest = file_hash(path)
+            conn.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                         (path, st.st_size, st.st_mtime_ns, digest))
+        return digest
+
+    def get(self, stage, target):
+        """Última ejecución de un objetivo: dict con inputs_key, params_key y outputs, o None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT inputs_key, params_key, outputs FROM runs WHERE stage = ? AND target = ?",
+                               (stage, target)).fetchone()
+        if row is None:
+            return None
+        return {'inputs_key': row[0], 'params_key': row[1], 'outputs': json.loads(row[2])}
+
+    def put(self, stage, target, inputs_key, params_key, outputs):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO runs (stage, target, inputs_key, params_key, outputs, finished) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (stage, target, inputs_key, params_key, json.dumps([str(p) for p in outputs]),
+                          time.time()))
+
+
+class Stage:
+    """
+    Etapa del grafo: para cada objetivo declara entradas, parámetros y
+    salidas; run() ejecuta los objetivos desactualizados.
+    """
+
+    name = None
+    deps = ()
+    per_file = True
+    # Salidas existentes sin registro previo se adoptan en lugar de regenerarse
+    adopt_existing = False
+
+    def __init__(self, runner):
+        self.runner = runner
+
+    def targets(self):
+        """Objetivos: nombres de las grabaciones, o 'corpus'."""
+        return self.runner.accepted() if self.per_file else ['corpus']
+
+    def inputs(self, target):
+        return []
+
+    def params(self, target):
+        return None
+
+    def outputs(self, target):
+        return []
+
+    def run(self, targets):
+        """
+        Ejecuta la etapa para los objetivos dados.
+
+        Returns:
+            dict objetivo -> salidas, para etapas cuyas salidas solo se
+            conocen al ejecutarlas (por defecto, las declaradas)
+        """
+        raise NotImplementedError
+
+
+class DecodeStage(Stage):
+    name = 'decode'
+
+    def targets(self):
+        return list(self.runner.files)
+
+    def inputs(self, target):
+        return [self.runner.files[target]]
+
+    def params(self, target):
+        return {'rules': QUALITY_RULES}
+
+    def outputs(self, target):
+        return [STAGE_DIR / 'decode' / f'{target}.pkl']
+
+    def run(self, targets):
+        gate = QualityGate()
+        index = FingerprintIndex('.cache/fingerprints.sqlite')
+        for target in targets:
+            audio_file = self.runner.files[target]
+            row = gate.check(audio_file)
+            duplicate = index.check(audio_file) if row['status'] != 'reject' else None
+            if row['status'] == 'reject':
+                print(f"  ❌ {row['file']}: rechazado ({row['reasons']})")
+            elif row['status'] == 'warn':
+                print(f"  ⚠ {row['file']}: {row['reasons']}")
+            if duplicate is not None:
+                # Se omite solo mientras el original siga en el corpus (ver StageRunner.accepted)
+                print(f"  ♻ {row['file']}: copia de {Path(duplicate['original']).name}")
+            save_artifact({'quality': row, 'duplicate': duplicate}, self.outputs(target)[0])
+
+        # Informe de calidad de todo el corpus (no solo de lo ejecutado ahora)
+        rows = [load_artifact(path)['quality'] for target in self.targets()
+                for path in self.outputs(target) if path.exists()]
+        pd.DataFrame(rows).to_csv('quality_report.csv', index=False)
+        print("  ✓ quality_report.csv")
+
+
+class TranscribeStage(Stage):
+    name = 'transcribe'
+    deps = ('decode',)
+    adopt_existing = True
+
+    def inputs(self, target):
+        return [self.runner.files[target]]
+
+    def params(self, target):
+        return {'model': self.runner.args.model}
+
+    def outputs(self, target):
+        return [transcription_path(self.runner.files[target])]
+
+    def run(self, targets):
+        plan = ExecutionPlan.detect(transcribe=True, workers=self.runner.args.workers,
+                                    model_name=self.runner.args.model)
+        plan.apply_whisper()
+        transcriber = W.WhisperTranscriber(model_name=self.runner.args.model)
+        for target in targets:
+            transcription = transcriber.transcribe(self.runner.files[target])
+            with open(self.outputs(target)[0], 'w', encoding='utf-8') as f:
+                json.dump(transcription, f, ensure_ascii=False, indent=2)
+        transcriber.release()
+
+
+class SegmentStage(Stage):
+    name = 'segment'
+    deps = ('transcribe',)
+
+    def __init__(self, runner):
+        super().__init__(runner)
+        self._sampler = None
+
+    def sampler(self):
+        """StratifiedWordSampler de SAMPLING (o None), con los hablantes de las grabaciones aceptadas."""
+        if W.SAMPLING and self._sampler is None:
+            self._sampler = StratifiedWordSampler(**W.SAMPLING)
+            self._sampler.assign_speakers([self.runner.corpus_files[t] for t in self.runner.accepted(corpus=True)],
+                                          self.runner.manifest)
+        return self._sampler
+
+    def inputs(self, target):
+        # Con muestreo, el plan depende de todas las transcripciones del hablante
+        sampler = self.sampler()
+        if sampler is None:
+            return [transcription_path(self.runner.files[target])]
+        return [transcription_path(path) for path in sampler.speaker_recordings(self.runner.files[target])]
+
+    def params(self, target):
+        return {'sampling': W.SAMPLING}
+
+    def outputs(self, target):
+        return [STAGE_DIR / 'segment' / f'{target}.pkl']
+
+    def run(self, targets):
+        sampler = self.sampler()
+        for target in targets:
+            with open(transcription_path(self.runner.files[target]), encoding='utf-8') as f:
+                transcription = json.load(f)
+            analyzer = W.WordBasedVoiceAnalyzer(self.runner.files[target], transcription, mmap='auto',
+                                                sampler=sampler)
+            words = analyzer.select_words()
+            print(f"  ✓ {target}: {len(words)}/{len(transcription['words'])} palabras")
+            save_artifact({'words': words, 'sampling_plan': analyzer.sampling_plan}, self.outputs(target)[0])
+
+
+def _analyze_segment(task):
+    """Worker del pool: analiza las palabras elegidas por la etapa segment (devuelve sus tablas)."""
+    audio_file, transcription, segmentation, kwargs = task
+    analyzer = W.WordBasedVoiceAnalyzer(audio_file, transcription, words=segmentation['words'], **kwargs)
+    if segmentation['sampling_plan'] is not None:
+        analyzer.set_sampling_plan(segmentation['sampling_plan'])
+    analyzer.analyze_all()
+    return analyzer.result_tables()
+
+
+class AnalyzeStage(Stage):
+    name = 'analyze'
+    deps = ('segment',)
+
+    def __init__(self, runner):
+        super().__init__(runner)
+        self._pitch_ranges = None
+
+    def pitch_ranges(self):
+        """Rango de F0 por grabación con ADAPTIVE_PITCH (de todas las aceptadas de su hablante), o None."""
+        if W.ADAPTIVE_PITCH and self._pitch_ranges is None:
+            print("\n🔎 Estimando el rango de F0 de cada hablante...")
+            self._pitch_ranges = speaker_pitch_ranges(
+                [self.runner.corpus_files[t] for t in self.runner.accepted(corpus=True)],
+                self.runner.manifest, workers=self.runner.args.workers)
+        return self._pitch_ranges
+
+    def inputs(self, target):
+        return [self.runner.files[target], transcription_path(self.runner.files[target]),
+                STAGE_DIR / 'segment' / f'{target}.pkl']
+
+    def params(self, target):
+        # El rango de F0 depende de las demás grabaciones del hablante
+        pitch_ranges = self.pitch_ranges()
+        return {'params': W.ANALYSIS_PARAMS, 'engine': W.ENGINE_VERSION, 'adaptive_pitch': W.ADAPTIVE_PITCH,
+                'pitch_range': pitch_ranges.get(str(self.runner.files[target].resolve())) if pitch_ranges else None}
+
+    def outputs(self, target):
+        return [STAGE_DIR / 'analyze' / f'{target}.pkl']
+
+    def run(self, targets):
+        args = self.runner.args
+        kwargs = {'cache': WordResultCache('.cache/word_results.sqlite'), 'track_store': TrackStore('.cache/tracks'),
+                  'word_workers': args.word_workers, 'word_chunk_duration': W.WORD_CHUNK_DURATION,
+                  'adaptive_pitch': W.ADAPTIVE_PITCH, 'pitch_ranges': self.pitch_ranges()}
+        tasks = []
+        for target in targets:
+            with open(transcription_path(self.runner.files[target]), encoding='utf-8') as f:
+                transcription = json.load(f)
+            segmentation = load_artifact(STAGE_DIR / 'segment' / f'{target}.pkl')
+            tasks.append((self.runner.files[target], transcription, segmentation, kwargs))
+
+        plan = ExecutionPlan.detect(workers=args.workers)
+        print(plan.describe())
+        infos = [sf.info(str(self.runner.files[target])) for target in targets]
+        workers = plan.fit_workers(max(analysis_task_memory(i.duration, i.samplerate) for i in infos))
+        tables = run_parallel(_analyze_segment, tasks, workers,
+                              costs=[os.path.getsize(self.runner.files[t]) for t in targets],
+                              threads=plan.threads_per_worker)
+        for target, (audio_file, transcription, _, _), result in zip(targets, tasks, tables):
+            analyzer = W.WordBasedVoiceAnalyzer.from_tables(audio_file, transcription, result,
+                                                            adaptive_pitch=W.ADAPTIVE_PITCH)
+            save_artifact(analyzer, self.outputs(target)[0])
+
+
+class ClassifyStage(Stage):
+    name = 'classify'
+    deps = ('analyze',)
+    per_file = False
+
+    def inputs(self, target):
+        # Siempre el corpus completo: con filtros no se sobrescribe con un subconjunto
+        return [STAGE_DIR / 'analyze' / f'{name}.pkl' for name in self.runner.accepted(corpus=True)]
+
+    def params(self, target):
+        return source_key(W.classify_analyzers, W.classify_vowels)
+
+    def outputs(self, target):
+        return [STAGE_DIR / 'classify.pkl']
+
+    def run(self, targets):
+        analyzers = [load_artifact(path) for path in self.inputs('corpus')]
+        W.classify_analyzers(analyzers)
+        save_artifact(analyzers, STAGE_DIR / 'classify.pkl')
+
+
+class StatsStage(Stage):
+    name = 'stats'
+    deps = ('classify',)
+    per_file = False
+
+    def inputs(self, target):
+        # El manifiesto da el género de cada grabación
+        return [STAGE_DIR / 'classify.pkl', self.runner.manifest.path]
+
+    def params(self, target):
+        return {'code': source_key(W.gender_statistics, W.compare_genders, W.analyze_by_vowel_type),
+                'sampling': W.SAMPLING}
+
+    def outputs(self, target):
+        outputs = [Path('gender_comparison_stats.json'), Path('gender_by_vowel_stats.json'),
+                   STAGE_DIR / 'stats.pkl']
+        if W.SAMPLING:
+            outputs.append(Path('sampling_fractions.csv'))
+        return outputs
+
+    def run(self, targets):
+        analyzers = load_artifact(STAGE_DIR / 'classify.pkl')
+        save_artifact(W.gender_statistics(analyzers, self.runner.manifest), STAGE_DIR / 'stats.pkl')
+        if W.SAMPLING:
+            pd.DataFrame(sampling_report(analyzers)).to_csv('sampling_fractions.csv', index=False)
+            print("  ✓ sampling_fractions.csv")
+
+
+class PlotStage(Stage):
+    name = 'plot'
+    deps = ('stats',)
+    per_file = False
+
+    def inputs(self, target):
+        return [STAGE_DIR / 'classify.pkl', STAGE_DIR / 'stats.pkl', self.runner.manifest.path]
+
+    def params(self, target):
+        return source_key(W.gender_visualizations, W.create_comparison_visualizations,
+                          W.visualize_by_vowel_type, W.visualize_f0_contours)
+
+    def outputs(self, target):
+        return [Path(name) for name in PLOT_FILES]
+
+    def run(self, targets):
+        analyzers = load_artifact(STAGE_DIR / 'classify.pkl')
+        W.gender_visualizations(analyzers, *load_artifact(STAGE_DIR / 'stats.pkl'), self.runner.manifest)
+
+
+class ExportStage(Stage):
+    name = 'export'
+    deps = ('analyze',)
+
+    def inputs(self, target):
+        return [STAGE_DIR / 'analyze' / f'{target}.pkl']
+
+    def params(self, target):
+        return {'dir': 'word_audios'}
+
+    def run(self, targets):
+        produced = {}
+        for target in targets:
+            # Los audios de la exportación anterior (puede haber menos palabras ahora)
+            for path in self.runner.recorded_outputs(self.name, target):
+                Path(path).unlink(missing_ok=True)
+            load_artifact(STAGE_DIR / 'analyze' / f'{target}.pkl').export_word_audios('word_audios')
+            produced[target] = sorted(Path('word_audios').glob(f'{Path(target).name}_palabra_*.wav'))
+        return produced
+
+
+# En orden topológico
+STAGES = {stage.name: stage for stage in (DecodeStage, TranscribeStage, SegmentStage, AnalyzeStage,
+                                          ClassifyStage, StatsStage, PlotStage, ExportStage)}
+
+
+class StageRunner:
+    """Decide qué objetivos están desactualizados y ejecuta las etapas en orden."""
+
+    def __init__(self, args):
+        """
+        Args:
+            args: argumentos de la línea de comandos (ver parse_args)
+        """
+        self.args = args
+        self.log = StageLog(STAGE_DIR.parent / 'stages.sqlite')
+        self.manifest = CorpusManifest(args.manifest)
+        # Los filtros solo eligen los objetivos de las etapas por archivo; classify,
+        # stats y plot son siempre del corpus completo del manifiesto
+        self.files = self._discover()
+        self.corpus_files = self._discover(filtered=False)
+        self.filtered = bool(args.files or args.speaker or args.gender or args.session)
+        # Salidas que se regenerarían (dry run): lo que depende de ellas también
+        self.pending = set()
+
+    def _discover(self, filtered=True):
+        """
+        Grabaciones del manifiesto (filtradas con --speaker, --gender, --session
+        y --files salvo filtered=False) como dict objetivo -> ruta; el objetivo
+        es la ruta relativa al manifiesto sin extensión (único aunque se repitan
+        nombres en carpetas).
+        """
+        args = self.args
+        recordings = self.manifest.recordings(speaker=args.speaker, gender=args.gender, session=args.session) \
+            if filtered else self.manifest.recordings()
+        files = {}
+        for recording in recordings:
+            target = Path(os.path.relpath(recording.path, self.manifest.root)).with_suffix('').as_posix()
+            if filtered and args.files and not any(fnmatch.fnmatch(recording.path.name, p) or fnmatch.fnmatch(target, p)
+                                           for p in self.args.files):
+                continue
+            files[target] = recording.path
+        return files
+
+    def accepted(self, corpus=False):
+        """
+        Grabaciones que pasaron decode (sin rechazo de calidad ni duplicado).
+
+        Una copia se omite solo si su original (o una copia más larga) está
+        entre las grabaciones aceptadas del manifiesto completo.
+
+        Args:
+            corpus: todas las del manifiesto (etapas del corpus) en lugar de
+                las seleccionadas con los filtros
+        """
+        candidates = []
+        for name in self.corpus_files:
+            path = STAGE_DIR / 'decode' / f'{name}.pkl'
+            # Sin decode (p.ej. --only): no se filtra
+            if not path.exists() or load_artifact(path)['quality']['status'] != 'reject':
+                candidates.append(name)
+        duplicates = FingerprintIndex('.cache/fingerprints.sqlite').duplicates(
+            [self.corpus_files[name] for name in candidates])
+        candidates = {name for name in candidates if self.corpus_files[name] not in duplicates}
+        return [name for name in (self.corpus_files if corpus else self.files) if name in candidates]
+
+    def recorded_outputs(self, stage, target):
+        record = self.log.get(stage, target)
+        return record['outputs'] if record else []
+
+    def selected_stages(self):
+        """Etapas pedidas y, salvo --only, las previas de las que dependen."""
+        selected = set(self.args.stages or STAGES)
+        if not self.args.only:
+            todo = list(selected)
+            while todo:
+                for dep in STAGES[todo.pop()].deps:
+                    if dep not in selected:
+                        selected.add(dep)
+                        todo.append(dep)
+        return [name for name in STAGES if name in selected]
+
+    def _inputs_key(self, stage, target):
+        """Clave de contenido de las entradas, o (None, motivo) si falta o se regenerará alguna."""
+        hashes = []
+        for path in stage.inputs(target):
+            if str(path) in self.pending:
+                return None, f"entrada pendiente ({path})"
+            if not Path(path).exists():
+                return None, f"falta {path}"
+            hashes.append(self.log.file_hash(path))
+        return make_key(stage.name, target, hashes), None
+
+    def stale_reason(self, stage, target, inputs_key, params_key):
+        """Motivo para ejecutar un objetivo, o None si está al día."""
+        if self.args.force and (not self.args.stages or stage.name in self.args.stages):
+            return "forzado"
+        record = self.log.get(stage.name, target)
+        if record is None:
+            return "sin ejecutar"
+        if record['params_key'] != params_key:
+            return "parámetros o código cambiados"
+        if record['inputs_key'] != inputs_key:
+            return "entradas cambiadas"
+        missing = [p for p in record['outputs'] if not Path(p).exists()]
+        if missing:
+            return f"falta {missing[0]}"
+        return None
+
+    def run_stage(self, name):
+        stage = STAGES[name](self)
+        stale, keys = [], {}
+        for target in stage.targets():
+            params_key = make_key(stage.params(target))
+            inputs_key, reason = self._inputs_key(stage, target)
+            if inputs_key is not None:
+                reason = self.stale_reason(stage, target, inputs_key, params_key)
+                outputs = stage.outputs(target)
+                if reason == "sin ejecutar" and stage.adopt_existing and outputs \
+                        and all(p.exists() for p in outputs):
+                    print(f"  ✓ {name} {target}: {outputs[0]} existente, se adopta")
+                    if not self.args.dry_run:
+                        self.log.put(name, target, inputs_key, params_key, outputs)
+                    continue
+            elif not stage.per_file and self.filtered and any(
+                    not Path(p).exists() and str(p) not in self.pending for p in stage.inputs(target)):
+                # Con filtros, el corpus puede tener grabaciones aún sin analizar
+                print(f"  ⚠ {name}: se omite ({reason}); los filtros no cambian las etapas del corpus, "
+                      f"ejecutar sin filtros para completarlo")
+                return
+            elif not self.args.dry_run:
+                raise SystemExit(f"❌ {name} {target}: {reason}")
+            if reason is None:
+                continue
+            stale.append(target)
+            keys[target] = (inputs_key, params_key)
+            print(f"  ▶ {name} {target}: {reason}")
+
+        if not stale:
+            print(f"✓ {name}: al día")
+            return
+
+        if self.args.dry_run:
+            for target in stale:
+                self.pending.update(str(p) for p in stage.outputs(target))
+            # Salidas que solo se conocen al ejecutar: las del registro anterior
+            for target in stale:
+                self.pending.update(self.recorded_outputs(name, target))
+            return
+
+        print(f"\n{'='*70}\n{name.upper()}: {len(stale)} objetivo(s)\n{'='*70}")
+        produced = stage.run(stale) or {}
+        for target in stale:
+            outputs = produced.get(target, stage.outputs(target))
+            self.log.put(name, target, *keys[target], outputs)
+
+    def run(self):
+        if not self.files:
+            print(f"\n❌ No hay grabaciones seleccionadas en {self.manifest.path}")
+            return
+        print(f"\n📁 Archivos: {len(self.files)}")
+        for name in self.selected_stages():
+            print(f"\n🔎 {name}")
+            self.run_stage(name)
+        if self.args.dry_run:
+            print("\n(dry run: no se ha ejecutado nada)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Análisis por etapas: solo se vuelve a ejecutar lo que cambió (entradas, parámetros o código).")
+    parser.add_argument('stages', nargs='*', metavar='etapa',
+                        help=f"etapas a ejecutar ({', '.join(STAGES)}); por defecto todas")
+    parser.add_argument('-n', '--dry-run', action='store_true', help="mostrar qué se ejecutaría, sin ejecutar")
+    parser.add_argument('--only', action='store_true',
+                        help="no ejecutar las etapas previas (usar sus resultados existentes)")
+    parser.add_argument('--force', action='store_true', help="ejecutar las etapas pedidas aunque estén al día")
+    parser.add_argument('--files', nargs='+', metavar='PATRÓN', help="solo las grabaciones que coincidan")
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help="manifiesto del corpus (ver corpus.py)")
+    parser.add_argument('--speaker', nargs='+', help="solo estos hablantes")
+    parser.add_argument('--gender', nargs='+', help="solo estos géneros (F, M)")
+    parser.add_argument('--session', nargs='+', help="solo estas sesiones")
+    parser.add_argument('--workers', type=int, default=W.WORKERS,
+                        help="procesos de análisis (por defecto según ExecutionPlan)")
+    parser.add_argument('--word-workers', type=int, default=W.WORD_WORKERS,
+                        help="procesos por grabación para repartir sus palabras")
+    parser.add_argument('--model', default='large', help="modelo de Whisper")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"etapas desconocidas: {', '.join(unknown)} (opciones: {', '.join(STAGES)})")
+    return args
+
+
+def main(argv=None):
+    """Función principal."""
+    StageRunner(parse_args(argv)).run()
+
+
+if __name__ == "__main__":
+    main()
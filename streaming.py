@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Utilidades para análisis en streaming
+=====================================
+Estadísticos que se actualizan muestra a muestra y se pueden combinar entre
+bloques, palabras o grabaciones sin guardar los valores originales.
+"""
+
+import numpy as np
+
+
+class RunningStats:
+    """Media y desviación estándar incrementales (Welford), combinables (Chan)."""
+
+    def __init__(self):
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, value):
+        """Añade un valor."""
+        self.count += 1
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """Combina con otro RunningStats (p.ej. de otra grabación) y devuelve self."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self._mean, self._m2 = other.count, other._mean, other._m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        count = self.count + other.count
+        delta = other._mean - self._mean
+        self._mean += delta * other.count / count
+        self._m2 += other._m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self._mean if self.count else np.nan
+
+    @property
+    def std(self):
+        """Desviación estándar poblacional (como np.std)."""
+        return np.sqrt(self._m2 / self.count) if self.count else np.nan
+
+    @classmethod
+    def from_values(cls, values):
+        """RunningStats de un array de valores (equivale a add() de cada uno)."""
+        stats = cls()
+        values = np.asarray(values, dtype=np.float64)
+        if len(values):
+            stats.count = len(values)
+            stats._mean = float(values.mean())
+            stats._m2 = float(((values - stats._mean) ** 2).sum())
+            stats.min = float(values.min())
+            stats.max = float(values.max())
+        return stats
+
+
+# Bandas de la comparación LTAS (Hz)
+LTAS_BANDS = [(0, 1000), (1000, 2000), (2000, 4000), (4000, 8000)]
+
+
+class LTASAccumulator:
+    """
+    Espectro promedio a largo plazo (LTAS) de los frames sonoros, por bloques.
+
+    Cada bloque de audio se divide en frames; los sonoros (energía sobre
+    silence_dbfs y pico de autocorrelación normalizada sobre
+    voicing_threshold en el rango de F0) suman su densidad espectral de
+    potencia en una rejilla fija de frecuencias. Solo se guardan sumas, así
+    que el espectrograma completo nunca está en memoria y dos acumuladores
+    (de grabaciones del mismo niño o de un grupo de género) se combinan con
+    merge(). El nivel de cada banda relativo al total (dB) de cada frame
+    alimenta un RunningStats por banda para las comparaciones estadísticas.
+    """
+
+    def __init__(self, sr, frame_duration=0.04, hop_duration=0.02, resolution=50.0, max_freq=8000.0,
+                 bands=LTAS_BANDS, voicing_threshold=0.45, silence_dbfs=-50.0,
+                 pitch_floor=75, pitch_ceiling=600):
+        """
+        Args:
+            sr: sample rate del audio que se va a añadir
+            frame_duration, hop_duration: tamaño y avance de los frames (s)
+            resolution: ancho de los bins de la rejilla de frecuencias (Hz)
+            max_freq: frecuencia máxima de la rejilla (Hz)
+            bands: bandas (Hz) para los niveles relativos por frame
+            voicing_threshold: pico mínimo de autocorrelación normalizada
+            silence_dbfs: energía mínima de un frame (dBFS)
+            pitch_floor, pitch_ceiling: rango de F0 para buscar el pico (Hz)
+        """
+        self.sr = sr
+        self.frame = int(frame_duration * sr)
+        self.hop = int(hop_duration * sr)
+        self.n_fft = 1 << int(np.ceil(np.log2(2 * self.frame)))
+        self.bands = list(bands)
+        self.voicing_threshold = voicing_threshold
+        self.silence_dbfs = silence_dbfs
+
+        self.window = np.hanning(self.frame)
+        # Autocorrelación de la ventana (corrige la de cada frame, como Praat)
+        window_r = np.fft.irfft(np.abs(np.fft.rfft(self.window, self.n_fft)) ** 2)[:self.frame]
+        self._window_r = window_r / window_r[0]
+        self._lags = slice(int(sr / pitch_ceiling), min(self.frame - 1, int(sr / pitch_floor)) + 1)
+
+        # Rejilla de frecuencias fija (independiente de sr, para poder combinar)
+        self.freqs = np.arange(0, max_freq, resolution)
+        fft_freqs = np.fft.rfftfreq(self.n_fft, 1 / sr)
+        grid_index = (fft_freqs // resolution).astype(int)
+        inside = grid_index < len(self.freqs)
+        self._grid = np.zeros((len(fft_freqs), len(self.freqs)))
+        self._grid[np.nonzero(inside)[0], grid_index[inside]] = 1
+        self._grid /= np.maximum(self._grid.sum(axis=0), 1)
+        self._bands = np.stack([(self.freqs >= lo) & (self.freqs < hi) for lo, hi in self.bands], axis=1)
+        # Densidad espectral de potencia (comparable entre frecuencias de muestreo)
+        self._scale = 1.0 / (sr * np.sum(self.window ** 2))
+
+        self.power_sum = np.zeros(len(self.freqs))
+        self.voiced_frames = 0
+        self.total_frames = 0
+        self.band_stats = [RunningStats() for _ in self.bands]
+        self._carry = np.zeros(0, dtype=np.float32)
+
+    @classmethod
+    def from_buffer(cls, buffer, block_duration=10.0, **kwargs):
+        """
+        LTAS de una grabación recorrida por bloques.
+
+        Args:
+            buffer: RecordingBuffer (o MappedWavReader: solo se decodifica un bloque a la vez)
+            block_duration: duración de cada bloque (s)
+            **kwargs: parámetros de LTASAccumulator
+        """
+        ltas = cls(buffer.sr, **kwargs)
+        block = int(block_duration * buffer.sr)
+        for start in range(0, buffer.n_samples, block):
+            ltas.add_block(buffer.read(start, min(buffer.n_samples, start + block)))
+        return ltas
+
+    def add_block(self, samples):
+        """Añade un bloque de audio (las muestras de frames incompletos pasan al siguiente)."""
+        signal = np.concatenate([self._carry, np.asarray(samples, dtype=np.float32)])
+        if len(signal) < self.frame:
+            self._carry = signal
+            return self
+
+        frames = np.lib.stride_tricks.sliding_window_view(signal, self.frame)[::self.hop]
+        self._carry = signal[len(frames) * self.hop:]
+        self._add_frames(frames.astype(np.float64))
+        return self
+
+    def _add_frames(self, frames):
+        self.total_frames += len(frames)
+
+        energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-20)
+        power = np.abs(np.fft.rfft(frames * self.window, self.n_fft, axis=1)) ** 2
+
+        # Autocorrelación normalizada (Wiener-Khinchin) corregida por la ventana
+        r = np.fft.irfft(power, axis=1)[:, :self.frame]
+        r = r[:, self._lags] / np.maximum(r[:, :1], 1e-20) / self._window_r[self._lags]
+        voiced = (energy_db > self.silence_dbfs) & (r.max(axis=1) > self.voicing_threshold)
+        if not voiced.any():
+            return
+
+        grid_power = power[voiced] @ self._grid * self._scale
+        self.power_sum += grid_power.sum(axis=0)
+        self.voiced_frames += int(voiced.sum())
+
+        band_power = grid_power @ self._bands
+        band_db = 10 * np.log10(band_power / grid_power.sum(axis=1, keepdims=True) + 1e-20)
+        for stats, values in zip(self.band_stats, band_db.T):
+            stats.merge(RunningStats.from_values(values))
+
+    def merge(self, other):
+        """Combina con otro LTASAccumulator de la misma rejilla y devuelve self."""
+        if not np.array_equal(self.freqs, other.freqs) or self.bands != other.bands:
+            raise ValueError("LTAS con rejillas o bandas distintas")
+        self.power_sum += other.power_sum
+        self.voiced_frames += other.voiced_frames
+        self.total_frames += other.total_frames
+        for stats, other_stats in zip(self.band_stats, other.band_stats):
+            stats.merge(other_stats)
+        return self
+
+    @classmethod
+    def combine(cls, accumulators):
+        """Nuevo LTASAccumulator con la suma de varios (no modifica los originales)."""
+        accumulators = [a for a in accumulators if a is not None]
+        if not accumulators:
+            return None
+        first = accumulators[0]
+        combined = cls.__new__(cls)
+        combined.__dict__.update(first.__dict__)
+        combined.power_sum = first.power_sum.copy()
+        combined.band_stats = [RunningStats().merge(s) for s in first.band_stats]
+        combined._carry = np.zeros(0, dtype=np.float32)
+        for other in accumulators[1:]:
+            combined.merge(other)
+        return combined
+
+    @property
+    def ltas_db(self):
+        """LTAS (dB de densidad de potencia media) en la rejilla self.freqs."""
+        if not self.voiced_frames:
+            return np.full(len(self.freqs), np.nan)
+        return 10 * np.log10(self.power_sum / self.voiced_frames + 1e-20)
+
+    def band_levels(self):
+        """Nivel de cada banda del LTAS relativo al total (dB)."""
+        band_power = self.power_sum @ self._bands
+        total = band_power.sum() if self.voiced_frames else np.nan
+        return {f"{lo}-{hi}": 10 * np.log10(p / total + 1e-20) for (lo, hi), p in zip(self.bands, band_power)}
@@ -3,56 +3,8 @@
 
 import numpy as np
 import librosa
-import matplotlib.pyplot as plt
 
-class WordSegmenter:
-    """Segmenta audio en palabras usando detección de silencios."""
-
-    def __init__(self, audio, sr, silence_thresh_db=-40, min_silence_len=0.3, min_word_len=0.2):
-        self.audio = audio
-        self.sr = sr
-        self.silence_thresh_db = silence_thresh_db
-        self.min_silence_len = min_silence_len
-        self.min_word_len = min_word_len
-        self.words = []
-
-    def segment(self):
-        """Detecta y segmenta palabras."""
-        frame_length = int(0.025 * self.sr)
-        hop_length = int(0.010 * self.sr)
-        rms = librosa.feature.rms(y=self.audio, frame_length=frame_length, hop_length=hop_length)[0]
-        rms_db = librosa.amplitude_to_db(rms, ref=np.max)
-        is_speech = rms_db > self.silence_thresh_db
-        times = librosa.frames_to_time(np.arange(len(is_speech)), sr=self.sr, hop_length=hop_length)
-
-        speech_intervals = []
-        in_speech = False
-        start_time = 0
-
-        for i, (is_sp, time) in enumerate(zip(is_speech, times)):
-            if is_sp and not in_speech:
-                start_time = time
-                in_speech = True
-            elif not is_sp and in_speech:
-                end_time = time
-                duration = end_time - start_time
-                if duration >= self.min_word_len:
-                    speech_intervals.append((start_time, end_time))
-                in_speech = False
-
-        if in_speech:
-            speech_intervals.append((start_time, times[-1]))
-
-        self.words = []
-        for i, (start, end) in enumerate(speech_intervals):
-            self.words.append({
-                'index': i,
-                'start_time': start,
-                'end_time': end,
-                'duration': end - start,
-            })
-
-        return self.words
+from segmentation_sweep import SegmentationSweep
 
 
 # Test con diferentes parámetros
@@ -74,9 +26,11 @@ configs = [
     {"silence_thresh_db": -45, "min_silence_len": 0.15, "min_word_len": 0.15, "desc": "Umbral más bajo"},
 ]
 
+# La envolvente RMS se calcula una sola vez para todas las configuraciones
+sweep = SegmentationSweep(y, sr)
+
 for config in configs:
-    segmenter = WordSegmenter(y, sr, **{k: v for k, v in config.items() if k != 'desc'})
-    words = segmenter.segment()
+    words = sweep.segments(**{k: v for k, v in config.items() if k != 'desc'})
 
     avg_duration = np.mean([w['duration'] for w in words]) if words else 0
 
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Tabla columnar de vocales
+=========================
+Sustituye a las listas de diccionarios (~10 claves por vocal) por un array
+estructurado de NumPy con columnas numéricas y códigos categóricos para la
+clase de vocal, el origen de la etiqueta, el hablante y la palabra.
+
+Cada estadístico pasa a ser una operación vectorizada sobre una columna:
+
+    table['f1']                                 # array de F1
+    table.select(vowel_class='/a/')['pitch']    # F0 de las /a/
+    table.voiced_pitch()                        # F0 > 0
+"""
+
+import numpy as np
+
+
+VOWEL_CLASSES = ['/a/', '/e/', '/i/', '/o/', '/u/', '/unknown/']
+VOWEL_SOURCES = ['transcription', 'transcription_partial', 'acoustic_only']
+
+# Columnas numéricas y su valor por defecto si la vocal no lo trae
+FLOAT_COLUMNS = {
+    'start': np.nan, 'end': np.nan, 'mid_time': np.nan, 'global_time': np.nan,
+    'duration': np.nan, 'f1': np.nan, 'f2': np.nan, 'f3': np.nan,
+    'pitch': 0.0, 'intensity': np.nan,
+}
+INT_COLUMNS = {'cluster': -1, 'word_index': -1, 'vowel_index': -1}
+
+# Columnas categóricas: códigos pequeños + vocabulario
+FIXED_CATEGORIES = {
+    'vowel_class': VOWEL_CLASSES,
+    'vowel_source': VOWEL_SOURCES,
+    'kmeans_vowel': VOWEL_CLASSES,
+}
+DYNAMIC_CATEGORIES = ('speaker', 'word')
+
+DTYPE = np.dtype(
+    [(name, 'f8') for name in FLOAT_COLUMNS]
+    + [(name, 'i4') for name in INT_COLUMNS]
+    + [(name, 'i1') for name in FIXED_CATEGORIES]
+    + [(name, 'i4') for name in DYNAMIC_CATEGORIES]
+)
+
+
+class VowelTable:
+    """Tabla columnar de vocales con append, concatenación y filtros."""
+
+    def __init__(self, capacity=64):
+        """
+        Args:
+            capacity: filas reservadas inicialmente (crece al doble cuando se llena)
+        """
+        self._data = np.zeros(max(1, capacity), dtype=DTYPE)
+        self._size = 0
+        self.categories = {name: list(values) for name, values in FIXED_CATEGORIES.items()}
+        for name in DYNAMIC_CATEGORIES:
+            self.categories[name] = []
+        self._lookup = {name: {v: i for i, v in enumerate(values)}
+                        for name, values in self.categories.items()}
+
+    # ------------------------------------------------------------------
+    # Construcción
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_records(cls, records, speaker=None):
+        """Construye una tabla a partir de una lista de dicts de vocales."""
+        table = cls(capacity=len(records))
+        table.extend(records, speaker=speaker)
+        return table
+
+    @classmethod
+    def concatenate(cls, tables):
+        """Concatena varias tablas, reconciliando sus vocabularios."""
+        tables = [t for t in tables if t is not None]
+        result = cls(capacity=sum(len(t) for t in tables))
+        for table in tables:
+            rows = table.data.copy()
+            for name in DYNAMIC_CATEGORIES:
+                codes = rows[name]
+                mapping = np.array([result._code(name, v) for v in table.categories[name]] + [-1], dtype=np.int32)
+                rows[name] = mapping[codes]  # el código -1 se queda en -1
+            result._append_rows(rows)
+        return result
+
+    def _code(self, name, value):
+        """Código de un valor categórico (lo añade al vocabulario si es nuevo)."""
+        if value is None:
+            return -1
+        lookup = self._lookup[name]
+        if value not in lookup:
+            if name in FIXED_CATEGORIES:
+                raise ValueError(f"Valor desconocido para {name}: {value!r}")
+            lookup[value] = len(self.categories[name])
+            self.categories[name].append(value)
+        return lookup[value]
+
+    def _reserve(self, extra):
+        if self._size + extra > len(self._data):
+            new_capacity = max(self._size + extra, 2 * len(self._data))
+            data = np.zeros(new_capacity, dtype=DTYPE)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+
+    def _append_rows(self, rows):
+        self._reserve(len(rows))
+        self._data[self._size:self._size + len(rows)] = rows
+        self._size += len(rows)
+
+    def append(self, vowel, speaker=None):
+        """
+        Añade una vocal.
+
+        Args:
+            vowel: dict con las claves de las vocales de los analizadores
+            speaker: nombre del hablante/grabación (si el dict no trae 'speaker')
+        """
+        self._reserve(1)
+        row = self._data[self._size]
+        for name, default in FLOAT_COLUMNS.items():
+            value = vowel.get(name)
+            row[name] = default if value is None else value
+        for name, default in INT_COLUMNS.items():
+            value = vowel.get(name)
+            row[name] = default if value is None else value
+        for name in FIXED_CATEGORIES:
+            row[name] = self._code(name, vowel.get(name))
+        row['speaker'] = self._code('speaker', vowel.get('speaker', speaker))
+        row['word'] = self._code('word', vowel.get('word'))
+        self._size += 1
+
+    def extend(self, vowels, speaker=None):
+        """Añade varias vocales."""
+        self._reserve(len(vowels))
+        for vowel in vowels:
+            self.append(vowel, speaker=speaker)
+
+    # ------------------------------------------------------------------
+    # Acceso
+    # ------------------------------------------------------------------
+
+    @property
+    def data(self):
+        """Array estructurado con las filas ocupadas (vista, sin copia)."""
+        return self._data[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, name):
+        """
+        Columna por nombre: numéricas como vista; categóricas decodificadas
+        (None donde falta el valor).
+        """
+        if name in self.categories:
+            return self.labels(name)
+        return self.data[name]
+
+    def __setitem__(self, name, values):
+        """Asigna una columna completa (categóricas a partir de sus etiquetas)."""
+        if name in self.categories:
+            values = [self._code(name, v) for v in values]
+        self.data[name] = values
+
+    def codes(self, name):
+        """Códigos enteros de una columna categórica."""
+        return self.data[name]
+
+    def labels(self, name):
+        """Etiquetas de una columna categórica como array de objetos."""
+        vocabulary = np.array(self.categories[name] + [None], dtype=object)
+        return vocabulary[self.data[name]]
+
+    def mask(self, **conditions):
+        """
+        Máscara booleana por igualdad de columnas.
+
+        Ejemplo: table.mask(vowel_class='/a/', vowel_source='transcription')
+        """
+        mask = np.ones(self._size, dtype=bool)
+        for name, value in conditions.items():
+            if name in self.categories:
+                code = self._lookup[name].get(value)
+                if code is None:
+                    return np.zeros(self._size, dtype=bool)
+                mask &= self.data[name] == code
+            else:
+                mask &= self.data[name] == value
+        return mask
+
+    def filter(self, mask):
+        """
+        Subtabla con las filas seleccionadas.
+
+        Con un slice se obtiene una vista; con una máscara o índices, las filas
+        se copian (compactas). El vocabulario se comparte con la tabla original.
+        """
+        result = VowelTable.__new__(VowelTable)
+        result._data = self.data[mask]
+        result._size = len(result._data)
+        result.categories = self.categories
+        result._lookup = self._lookup
+        return result
+
+    def select(self, **conditions):
+        """Subtabla con las filas que cumplen todas las condiciones."""
+        return self.filter(self.mask(**conditions))
+
+    def voiced_pitch(self):
+        """Valores de F0 de las vocales con pitch válido (> 0)."""
+        pitch = self.data['pitch']
+        return pitch[pitch > 0]
+
+    def records(self):
+        """Convierte la tabla en lista de dicts (para exportar a JSON/CSV)."""
+        columns = {name: (self.labels(name) if name in self.categories else self.data[name])
+                   for name in DTYPE.names}
+        return [{name: (values[i].item() if hasattr(values[i], 'item') else values[i])
+                 for name, values in columns.items()}
+                for i in range(self._size)]
+
+    def __iter__(self):
+        return iter(self.records())
+
+    def __repr__(self):
+        return f"VowelTable({self._size} vocales, {len(self.categories['speaker'])} hablantes)"